@@ -30,7 +30,16 @@ class Settings(BaseSettings):
 
     # Gemini AI
     gemini_api_key: str = ""
-    gemini_model: str = "gemini-2.0-flash-exp"
+    gemini_model: str = "models/gemini-2.5-flash"  # tier standard
+    gemini_max_tokens: int = 2000
+    gemini_timeout: float = 30.0  # secondes par génération
+    gemini_max_concurrency: int = 8  # générations simultanées par worker, les suivantes attendent leur tour
+    disconnect_poll_interval: float = 0.5  # secondes entre deux vérifications de déconnexion du client
+    gemini_retries: int = 2  # nouvelles tentatives sur erreur transitoire (timeout, 429, 5xx)
+    gemini_breaker_failures: int = 5  # échecs consécutifs avant ouverture du circuit
+    gemini_breaker_recovery: float = 30.0  # secondes de circuit ouvert avant un appel test
+    gemini_hedge_percentile: float = 0.0  # seconde requête au-delà de ce percentile de latence (ex: 95 ; 0 = désactivé)
+    chat_deadline: float = 40.0  # budget total (secondes) d'une requête de chat, retries compris
 
     # Stripe
     stripe_secret_key: str = ""
@@ -39,6 +48,99 @@ class Settings(BaseSettings):
     # Cache
     cache_ttl_hours: int = 24
     cache_max_size: int = 1000
+    # Single-flight (core/single_flight.py) : une seule génération par question identique en cours,
+    # entre workers via un verrou Redis à bail court renouvelé tant que le leader calcule
+    single_flight_enabled: bool = True
+    single_flight_lease: float = 10.0  # secondes (bail du verrou Redis)
+    single_flight_wait: float = 45.0  # attente max du résultat d'un autre worker avant de calculer soi-même
+    single_flight_poll_interval: float = 0.2  # secondes entre deux lectures du cache Redis
+
+    # Fichiers de la knowledge base (dans config/), fusionnés dans cet ordre
+    knowledge_base_files: str = "knowledge_base.json,knowledge_base_enhanced_2025.json,knowledge_base_maladies_2025.json"
+    # Rechargement à chaud si les fichiers changent (secondes entre deux vérifications, 0 = désactivé)
+    kb_watch_interval: int = 30
+
+    # Embeddings de la knowledge base (pipeline par lots au démarrage)
+    # Changer de modèle invalide les vecteurs existants (ré-embedding incrémental)
+    embedding_model: str = "models/text-embedding-004"
+    embedding_batch_size: int = 50  # max 100 (batchEmbedContents)
+    embedding_concurrency: int = 4
+    embedding_max_retries: int = 6
+
+    # Secours local (TF-IDF de n-grammes hachés, CPU) quand l'embedding Gemini d'une requête échoue
+    embedding_query_timeout: float = 5.0  # secondes
+    embedding_fallback_cooldown: int = 30  # secondes sans rappeler Gemini après un échec
+    local_embedding_dim: int = 384
+    local_embedding_threshold: float = 0.1  # cosinus TF-IDF plus bas que Gemini
+
+    # Découpage des documents en passages (embeddings et contexte du prompt)
+    chunk_max_chars: int = 1200
+    chunk_overlap: int = 200
+    max_passages_per_doc: int = 2
+
+    # Index vectoriel approximatif (IVF) : "exact", "ivf", ou "auto" (IVF au-delà de ann_min_vectors)
+    ann_index: str = "auto"
+    ann_min_vectors: int = 20000
+    ivf_n_lists: int = 0  # 0 = ~√(nombre de passages)
+    ivf_nprobe: int = 8  # clusters visités par requête (rappel ↑, latence ↑)
+
+    # Quantification de l'index exact : "none", "int8" (÷4) ou "pq" (÷32, product quantization)
+    # Les `quantization_rerank` meilleurs candidats sont re-scorés en float (store memmap)
+    vector_quantization: str = "none"
+    quantization_rerank: int = 100
+    pq_subvectors: int = 96  # doit diviser la dimension des embeddings (768)
+
+    # Fusion sémantique + keyword de hybrid_search : "linear" (pondérée) ou "rrf" (reciprocal rank fusion)
+    fusion_method: str = "linear"
+    rrf_k: int = 60
+
+    # Index partagés entre workers (services/shared_index.py) : matrices publiées une fois en .npy
+    # (`python -m services.shared_index build` avant uvicorn) et ouvertes en memmap lecture seule
+    shared_indexes: bool = True
+    shared_index_dir: str = ""  # vide = config/shared_index
+
+    # Recherche depuis les routes async : scoring dans un pool de threads borné (hors event loop)
+    retrieval_workers: int = 4
+    retrieval_max_pending: int = 32  # requêtes admises à la fois, les suivantes attendent leur tour
+
+    # Recherche par lot (batch_hybrid_search) : requêtes scorées ensemble par produit matrice-matrice
+    batch_search_block: int = 256
+
+    # Diversification MMR des sources (quasi-doublons : aeeh / aeeh_2025 / baremes_aeeh_2024)
+    # λ = 1 désactive ; plus λ est bas, plus les documents similaires sont pénalisés
+    mmr_lambda: float = 0.7
+    mmr_candidates: int = 10  # meilleurs scores fusionnés soumis au MMR
+    mmr_max_docs: int = 3000  # au-delà, pas de matrice doc × doc pré-calculée (calcul à la volée)
+
+    # Recherche limitée à la facette de l'intention (services/facets.py) ;
+    # corpus complet si le meilleur document de la partition n'atteint aucun des deux seuils
+    # (scores absolus : les scores fusionnés sont relatifs à la partition)
+    facet_min_semantic: float = 0.55  # cosinus du meilleur passage
+    facet_min_keyword: float = 5.0  # BM25 + fuzzy brut
+
+    # Routage avant recherche (services/routing.py) : small talk et messages d'épuisement
+    # sans sujet identifiable → prompt léger, sans embedding ni recherche
+    routing_enabled: bool = True
+    route_small_talk_max_words: int = 5
+    route_min_lexical_score: float = 5.0  # meilleur score BM25 + fuzzy en dessous duquel « fatigue » n'interroge pas la KB
+
+    # Choix du modèle par requête (services/model_tiers.py) : fast pour le small talk et les
+    # questions simples bien couvertes, deep pour les questions complexes (cumul de prestations)
+    tiering_enabled: bool = True
+    gemini_model_fast: str = "models/gemini-2.0-flash"
+    gemini_fast_max_tokens: int = 800
+    gemini_model_deep: str = ""  # vide = gemini_model, avec plus de tokens et une température plus basse
+    gemini_deep_max_tokens: int = 4000
+    tier_deep_complexity: float = 2.0  # score de complexité (message_complexity) à partir duquel → deep
+    tier_fast_min_confidence: float = 10.0  # meilleur score BM25 + fuzzy requis pour une question → fast
+    tier_fast_max_words: int = 12
+
+    # Recherche lexicale : seuil de similarité pour les fautes de frappe (trigrammes)
+    fuzzy_threshold: float = 0.75
+
+    # Cache des embeddings de requêtes (LRU in-process + Redis)
+    query_embedding_cache_size: int = 5000
+    query_embedding_ttl_hours: int = 168
 
     # Rate Limiting
     rate_limit_requests: int = 10
@@ -59,6 +161,11 @@ class Settings(BaseSettings):
         """Parse les origines autorisées"""
         return [origin.strip() for origin in self.allowed_origins.split(',')]
 
+    @property
+    def knowledge_base_files_list(self) -> List[str]:
+        """Parse les fichiers de la knowledge base"""
+        return [name.strip() for name in self.knowledge_base_files.split(',') if name.strip()]
+
 
 # Instance globale
 settings = Settings()
@@ -2,11 +2,17 @@
 💾 Système de cache Redis asynchrone
 Fallback vers in-memory si Redis non disponible
 """
+import re
+import time
+import base64
 import hashlib
 import json
+import threading
+import unicodedata
 from datetime import datetime, timedelta
 from collections import OrderedDict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence
+import numpy as np
 import redis.asyncio as redis
 from config.settings import settings
 
@@ -27,6 +33,10 @@ class RedisCache:
         self.hits = 0
         self.misses = 0
 
+        # Version de la knowledge base dans les clés : un rechargement à chaud
+        # n'expose plus les réponses générées avec l'ancienne version
+        self.namespace = ""
+
     async def connect(self):
         """Connexion à Redis (appelé au startup de l'app)"""
         if not settings.redis_url:
@@ -63,7 +73,8 @@ class RedisCache:
     def _get_hash(self, query: str) -> str:
         """Hash SHA256 de la requête"""
         normalized = self._normalize_query(query)
-        return f"cache:{hashlib.sha256(normalized.encode()).hexdigest()}"
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+        return f"cache:{self.namespace}:{digest}" if self.namespace else f"cache:{digest}"
 
     async def get(self, query: str) -> Optional[Dict[str, Any]]:
         """Récupère depuis le cache"""
@@ -101,6 +112,16 @@ class RedisCache:
         print(f"❌ Memory Cache MISS ({self.hits} hits, {self.misses} misses)")
         return None
 
+    async def peek(self, query: str) -> Optional[Dict[str, Any]]:
+        """Lecture Redis sans stats ni log (attente du résultat d'un autre worker, voir core/single_flight.py)"""
+        if not (self.use_redis and self.redis_client):
+            return None
+        try:
+            cached = await self.redis_client.get(self._get_hash(query))
+        except Exception:
+            return None
+        return json.loads(cached) if cached else None
+
     async def set(self, query: str, data: Dict[str, Any]) -> None:
         """Stocke dans le cache avec TTL"""
         cache_key = self._get_hash(query)
@@ -170,6 +191,8 @@ class RedisCache:
         else:
             stats["size"] = len(self.memory_cache)
 
+        stats["query_embeddings"] = query_embedding_cache.get_stats()
+
         return stats
 
     async def check_rate_limit(self, user_id: str, max_requests: int, window_seconds: int) -> bool:
@@ -225,5 +248,139 @@ class RedisCache:
         return False
 
 
+class QueryEmbeddingCache:
+    """
+    🧠 Cache des embeddings de requêtes (évite un appel Gemini par question répétée)
+
+    - Tier 1 : LRU in-process avec TTL (accessible depuis le code synchrone)
+    - Tier 2 : Redis optionnel, réutilise la connexion de RedisCache (async)
+
+    Le modèle d'embedding fait partie de la clé : après un changement de modèle,
+    les vecteurs de l'ancien ne sont plus servis (Redis les garde jusqu'à leur TTL).
+    """
+
+    def __init__(self, redis_cache: "RedisCache", max_size: int, ttl_seconds: int, model: Optional[str] = None):
+        self.redis_cache = redis_cache
+        self.model = model  # None → settings.embedding_model
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.memory_cache: OrderedDict = OrderedDict()
+        # Le chemin synchrone peut tourner dans un thread pool
+        self._lock = threading.Lock()
+
+        # Stats
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalise la requête : casse, unicode, espaces, ponctuation finale"""
+        text = unicodedata.normalize("NFKC", text).lower()
+        text = re.sub(r"\s+", " ", text)
+        return text.strip(" ?!.…")
+
+    def _get_key(self, text: str, task_type: str) -> str:
+        normalized = self.normalize_text(text)
+        model = self.model or settings.embedding_model
+        return f"emb:{model}:{task_type}:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self.memory_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry['expires_at']:
+                del self.memory_cache[key]
+                return None
+            self.memory_cache.move_to_end(key)  # LRU
+            return entry['embedding']
+
+    def _memory_set(self, key: str, embedding: List[float]) -> None:
+        with self._lock:
+            self.memory_cache[key] = {
+                'embedding': embedding,
+                'expires_at': time.monotonic() + self.ttl_seconds
+            }
+            self.memory_cache.move_to_end(key)
+            while len(self.memory_cache) > self.max_size:
+                self.memory_cache.popitem(last=False)  # Remove oldest
+
+    def get(self, text: str, task_type: str) -> Optional[List[float]]:
+        """Lecture synchrone (tier in-process uniquement)"""
+        embedding = self._memory_get(self._get_key(text, task_type))
+        if embedding is not None:
+            self.memory_hits += 1
+        else:
+            self.misses += 1
+        return embedding
+
+    def set(self, text: str, task_type: str, embedding: Sequence[float]) -> None:
+        """Écriture synchrone (tier in-process uniquement)"""
+        self._memory_set(self._get_key(text, task_type), list(embedding))
+
+    async def aget(self, text: str, task_type: str) -> Optional[List[float]]:
+        """Lecture async : in-process puis Redis (le hit Redis repeuple le LRU)"""
+        key = self._get_key(text, task_type)
+
+        embedding = self._memory_get(key)
+        if embedding is not None:
+            self.memory_hits += 1
+            return embedding
+
+        client = self.redis_cache.redis_client
+        if self.redis_cache.use_redis and client:
+            try:
+                cached = await client.get(key)
+                if cached:
+                    embedding = np.frombuffer(base64.b64decode(cached), dtype=np.float32).tolist()
+                    self._memory_set(key, embedding)
+                    self.redis_hits += 1
+                    return embedding
+            except Exception as e:
+                print(f"⚠️  Redis GET embedding error: {e}")
+
+        self.misses += 1
+        return None
+
+    async def aset(self, text: str, task_type: str, embedding: Sequence[float]) -> None:
+        """Écriture async : in-process + Redis (float32 encodé en base64)"""
+        key = self._get_key(text, task_type)
+        self._memory_set(key, list(embedding))
+
+        client = self.redis_cache.redis_client
+        if self.redis_cache.use_redis and client:
+            try:
+                payload = base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode("ascii")
+                await client.setex(key, self.ttl_seconds, payload)
+            except Exception as e:
+                print(f"⚠️  Redis SET embedding error: {e}")
+
+    def clear(self) -> None:
+        """Vide le tier in-process et remet les stats à zéro"""
+        with self._lock:
+            self.memory_cache.clear()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du cache d'embeddings"""
+        hits = self.memory_hits + self.redis_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total * 100, 2) if total > 0 else 0,
+            "size": len(self.memory_cache)
+        }
+
+
 # Instance globale
 cache = RedisCache()
+query_embedding_cache = QueryEmbeddingCache(
+    cache,
+    max_size=settings.query_embedding_cache_size,
+    ttl_seconds=settings.query_embedding_ttl_hours * 3600
+)
@@ -0,0 +1,210 @@
+"""
+🛬 Single-flight : une seule génération pour une même question en cours
+
+Quand une question devient populaire (annonce CAF...), des dizaines d'utilisateurs
+envoient le même message en même temps : tous ratent le cache et lancent chacun
+recherche + génération Gemini avant que la première réponse soit stockée.
+
+- Dans un worker : le premier (leader) calcule, les suivants (followers) attendent
+  le même Future et reçoivent sa réponse
+- Entre workers : verrou Redis `lock:<clé de cache>` (SET NX PX) à bail court, renouvelé
+  tant que le leader calcule ; les autres workers lisent le cache jusqu'à ce que la
+  réponse y apparaisse (ou que le verrou disparaisse : ils calculent alors eux-mêmes)
+
+Sans Redis, seul le regroupement dans le worker s'applique.
+"""
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from core.cache import RedisCache, cache
+from config.settings import settings
+
+# Libère / prolonge le verrou seulement s'il appartient encore à ce leader
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end
+return 0
+"""
+
+
+class LeaderFailed(Exception):
+    """Le leader n'a pas produit de réponse (erreur, client déconnecté)"""
+
+
+class Flight:
+    """
+    Participation à un calcul :
+    - result renseigné → réponse partagée (d'une autre requête ou d'un autre worker), rien à calculer
+    - sinon → calculer puis appeler resolve(réponse) pour les followers ; sans resolve
+      (erreur, réponse de repli), les followers reçoivent LeaderFailed et calculent eux-mêmes
+    """
+
+    def __init__(self, key: str, future: Optional[asyncio.Future] = None, result: Optional[Dict[str, Any]] = None):
+        self.key = key
+        self.result = result
+        self._future = future
+
+    @property
+    def shared(self) -> bool:
+        return self.result is not None
+
+    def resolve(self, result: Dict[str, Any]):
+        if self._future is not None and not self._future.done():
+            self._future.set_result(result)
+
+
+class SingleFlight:
+    """Regroupement des calculs identiques simultanés (clé = clé du cache de réponses)"""
+
+    def __init__(
+        self,
+        redis_cache: RedisCache,
+        lease: float = 10.0,
+        wait: float = 45.0,
+        poll_interval: float = 0.2,
+        enabled: bool = True
+    ):
+        self.redis_cache = redis_cache
+        self.lease_ms = int(lease * 1000)
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Stats
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+        self.fallbacks = 0
+
+    @asynccontextmanager
+    async def join(self, query: str) -> AsyncIterator[Flight]:
+        """
+        async with single_flight.join(message) as flight:
+            if flight.shared: return flight.result
+            ... calcul ...
+            flight.resolve(result)
+        """
+        key = self.redis_cache._get_hash(query)
+        if not self.enabled:
+            yield Flight(key)
+            return
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Follower local : shield, l'annulation d'un follower n'annule pas le leader
+            try:
+                result = await asyncio.shield(future)
+                self.followers += 1
+            except LeaderFailed:
+                self.fallbacks += 1
+                result = None
+            yield Flight(key, result=result)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        token, renewal = None, None
+        try:
+            token, result = await self._lead_remote(key, query)
+            if result is not None:
+                self.remote_followers += 1
+                future.set_result(result)
+                yield Flight(key, result=result)
+                return
+            if token is not None:
+                renewal = asyncio.create_task(self._renew(key, token))
+            self.leaders += 1
+            yield Flight(key, future=future)
+        finally:
+            if renewal is not None:
+                renewal.cancel()
+            if token is not None:
+                await self._release(key, token)
+            if not future.done():
+                future.set_exception(LeaderFailed())
+                future.exception()  # pas d'avertissement « exception never retrieved » sans follower
+            self._inflight.pop(key, None)
+
+    # ----- verrou Redis (entre workers) -----
+    def _lock_key(self, key: str) -> str:
+        return f"lock:{key}"
+
+    async def _lead_remote(self, key: str, query: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        (jeton du verrou, None) si ce worker devient leader ;
+        (None, réponse) si un autre worker l'a produite (avant la prise du verrou ou pendant l'attente) ;
+        (None, None) sans Redis, ou si l'autre leader a abandonné (calcul sans verrou)
+        """
+        client = self.redis_cache.redis_client
+        if not (self.redis_cache.use_redis and client):
+            return None, None
+
+        token = uuid.uuid4().hex
+        lock_key = self._lock_key(key)
+        try:
+            if await client.set(lock_key, token, nx=True, px=self.lease_ms):
+                # Le leader précédent a pu stocker sa réponse entre notre cache.get et ce verrou
+                result = await self.redis_cache.peek(query)
+                if result is None:
+                    return token, None
+                await self._release(key, token)
+                return None, result
+
+            deadline = time.monotonic() + self.wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                result = await self.redis_cache.peek(query)
+                if result is not None:
+                    return None, result
+                if not await client.exists(lock_key):
+                    break
+        except Exception as e:
+            print(f"⚠️  Single-flight Redis error: {e}")
+        self.fallbacks += 1
+        return None, None
+
+    async def _renew(self, key: str, token: str):
+        """Prolonge le bail tant que le leader calcule (un worker planté le libère vite)"""
+        client = self.redis_cache.redis_client
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                await client.eval(RENEW_SCRIPT, 1, self._lock_key(key), token, self.lease_ms)
+            except Exception as e:
+                print(f"⚠️  Single-flight renew error: {e}")
+                return
+
+    async def _release(self, key: str, token: str):
+        client = self.redis_cache.redis_client
+        if client is None:
+            return
+        try:
+            await client.eval(RELEASE_SCRIPT, 1, self._lock_key(key), token)
+        except Exception as e:
+            print(f"⚠️  Single-flight release error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "remote_followers": self.remote_followers,
+            "fallbacks": self.fallbacks,
+        }
+
+
+# Instance globale (par worker)
+single_flight = SingleFlight(
+    cache,
+    lease=settings.single_flight_lease,
+    wait=settings.single_flight_wait,
+    poll_interval=settings.single_flight_poll_interval,
+    enabled=settings.single_flight_enabled
+)
@@ -30,6 +30,10 @@ echo "🌐 Starting server on $HOST:$PORT"
 echo "👥 Workers: $WORKERS"
 echo "============================================"
 
+# Index partagés construits une fois avant le fork des workers, depuis les vecteurs du store (aucun appel Gemini ;
+# échec non bloquant : chaque worker construit alors les siens)
+python -m services.shared_index build || echo "⚠️ Index partagés non construits"
+
 # Lancer uvicorn via python module (pas de binaire direct)
 exec python -m uvicorn main:app \
     --host "$HOST" \
@@ -4,10 +4,13 @@ Migration progressive de Flask vers FastAPI
 """
 from fastapi import FastAPI, HTTPException, Request, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from dataclasses import replace
 from typing import Dict, Optional
 import time
+import json
+import asyncio
 from datetime import datetime
 import re
 
@@ -19,15 +22,20 @@ from models.schemas import (
     FeedbackRequest, FeedbackResponse
 )
 from core.cache import cache
+from core.single_flight import single_flight
 
 # Import services modulaires
 from services.rag import (
-    find_relevant_documents,
-    generate_with_gemini,
+    find_relevant_documents_async,
+    retrieval_executor,
+    generate_with_gemini_async,
+    stream_with_gemini,
+    gemini_health,
+    gemini_breaker,
     sanitize_input,
     validate_context,
     PROMPTS,
-    knowledge_base
+    current_knowledge_base
 )
 from services.memory import (
     get_conversation_history,
@@ -48,6 +56,12 @@ from services.analytics import (
     submit_feedback
 )
 from services.intent_service import detect_intent
+from services.facets import intent_facet
+from services.routing import route_message
+from services.model_tiers import select_tier
+from services.knowledge_reload import KnowledgeWatcher, reload_knowledge_base, knowledge_status
+from services.gemini_client import ClientDisconnected, until_disconnected
+from services.resilience import Deadline
 
 
 # ===== LIFECYCLE =====
@@ -57,7 +71,7 @@ async def lifespan(app: FastAPI):
     print("=" * 60)
     print("🚀 SERVEUR FASTAPI PHOENIX - VERSION 2.0")
     print("=" * 60)
-    print(f"📚 Base de connaissances: {len(knowledge_base)} documents")
+    print(f"📚 Base de connaissances: {len(current_knowledge_base())} documents")
     print(f"🔑 Gemini API: {'✅' if settings.gemini_api_key else '❌'}")
     print(f"🔐 Supabase: {'✅' if settings.supabase_url else '❌'}")
 
@@ -67,6 +81,12 @@ async def lifespan(app: FastAPI):
     print(f"💾 Cache: {cache_stats['backend'].upper()} - TTL {settings.cache_ttl_hours}h")
 
     print(f"📝 Prompts: {len(PROMPTS)} templates chargés")
+
+    # Rechargement à chaud : chaque worker surveille les fichiers de la knowledge base
+    watcher = None
+    if settings.kb_watch_interval > 0:
+        watcher = KnowledgeWatcher(settings.kb_watch_interval)
+        watcher.start()
     print("=" * 60)
     print(f"📍 Listening on: {settings.host}:{settings.port}")
     print("=" * 60)
@@ -74,6 +94,9 @@ async def lifespan(app: FastAPI):
     yield
 
     print("\n🛑 Arrêt du serveur...")
+    if watcher:
+        watcher.stop()
+    retrieval_executor.shutdown()
     await cache.disconnect()
 
 
@@ -137,16 +160,196 @@ from services.auth import get_current_user, get_current_user_optional, require_a
 async def health_check():
     """🏥 Health check"""
     stats = await cache.get_stats()
+    stats["single_flight"] = single_flight.stats()
+
+    # Circuit Gemini ouvert : le service répond, en mode dégradé (réponses de repli)
+    breaker_state = gemini_breaker.stats()["state"]
 
     return HealthResponse(
-        status="healthy",
+        status="healthy" if breaker_state == "closed" else "degraded",
         version=settings.app_version,
         gemini_available=bool(settings.gemini_api_key),
         supabase_available=bool(settings.supabase_url),
-        cache_stats=stats
+        cache_stats=stats,
+        generation_stats=gemini_health()
+    )
+
+
+def chat_response(data: Dict, cached: bool = False) -> ChatResponse:
+    """Réponse de l'API depuis le dict stocké en cache"""
+    return ChatResponse(
+        response=data['answer'],
+        sources=data.get('sources', []),
+        suggestions=data.get('suggestions', []),
+        cached=cached,
+        situation=data.get('situation'),
+        priority=data.get('priority'),
+        next_step=data.get('next_step')
     )
 
 
+async def prepare_chat_prompt(message: str, user_id: str, detected_intent: str):
+    """
+    Historique, mémoires, routage et recherche documentaire → (prompt Gemini, décision de routage)
+    Partagé par /api/chat/send et /api/chat/stream
+    """
+    # 💭 Récupérer l'historique de conversation
+    conversation_history = get_conversation_history(user_id)
+    has_history = len(conversation_history) > 0
+
+    # 🧠 Récupérer les mémoires à long terme
+    user_memories = fetch_user_memories(user_id, limit=5)
+
+    # 🚦 Routage : small talk / épuisement sans sujet → ni embedding, ni recherche
+    route = await retrieval_executor.run(route_message, message, detected_intent, current_knowledge_base())
+    print(f"🚦 Route: {route.route} ({route.reason})")
+
+    # Recherche documents pertinents (embedding via cache LRU/Redis, scoring hors event loop)
+    relevant_docs = []
+    if route.retrieval:
+        relevant_docs = await find_relevant_documents_async(message, facet=intent_facet(detected_intent))
+
+    # 🎚️ Modèle de génération selon la route, la complexité du message et les sources trouvées
+    tier = select_tier(route, message, relevant_docs)
+    route = replace(route, tier=tier.tier)
+    print(f"🎚️ Tier: {tier.tier} ({tier.reason}, complexité {tier.complexity})")
+
+    # 📝 CONSTRUCTION DU PROMPT
+    if relevant_docs:
+        sources_list = "\n".join([
+            f"- {doc['title']} (pertinence: {doc['score']})"
+            for doc in relevant_docs
+        ])
+
+        context = "\n\n---\n\n".join([
+            f"📄 SOURCE: {doc['title']}\n\n{doc['content']}"
+            for doc in relevant_docs
+        ])
+
+        # Historique
+        history_text = ""
+        if has_history:
+            history_text = "\n💭 HISTORIQUE RÉCENT DE LA CONVERSATION:\n"
+            for idx, exchange in enumerate(conversation_history[-3:], 1):
+                history_text += f"{idx}. Utilisateur: {exchange['user']}\n"
+                history_text += f"   Toi: {exchange['assistant'][:100]}...\n\n"
+
+        # Mémoires
+        memories_text = ""
+        if user_memories:
+            memories_text = "\n🧠 CE QUE JE SAIS SUR CET UTILISATEUR :\n"
+            for idx, memory in enumerate(user_memories, 1):
+                memory_content = memory.get('memory_content', '')
+                memory_type = memory.get('memory_type', 'general')
+                importance = memory.get('importance_score', 5)
+                memories_text += f"{idx}. [{memory_type}] {memory_content} (importance: {importance}/10)\n"
+            memories_text += "\n⚠️ UTILISE CES MÉMOIRES pour personnaliser tes réponses !\n"
+
+        prompt_template = PROMPTS.get('chat_with_sources', "Tu es PhoenixIA...")
+        prompt = prompt_template.format(
+            history_text=history_text,
+            memories_text=memories_text,
+            context_text="",
+            sources_list=sources_list,
+            context=context,
+            message=message,
+            intent_info=detected_intent # New intent info
+        )
+    else:
+        # Sans sources
+        history_text = ""
+        if has_history:
+            history_text = "\n💭 HISTORIQUE RÉCENT:\n"
+            for idx, exchange in enumerate(conversation_history[-3:], 1):
+                history_text += f"{idx}. Utilisateur: {exchange['user']}\n"
+                history_text += f"   Toi: {exchange['assistant'][:100]}...\n\n"
+
+        memories_text = ""
+        if user_memories:
+            memories_text = "\n🧠 CE QUE JE SAIS SUR CET UTILISATEUR :\n"
+            for idx, memory in enumerate(user_memories, 1):
+                memories_text += f"{idx}. {memory.get('memory_content', '')}\n"
+
+        # Prompt léger si la recherche a été court-circuitée par le routage
+        prompt_name = 'chat_without_sources' if route.retrieval else 'chat_light'
+        prompt_template = PROMPTS.get(prompt_name) or PROMPTS.get('chat_without_sources', "Tu es PhoenixIA...")
+        prompt = prompt_template.format(
+            history_text=history_text,
+            memories_text=memories_text,
+            message=message,
+            intent_info=detected_intent # New intent info
+        )
+
+    return prompt, route
+
+
+async def record_chat_turn(
+    background_tasks: BackgroundTasks,
+    user_id: str,
+    message: str,
+    detected_intent: str,
+    route,
+    gemini_response_dict: Dict,
+    start_time: float
+) -> Dict:
+    """Cache, mémoire conversationnelle et tâches de fond (Supabase, état guidé, analytics) d'un échange"""
+    answer = gemini_response_dict.get("answer", "Je n'ai pas pu générer de réponse.")
+    situation = gemini_response_dict.get("situation")
+    priority = gemini_response_dict.get("priority")
+    next_step = gemini_response_dict.get("next_step")
+    sources = gemini_response_dict.get("sources", [])
+    suggestions = gemini_response_dict.get("suggestions", [])
+
+    processing_time = round(time.time() - start_time, 2)
+
+    result = {
+        "answer": answer,
+        "sources": sources,
+        "suggestions": suggestions,
+        "situation": situation,
+        "priority": priority,
+        "next_step": next_step,
+        "processing_time": processing_time,
+        "timestamp": datetime.now().isoformat(),
+        "from_cache": False
+    }
+
+    # 💾 STOCKER DANS LE CACHE (ASYNC) — sauf réponse de repli (Gemini indisponible)
+    if not gemini_response_dict.get("degraded"):
+        await cache.set(message, result)
+
+    # 💭 AJOUTER À LA MÉMOIRE
+    add_to_conversation(user_id, message, answer)
+
+    # 💾 SAUVEGARDER DANS SUPABASE (BACKGROUND TASK - non-bloquant)
+    background_tasks.add_task(
+        save_conversation_to_supabase,
+        user_id, message, answer, sources
+    )
+
+    # 💾 SAUVEGARDER LE DERNIER ÉTAT GUIDÉ (BACKGROUND TASK - non-bloquant)
+    if situation and priority and next_step: # Sauvegarder seulement si les champs sont présents
+        background_tasks.add_task(
+            save_last_guided_state,
+            user_id, situation, priority, next_step
+        )
+
+    # 📊 LOG ANALYTICS (BACKGROUND TASK - non-bloquant)
+    background_tasks.add_task(
+        log_chat_interaction,
+        user_id, message, answer, sources, suggestions,
+        False,  # cached (on log que les non-cached pour l'instant)
+        int(processing_time * 1000),  # Convert to ms
+        detected_intent,
+        next_step,
+        route.route,
+        route.reason
+    )
+
+    print(f"✅ Réponse générée: {len(answer)} chars, {processing_time}s")
+    return result
+
+
 @app.post("/api/chat/send", response_model=ChatResponse)
 async def chat_send(
     chat_request: ChatRequest,
@@ -157,6 +360,8 @@ async def chat_send(
 ):
     """🚀 Endpoint principal pour le chat RAG (ASYNC)"""
     start_time = time.time()
+    # ⏱️ Budget de temps de la requête, partagé par les tentatives Gemini
+    deadline = Deadline(settings.chat_deadline)
 
     try:
         # Sanitize input
@@ -175,154 +380,33 @@ async def chat_send(
         cached_response = await cache.get(message)
         if cached_response:
             print(f"⚡ Réponse depuis le cache!")
-            return ChatResponse(
-                response=cached_response['answer'],
-                sources=cached_response.get('sources', []),
-                suggestions=cached_response.get('suggestions', []),
-                cached=True,
-                situation=cached_response.get('situation'),
-                priority=cached_response.get('priority'),
-                next_step=cached_response.get('next_step')
-            )
+            return chat_response(cached_response, cached=True)
 
-        # 💭 Récupérer l'historique de conversation
-        conversation_history = get_conversation_history(user_id)
-        has_history = len(conversation_history) > 0
-
-        # 🧠 Récupérer les mémoires à long terme
-        user_memories = fetch_user_memories(user_id, limit=5)
-
-        # Recherche documents pertinents
-        relevant_docs = find_relevant_documents(message)
-
-        # 📝 CONSTRUCTION DU PROMPT
-        if relevant_docs:
-            sources_list = "\n".join([
-                f"- {doc['title']} (pertinence: {doc['score']})"
-                for doc in relevant_docs
-            ])
-
-            context = "\n\n---\n\n".join([
-                f"📄 SOURCE: {doc['title']}\n\n{doc['content']}"
-                for doc in relevant_docs
-            ])
-
-            # Historique
-            history_text = ""
-            if has_history:
-                history_text = "\n💭 HISTORIQUE RÉCENT DE LA CONVERSATION:\n"
-                for idx, exchange in enumerate(conversation_history[-3:], 1):
-                    history_text += f"{idx}. Utilisateur: {exchange['user']}\n"
-                    history_text += f"   Toi: {exchange['assistant'][:100]}...\n\n"
-
-            # Mémoires
-            memories_text = ""
-            if user_memories:
-                memories_text = "\n🧠 CE QUE JE SAIS SUR CET UTILISATEUR :\n"
-                for idx, memory in enumerate(user_memories, 1):
-                    memory_content = memory.get('memory_content', '')
-                    memory_type = memory.get('memory_type', 'general')
-                    importance = memory.get('importance_score', 5)
-                    memories_text += f"{idx}. [{memory_type}] {memory_content} (importance: {importance}/10)\n"
-                memories_text += "\n⚠️ UTILISE CES MÉMOIRES pour personnaliser tes réponses !\n"
-
-            prompt_template = PROMPTS.get('chat_with_sources', "Tu es PhoenixIA...")
-            prompt = prompt_template.format(
-                history_text=history_text,
-                memories_text=memories_text,
-                context_text="",
-                sources_list=sources_list,
-                context=context,
-                message=message,
-                intent_info=detected_intent # New intent info
-            )
-        else:
-            # Sans sources
-            history_text = ""
-            if has_history:
-                history_text = "\n💭 HISTORIQUE RÉCENT:\n"
-                for idx, exchange in enumerate(conversation_history[-3:], 1):
-                    history_text += f"{idx}. Utilisateur: {exchange['user']}\n"
-                    history_text += f"   Toi: {exchange['assistant'][:100]}...\n\n"
-
-            memories_text = ""
-            if user_memories:
-                memories_text = "\n🧠 CE QUE JE SAIS SUR CET UTILISATEUR :\n"
-                for idx, memory in enumerate(user_memories, 1):
-                    memories_text += f"{idx}. {memory.get('memory_content', '')}\n"
-
-            prompt_template = PROMPTS.get('chat_without_sources', "Tu es PhoenixIA...")
-            prompt = prompt_template.format(
-                history_text=history_text,
-                memories_text=memories_text,
-                message=message,
-                intent_info=detected_intent # New intent info
-            )
+        # 🛬 Même question déjà en cours de génération (ce worker ou un autre) → on attend sa réponse
+        async with single_flight.join(message) as flight:
+            if flight.shared:
+                print(f"🛬 Réponse partagée avec une requête identique en cours")
+                return chat_response(flight.result, cached=True)
 
-        # 🔐 Génération avec Gemini
-        gemini_response_dict = generate_with_gemini(prompt, max_retries=3)
-
-        answer = gemini_response_dict.get("answer", "Je n'ai pas pu générer de réponse.")
-        situation = gemini_response_dict.get("situation")
-        priority = gemini_response_dict.get("priority")
-        next_step = gemini_response_dict.get("next_step")
-        sources = gemini_response_dict.get("sources", [])
-        suggestions = gemini_response_dict.get("suggestions", [])
-
-        processing_time = round(time.time() - start_time, 2)
-
-        result = {
-            "answer": answer,
-            "sources": sources,
-            "suggestions": suggestions,
-            "situation": situation,
-            "priority": priority,
-            "next_step": next_step,
-            "processing_time": processing_time,
-            "timestamp": datetime.now().isoformat(),
-            "from_cache": False
-        }
-
-        # 💾 STOCKER DANS LE CACHE (ASYNC)
-        await cache.set(message, result)
-
-        # 💭 AJOUTER À LA MÉMOIRE
-        add_to_conversation(user_id, message, answer)
-
-        # 💾 SAUVEGARDER DANS SUPABASE (BACKGROUND TASK - non-bloquant)
-        background_tasks.add_task(
-            save_conversation_to_supabase,
-            user_id, message, answer, sources
-        )
+            prompt, route = await prepare_chat_prompt(message, user_id, detected_intent)
 
-        # 💾 SAUVEGARDER LE DERNIER ÉTAT GUIDÉ (BACKGROUND TASK - non-bloquant)
-        if situation and priority and next_step: # Sauvegarder seulement si les champs sont présents
-            background_tasks.add_task(
-                save_last_guided_state,
-                user_id, situation, priority, next_step
+            # 🔐 Génération avec Gemini (async, concurrence bornée, annulée si le client se déconnecte)
+            gemini_response_dict = await until_disconnected(
+                generate_with_gemini_async(prompt, deadline, route.tier), request.is_disconnected, settings.disconnect_poll_interval
             )
 
-        # 📊 LOG ANALYTICS (BACKGROUND TASK - non-bloquant)
-        background_tasks.add_task(
-            log_chat_interaction,
-            user_id, message, answer, sources, suggestions,
-            False,  # cached (on log que les non-cached pour l'instant)
-            int(processing_time * 1000),  # Convert to ms
-            detected_intent,
-            next_step
-        )
-
-        print(f"✅ Réponse générée: {len(answer)} chars, {processing_time}s")
+            result = await record_chat_turn(
+                background_tasks, user_id, message, detected_intent, route, gemini_response_dict, start_time
+            )
+            # Réponse de repli : ni cache, ni partage (les followers retentent eux-mêmes)
+            if not gemini_response_dict.get("degraded"):
+                flight.resolve(result)
+        return chat_response(result)
 
-        return ChatResponse(
-            response=answer,
-            sources=sources,
-            suggestions=suggestions,
-            cached=False,
-            situation=situation,
-            priority=priority,
-            next_step=next_step
-        )
+    except ClientDisconnected:
+        # Personne pour lire la réponse : ni cache, ni mémoire, ni analytics
+        print(f"🔌 Client déconnecté, génération annulée ({round(time.time() - start_time, 2)}s)")
+        return JSONResponse(status_code=499, content={"detail": "Client déconnecté"})
 
     except Exception as e:
         print(f"❌ Erreur RAG: {e}")
@@ -332,6 +416,83 @@ async def chat_send(
         )
 
 
+def sse_event(event: str, data) -> str:
+    """Message Server-Sent Events (data en JSON sur une ligne)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    chat_request: ChatRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user = Depends(get_current_user_optional),
+    rate_limit_check = Depends(check_rate_limit)
+):
+    """
+    🌊 Chat RAG en streaming (Server-Sent Events)
+    - event "answer" : {"delta": "..."} texte de la réponse au fil de la génération
+    - event "field" : {"name": "situation" | "priority" | "next_step" | "sources" | "suggestions", "value": ...}
+      dès que le champ est complet
+    - event "done" : ChatResponse complète (fait foi : remplace le texte reçu par deltas)
+    - event "error" : {"detail": "..."}
+    Cache, mémoire et tâches de fond comme /api/chat/send, à la fin du flux.
+    """
+    start_time = time.time()
+    deadline = Deadline(settings.chat_deadline)
+
+    # Avant le flux : une requête refusée (prompt injection) reçoit une vraie réponse HTTP d'erreur
+    try:
+        message = sanitize_input(chat_request.message, max_length=2000)
+    except ValueError as e:
+        print(f"🚨 Requête streaming refusée: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    detected_intent = detect_intent(message)
+    user_id = current_user["id"] if current_user else chat_request.user_id
+    print(f"🌊 Requête streaming: {message[:50]}... (user: {user_id}, intention: {detected_intent})")
+
+    cached_response = await cache.get(message)
+
+    async def events():
+        if cached_response:
+            print(f"⚡ Réponse depuis le cache!")
+            yield sse_event("done", chat_response(cached_response, cached=True).model_dump())
+            return
+
+        try:
+            async with single_flight.join(message) as flight:
+                if flight.shared:
+                    yield sse_event("done", chat_response(flight.result, cached=True).model_dump())
+                    return
+
+                prompt, route = await prepare_chat_prompt(message, user_id, detected_intent)
+                async for kind, value in stream_with_gemini(prompt, deadline, route.tier):
+                    if kind == "delta":
+                        yield sse_event("answer", {"delta": value})
+                    elif kind == "field":
+                        name, field_value = value
+                        if name != "answer":
+                            yield sse_event("field", {"name": name, "value": field_value})
+                    else:
+                        result = await record_chat_turn(
+                            background_tasks, user_id, message, detected_intent, route, value, start_time
+                        )
+                        if not value.get("degraded"):
+                            flight.resolve(result)
+                        yield sse_event("done", chat_response(result).model_dump())
+        except Exception as e:
+            print(f"❌ Erreur RAG (streaming): {e}")
+            yield sse_event("error", {"detail": f"Erreur lors de la génération: {str(e)}"})
+
+    # Tâches de fond ajoutées pendant le flux : exécutées par Starlette une fois le flux terminé
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
+
 @app.get("/api/cache/stats", response_model=CacheStats)
 async def get_cache_stats():
     """📊 Statistiques du cache"""
@@ -405,6 +566,36 @@ async def clear_memory(user_id: str):
     return {"message": "Aucune mémoire trouvée"}
 
 
+# ===== KNOWLEDGE BASE (ADMIN) =====
+
+@app.post("/api/admin/knowledge/reload")
+async def admin_reload_knowledge(
+    background_tasks: BackgroundTasks,
+    wait: bool = True,
+    user = Depends(require_admin)
+):
+    """
+    🔄 Recharge la knowledge base (corpus + index) sans redémarrer.
+    Les requêtes en cours restent servies par l'ancienne version jusqu'à la bascule.
+    Embeddings et store mis à jour par ce worker ; les autres suivent via leur watcher
+    (fichiers de la KB ou manifest du store), sans ré-embedder.
+    """
+    if not wait:
+        background_tasks.add_task(asyncio.to_thread, reload_knowledge_base, None, "admin")
+        return {"status": "started", "version": knowledge_status()["version"]}
+
+    report = await asyncio.to_thread(reload_knowledge_base, None, "admin")
+    if report["status"] == "failed":
+        raise HTTPException(status_code=500, detail=report)
+    return report
+
+
+@app.get("/api/admin/knowledge/status")
+async def admin_knowledge_status(user = Depends(require_admin)):
+    """📚 Version servie de la knowledge base et dernier rechargement"""
+    return knowledge_status()
+
+
 # ===== ANALYTICS ENDPOINTS =====
 
 @app.get("/api/analytics/overview")
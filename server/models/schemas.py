@@ -95,6 +95,7 @@ class CacheStats(BaseModel):
     misses: int
     size: int
     hit_rate: float
+    query_embeddings: Optional[Dict[str, Any]] = None
 
 
 class MemoryStats(BaseModel):
@@ -130,3 +131,4 @@ class HealthResponse(BaseModel):
     gemini_available: bool
     supabase_available: bool
     cache_stats: Optional[Dict[str, Any]] = None
+    generation_stats: Optional[Dict[str, Any]] = None
@@ -28,7 +28,9 @@ def log_chat_interaction(
     cached: bool,
     processing_time_ms: int,
     detected_intent: str,
-    next_step: Optional[str]
+    next_step: Optional[str],
+    route: Optional[str] = None,
+    route_reason: Optional[str] = None
 ) -> bool:
     """
     📝 Log une interaction chat dans Supabase Analytics
@@ -43,6 +45,8 @@ def log_chat_interaction(
         processing_time_ms: Temps de traitement en ms
         detected_intent: Intention détectée pour la question
         next_step: La prochaine étape suggérée par le guide
+        route: Décision du routage ("retrieval" ou "light", voir services/routing.py)
+        route_reason: Raison de la décision (small_talk, fatigue_low_confidence...)
 
     Returns:
         True si succès, False sinon
@@ -68,6 +72,9 @@ def log_chat_interaction(
             "detected_intent": detected_intent,
             "next_step_proposed": next_step,
         }
+        if route:
+            data["retrieval_route"] = route
+            data["route_reason"] = route_reason
 
         result = client.table("chat_analytics").insert(data).execute()
 
@@ -0,0 +1,229 @@
+"""
+✂️ Découpage des documents de la knowledge base en passages
+
+- Découpage aligné sur les sections (« CONDITIONS: », « DÉMARCHES: », **TITRES**, ## titres)
+- Petites sections regroupées jusqu'à max_chars
+- Sections trop longues découpées en fenêtres de lignes qui se chevauchent
+- Un document court reste un seul passage, d'id = doc_id (son embedding existant est réutilisé)
+"""
+import re
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from services.vector_index import VectorIndex, top_k_indices
+
+# Titres de section reconnus (ligne entière)
+HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+(?P<heading>.+?)\s*$"),
+    re.compile(r"^\W{0,4}\*\*(?P<heading>[^*]+?)\*\*\s*:?\s*$"),
+    re.compile(r"^(?P<heading>[A-ZÀ-ÖØ-Þ0-9][A-ZÀ-ÖØ-Þ0-9 '’()/&+-]{2,}?)\s*:(?:\s+.*)?$"),
+]
+
+PASSAGE_SEPARATOR = "\n[...]\n"
+
+
+@dataclass(frozen=True)
+class Passage:
+    """Passage d'un document (unité d'embedding et de retrieval)"""
+    id: str
+    doc_id: str
+    title: str
+    heading: str
+    text: str
+    position: int
+
+
+def passage_id(doc_id: str, position: int) -> str:
+    return f"{doc_id}#{position}"
+
+
+def detect_heading(line: str) -> str:
+    """Titre de section si la ligne en est un, sinon chaîne vide"""
+    stripped = line.strip()
+    for pattern in HEADING_PATTERNS:
+        match = pattern.match(stripped)
+        if match:
+            return match.group("heading").strip(" :")
+    return ""
+
+
+def split_sections(content: str) -> List[Tuple[str, List[str]]]:
+    """[(titre, lignes)] ; le texte avant le premier titre a un titre vide"""
+    sections: List[Tuple[str, List[str]]] = []
+    heading, lines = "", []
+    for line in content.strip().splitlines():
+        line_heading = detect_heading(line)
+        if line_heading and any(l.strip() for l in lines):
+            sections.append((heading, lines))
+            heading, lines = line_heading, [line]
+        else:
+            if line_heading and not heading:
+                heading = line_heading
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, lines))
+    return sections
+
+
+def _split_long_section(heading: str, lines: List[str], max_chars: int, overlap: int) -> List[str]:
+    """Fenêtres de lignes ≤ max_chars, chaque fenêtre reprend ~overlap caractères de la précédente"""
+    heading_line = lines[0] if heading and detect_heading(lines[0]) else ""
+    body = lines[1:] if heading_line else lines
+
+    windows, current, size = [], [], 0
+    for line in body:
+        if current and size + len(line) + 1 > max_chars:
+            windows.append(current)
+            # Chevauchement : dernières lignes de la fenêtre précédente
+            carried, carried_size = [], 0
+            for previous in reversed(current):
+                if carried_size >= overlap:
+                    break
+                carried.insert(0, previous)
+                carried_size += len(previous) + 1
+            current, size = carried, carried_size
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        windows.append(current)
+
+    # Chaque fenêtre garde le titre de sa section
+    prefix = [heading_line] if heading_line else []
+    return ["\n".join(prefix + window) for window in windows]
+
+
+def chunk_document(
+    doc_id: str,
+    doc: Dict,
+    max_chars: int = 1200,
+    overlap: int = 200
+) -> List[Passage]:
+    """Découpe un document en passages (un seul passage si le document est court)"""
+    content = doc.get("content", "")
+    title = doc.get("title", "")
+
+    if len(content.strip()) <= max_chars:
+        return [Passage(id=doc_id, doc_id=doc_id, title=title, heading="", text=content, position=0)]
+
+    texts: List[Tuple[str, str]] = []
+    group_heading, group_lines = "", []
+    for heading, lines in split_sections(content):
+        section_size = sum(len(line) + 1 for line in lines)
+        group_size = sum(len(line) + 1 for line in group_lines)
+
+        if group_lines and group_size + section_size > max_chars:
+            texts.append((group_heading, "\n".join(group_lines).strip()))
+            group_heading, group_lines = "", []
+
+        if section_size > max_chars:
+            for window in _split_long_section(heading, lines, max_chars, overlap):
+                texts.append((heading, window.strip()))
+            continue
+
+        if not group_lines:
+            group_heading = heading
+        group_lines.extend(lines)
+
+    if group_lines:
+        texts.append((group_heading, "\n".join(group_lines).strip()))
+
+    return [
+        Passage(id=passage_id(doc_id, position), doc_id=doc_id, title=title, heading=heading, text=text, position=position)
+        for position, (heading, text) in enumerate(texts)
+        if text
+    ]
+
+
+def chunk_knowledge_base(
+    knowledge_base: Dict[str, Dict],
+    max_chars: int = 1200,
+    overlap: int = 200
+) -> List[Passage]:
+    """Passages de toute la KB, dans l'ordre des documents (contigus par document)"""
+    passages: List[Passage] = []
+    for doc_id, doc in knowledge_base.items():
+        passages.extend(chunk_document(doc_id, doc, max_chars=max_chars, overlap=overlap))
+    return passages
+
+
+def passage_embedding_text(passage: Passage) -> str:
+    """Texte à encoder : titre du document + passage (identique au document entier s'il est court)"""
+    return f"{passage.title}\n\n{passage.text}"
+
+
+def join_passages(passages: List[Passage]) -> str:
+    """Contenu envoyé au prompt : passages dans l'ordre du document"""
+    ordered = sorted(passages, key=lambda passage: passage.position)
+    return PASSAGE_SEPARATOR.join(passage.text.strip() for passage in ordered)
+
+
+class PassageIndex:
+    """
+    🧩 Index vectoriel de passages + regroupement par document parent
+    Les passages d'un même document sont contigus : le score d'un document
+    (meilleur passage) s'obtient avec np.maximum.reduceat
+    """
+
+    def __init__(self, passages: List[Passage], vectors: VectorIndex):
+        self.passages = passages
+        self.vectors = vectors
+        self.doc_ids: List[str] = []
+        offsets: List[int] = []
+        for row, passage in enumerate(passages):
+            if not self.doc_ids or self.doc_ids[-1] != passage.doc_id:
+                self.doc_ids.append(passage.doc_id)
+                offsets.append(row)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.doc_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_row
+
+    def score(self, query_vector: Sequence[float]) -> np.ndarray:
+        """Similarité cosinus de la requête avec tous les passages"""
+        return self.vectors.score(query_vector)
+
+    def score_many(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Similarités (requêtes × passages) de plusieurs requêtes à la fois"""
+        return self.vectors.score_many(query_vectors)
+
+    def doc_scores(self, passage_scores: np.ndarray) -> np.ndarray:
+        """Score de chaque document = score de son meilleur passage (dernier axe si plusieurs requêtes)"""
+        if not len(self.passages):
+            return np.zeros(passage_scores.shape[:-1] + (0,), dtype=np.float32)
+        return np.maximum.reduceat(passage_scores, self.offsets, axis=-1)
+
+    def best_passages(
+        self,
+        doc_id: str,
+        passage_scores: np.ndarray,
+        max_passages: int = 2,
+        min_score: float = 0.0
+    ) -> List[Tuple[Passage, float]]:
+        """Meilleurs passages d'un document (toujours au moins le meilleur)"""
+        row = self.doc_row[doc_id]
+        start = int(self.offsets[row])
+        end = int(self.offsets[row + 1]) if row + 1 < len(self.offsets) else len(self.passages)
+        ranked = sorted(range(start, end), key=lambda i: passage_scores[i], reverse=True)
+        selected = [ranked[0]] + [i for i in ranked[1:max_passages] if passage_scores[i] >= min_score]
+        return [(self.passages[i], float(passage_scores[i])) for i in selected]
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int = 3,
+        threshold: float = 0.0
+    ) -> Tuple[List[Tuple[str, float]], np.ndarray]:
+        """Top K (doc_id, score) au-dessus du seuil + scores de tous les passages"""
+        passage_scores = self.score(query_vector)
+        doc_scores = self.doc_scores(passage_scores)
+        results = [
+            (self.doc_ids[row], float(doc_scores[row]))
+            for row in top_k_indices(doc_scores, top_k)
+            if doc_scores[row] >= threshold
+        ]
+        return results, passage_scores
@@ -0,0 +1,229 @@
+"""
+📚 Corpus unifié de la knowledge base
+
+Fusionne plusieurs fichiers JSON {doc_id: {title, content, keywords}} en un seul
+dictionnaire de documents, indexé une seule fois (BM25, passages, vecteurs) :
+
+- Même id + même contenu dans deux fichiers → dédoublonné (mots-clés fusionnés)
+- Même id + contenu différent → le second est renommé « namespace:doc_id » (warning)
+- Métadonnées par fichier source (nombre de documents, hash, date de modification)
+"""
+import json
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from config.settings import settings
+from services.facets import build_partitions, facet_counts
+
+KB_DIR = Path(__file__).parent.parent / 'config'
+NAMESPACE_SEPARATOR = ":"
+
+
+@dataclass
+class SourceInfo:
+    """Fichier source du corpus et bilan de sa fusion"""
+    name: str
+    namespace: str
+    path: Optional[str] = None
+    sha256: Optional[str] = None
+    modified_at: Optional[float] = None
+    documents: int = 0
+    added: int = 0
+    duplicates: int = 0
+    renamed: int = 0
+    invalid: int = 0
+
+
+def source_namespace(name: str) -> str:
+    """« knowledge_base_maladies_2025.json » → « maladies_2025 »"""
+    stem = Path(name).stem
+    if stem.startswith("knowledge_base_"):
+        stem = stem[len("knowledge_base_"):]
+    return stem
+
+
+def same_document(doc1: Dict, doc2: Dict) -> bool:
+    """Deux documents sont identiques si titre et contenu le sont (ce qui est embeddé)"""
+    return doc1.get("title") == doc2.get("title") and doc1.get("content") == doc2.get("content")
+
+
+class Corpus:
+    """
+    🗂️ Documents de tous les fichiers de la knowledge base
+    `documents` est le dict passé aux recherches : les index sont construits
+    une fois pour ce dict et reconstruits seulement s'il est remplacé.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Dict] = {}
+        self.doc_sources: Dict[str, str] = {}
+        self.sources: Dict[str, SourceInfo] = {}
+        self.collisions: List[Dict[str, str]] = []
+        # Facettes par document et partitions de recherche (voir services/facets.py)
+        self.facets: Dict[str, Tuple[str, ...]] = {}
+        self.partitions: Dict[str, Dict[str, Dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def source_of(self, doc_id: str) -> Optional[str]:
+        """Nom du fichier qui a fourni ce document"""
+        return self.doc_sources.get(doc_id)
+
+    def add_source(
+        self,
+        name: str,
+        documents: Dict[str, Dict],
+        namespace: Optional[str] = None,
+        path: Optional[Path] = None,
+        sha256: Optional[str] = None
+    ) -> SourceInfo:
+        """Fusionne les documents d'une source dans le corpus"""
+        info = SourceInfo(
+            name=name,
+            namespace=namespace if namespace is not None else source_namespace(name),
+            path=str(path) if path else None,
+            sha256=sha256,
+            modified_at=path.stat().st_mtime if path else None,
+            documents=len(documents)
+        )
+
+        for doc_id, doc in documents.items():
+            if not isinstance(doc, dict) or not doc.get("title") or not doc.get("content"):
+                info.invalid += 1
+                print(f"⚠️ [{name}] Document ignoré (title/content manquant): {doc_id}")
+                continue
+
+            existing = self.documents.get(doc_id)
+            if existing is None:
+                self._add(doc_id, doc, name)
+                info.added += 1
+                continue
+
+            if same_document(existing, doc):
+                # Doublon exact : on garde le premier, enrichi des mots-clés du second
+                keywords = existing.get("keywords", [])
+                extra = [keyword for keyword in doc.get("keywords", []) if keyword not in keywords]
+                if extra:
+                    existing["keywords"] = keywords + extra
+                info.duplicates += 1
+                continue
+
+            # Contenu différent : renommé dans l'espace de noms de la source
+            renamed = f"{info.namespace}{NAMESPACE_SEPARATOR}{doc_id}"
+            if renamed in self.documents:
+                info.invalid += 1
+                print(f"⚠️ [{name}] Collision non résolue, document ignoré: {doc_id}")
+                continue
+            self._add(renamed, doc, name)
+            self.collisions.append({
+                "id": doc_id,
+                "renamed": renamed,
+                "source": name,
+                "existing_source": self.doc_sources[doc_id]
+            })
+            info.renamed += 1
+            print(f"⚠️ [{name}] Collision d'id « {doc_id} » (contenu différent de {self.doc_sources[doc_id]}) → « {renamed} »")
+
+        self.sources[name] = info
+        return info
+
+    def tag_facets(self):
+        """Facettes de chaque document et partitions associées (après fusion des sources)"""
+        self.facets, self.partitions = build_partitions(self.documents)
+
+    def _add(self, doc_id: str, doc: Dict, source: str):
+        self.documents[doc_id] = dict(doc)
+        self.doc_sources[doc_id] = source
+
+    def stats(self) -> Dict:
+        """Résumé du corpus (documents, sources, collisions)"""
+        return {
+            "documents": len(self.documents),
+            "sources": {
+                name: {
+                    "documents": info.documents,
+                    "added": info.added,
+                    "duplicates": info.duplicates,
+                    "renamed": info.renamed,
+                    "invalid": info.invalid,
+                    "sha256": info.sha256,
+                }
+                for name, info in self.sources.items()
+            },
+            "collisions": len(self.collisions),
+            "facets": facet_counts(self.partitions)
+        }
+
+    @property
+    def fingerprint(self) -> str:
+        """Empreinte du contenu des fichiers sources (identique dans tous les workers)"""
+        digest = hashlib.sha256()
+        for name, info in self.sources.items():
+            digest.update(f"{name}:{info.sha256}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def build_indexes(self, embed: bool = True):
+        """
+        Construit en une passe les index BM25, passages, embeddings et vecteurs du corpus et de ses partitions.
+        embed=False : vecteurs du store uniquement (aucun appel Gemini)
+        """
+        # Import tardif : semantic_search configure Gemini
+        from services.semantic_search import initialize_semantic_search
+        initialize_semantic_search(self.documents, self.partitions, embed=embed)
+
+
+def resolve_paths(
+    files: Optional[Iterable[Union[str, Path]]] = None,
+    directory: Path = KB_DIR
+) -> List[Path]:
+    """Chemins des fichiers de la knowledge base (relatifs à config/ par défaut)"""
+    paths = []
+    for file in (files if files is not None else settings.knowledge_base_files_list):
+        path = Path(file)
+        if not path.is_absolute() and not path.exists():
+            path = Path(directory) / path
+        paths.append(path)
+    return paths
+
+
+def load_corpus(
+    files: Optional[Iterable[Union[str, Path]]] = None,
+    directory: Path = KB_DIR
+) -> Corpus:
+    """
+    Charge et fusionne les fichiers de la knowledge base, dans l'ordre
+    (le premier fichier est prioritaire en cas de collision).
+    Un fichier absent ou invalide est ignoré avec un warning.
+    """
+    corpus = Corpus()
+    for path in resolve_paths(files, directory):
+        if not path.exists():
+            print(f"⚠️ Fichier knowledge base introuvable: {path}")
+            continue
+
+        try:
+            raw = path.read_bytes()
+            documents = json.loads(raw.decode("utf-8"))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"❌ Erreur JSON dans {path.name}: {e}")
+            continue
+        if not isinstance(documents, dict):
+            print(f"❌ {path.name}: un objet {{doc_id: document}} est attendu")
+            continue
+
+        info = corpus.add_source(path.name, documents, path=path, sha256=hashlib.sha256(raw).hexdigest())
+        print(
+            f"📄 {path.name}: {info.added} ajoutés, {info.duplicates} doublons, "
+            f"{info.renamed} renommés, {info.invalid} ignorés"
+        )
+
+    corpus.tag_facets()
+    print(f"✅ Base de connaissances chargée: {len(corpus)} documents ({len(corpus.sources)} fichiers)")
+    print(f"🏷️ Facettes: {facet_counts(corpus.partitions)}")
+    return corpus
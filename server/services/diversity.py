@@ -0,0 +1,115 @@
+"""
+🪞 Diversification des sources (Maximal Marginal Relevance)
+
+Plusieurs documents de la knowledge base se recouvrent presque entièrement
+(aeeh / aeeh_2025 / baremes_aeeh_2024) : sans diversification, le top 3
+envoyé à Gemini en contient souvent deux quasi identiques.
+
+- DocSimilarity : vecteur moyen de chaque document + matrice cosinus doc × doc,
+  calculés une fois à la construction de l'index (float16)
+- mmr : sélection gloutonne λ × pertinence - (1 - λ) × similarité max aux documents déjà retenus
+"""
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from services.vector_index import normalize_rows
+
+CHUNK_SIZE = 4096  # passages lus à la fois pour les vecteurs de documents
+
+
+class DocSimilarity:
+    """Similarités cosinus entre documents (moyenne normalisée de leurs passages)"""
+
+    def __init__(self, doc_ids: Sequence[str], doc_vectors: np.ndarray, max_matrix_docs: int = 3000):
+        self.doc_ids: List[str] = list(doc_ids)
+        self.doc_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        self.vectors = normalize_rows(np.asarray(doc_vectors, dtype=np.float32)) if len(self.doc_ids) else doc_vectors
+        # Matrice complète pré-calculée tant qu'elle reste petite (n² × 2 octets)
+        self.matrix: Optional[np.ndarray] = None
+        if 0 < len(self.doc_ids) <= max_matrix_docs:
+            self.matrix = (self.vectors @ self.vectors.T).astype(np.float16)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        doc_ids: Sequence[str],
+        doc_vectors: np.ndarray,
+        matrix: Optional[np.ndarray] = None
+    ) -> "DocSimilarity":
+        """Depuis des tableaux déjà calculés (ex: fichiers partagés memory-mapped), sans copie"""
+        similarity = cls.__new__(cls)
+        similarity.doc_ids = list(doc_ids)
+        similarity.doc_row = {doc_id: row for row, doc_id in enumerate(similarity.doc_ids)}
+        similarity.vectors = doc_vectors
+        similarity.matrix = matrix
+        return similarity
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def rows(self, doc_ids: Sequence[str]) -> np.ndarray:
+        """Lignes des documents (-1 si le document n'est pas indexé)"""
+        return np.array([self.doc_row.get(doc_id, -1) for doc_id in doc_ids], dtype=np.int64)
+
+    def pairwise(self, doc_ids: Sequence[str]) -> np.ndarray:
+        """Sous-matrice de similarité des documents donnés (0 pour un document non indexé)"""
+        rows = self.rows(doc_ids)
+        known = rows >= 0
+        similarity = np.zeros((len(rows), len(rows)), dtype=np.float32)
+        if known.any():
+            known_rows = rows[known]
+            if self.matrix is not None:
+                block = self.matrix[np.ix_(known_rows, known_rows)].astype(np.float32)
+            else:
+                block = self.vectors[known_rows] @ self.vectors[known_rows].T
+            similarity[np.ix_(known, known)] = block
+        return similarity
+
+    @classmethod
+    def from_passages(
+        cls,
+        doc_ids: Sequence[str],
+        offsets: np.ndarray,
+        matrix: np.ndarray,
+        rows: Optional[np.ndarray] = None,
+        max_matrix_docs: int = 3000
+    ) -> "DocSimilarity":
+        """
+        Vecteur de chaque document = somme de ses passages (contigus, début à `offsets`),
+        lus par blocs depuis `matrix` (éventuellement le store memory-mapped via `rows`)
+        """
+        n_passages = int(len(rows)) if rows is not None else int(matrix.shape[0])
+        if not len(doc_ids) or not n_passages:
+            return cls([], np.zeros((0, 0), dtype=np.float32), max_matrix_docs)
+        passage_doc = np.repeat(np.arange(len(doc_ids)), np.diff(np.append(offsets, n_passages)))
+        sums = np.zeros((len(doc_ids), matrix.shape[1]), dtype=np.float32)
+        for start in range(0, n_passages, CHUNK_SIZE):
+            block_rows = np.arange(start, min(start + CHUNK_SIZE, n_passages))
+            source_rows = block_rows if rows is None else rows[block_rows]
+            block = normalize_rows(np.asarray(matrix[source_rows], dtype=np.float32))
+            np.add.at(sums, passage_doc[block_rows], block)
+        return cls(doc_ids, sums, max_matrix_docs)
+
+
+def mmr(relevance: np.ndarray, similarity: np.ndarray, top_k: int, lambda_: float = 0.7) -> List[int]:
+    """
+    Indices (dans `relevance`) retenus par MMR, dans l'ordre de sélection.
+    λ = 1 : ordre de pertinence pur ; λ plus petit : pénalise les doublons.
+    """
+    n = relevance.shape[0]
+    if n == 0 or top_k <= 0:
+        return []
+    top = float(relevance.max())
+    relevance = relevance / top if top > 0 else relevance
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(top_k, n):
+        marginal = np.where(available, lambda_ * relevance - (1 - lambda_) * max_similarity, -np.inf)
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
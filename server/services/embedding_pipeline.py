@@ -0,0 +1,195 @@
+"""
+📦 Pipeline d'embedding par lots pour la knowledge base
+
+- Lots envoyés via batchEmbedContents (taille configurable, max 100)
+- Plusieurs lots en parallèle (concurrence configurable)
+- Backoff exponentiel avec jitter sur rate limit / erreurs transitoires
+- Checkpoint JSONL sur disque : un run interrompu reprend là où il s'était arrêté
+
+CLI (code de sortie 1 si un passage n'a pas pu être encodé) :
+    python -m services.embedding_pipeline [--kb config/knowledge_base.json ...] [--batch-size 50] [--concurrency 4]
+
+Lancé à la construction de l'image (Dockerfile) : le store livré couvre tous les passages
+de la knowledge base, aucun worker n'appelle Gemini au démarrage pour le compléter.
+"""
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+
+from config.settings import settings
+
+EMBEDDING_MODEL = settings.embedding_model
+MAX_BATCH_SIZE = 100  # Limite de l'API batchEmbedContents
+CHECKPOINT_FILE = Path(__file__).parent.parent / 'config' / 'embeddings_checkpoint.jsonl'
+
+# Erreurs qui méritent un nouvel essai (429, 5xx, timeouts...)
+# Seul tenacity réessaie : le retry interne du SDK est désactivé dans embed_batch
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServerError,
+)
+
+
+def text_hash(text: str) -> str:
+    """Empreinte du texte embeddé (un checkpoint n'est repris que si le texte n'a pas changé)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@retry(
+    stop=stop_after_attempt(settings.embedding_max_retries),
+    wait=wait_random_exponential(multiplier=1, max=60),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True
+)
+def embed_batch(texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[List[float]]:
+    """Embeddings d'un lot de textes en un seul appel Gemini"""
+    result = genai.embed_content(
+        model=EMBEDDING_MODEL,
+        content=texts,
+        task_type=task_type,
+        request_options={"retry": None}
+    )
+    embeddings = result['embedding']
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Lot incomplet: {len(embeddings)} embeddings pour {len(texts)} textes")
+    return embeddings
+
+
+def load_checkpoint(checkpoint_file: Path, texts: Dict[str, str]) -> Dict[str, List[float]]:
+    """Relit les embeddings déjà calculés pour ces textes (lignes corrompues ignorées)"""
+    done: Dict[str, List[float]] = {}
+    if not checkpoint_file or not checkpoint_file.exists():
+        return done
+
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Dernière ligne tronquée par une interruption
+            doc_id = entry.get("id")
+            if doc_id in texts and entry.get("hash") == text_hash(texts[doc_id]):
+                done[doc_id] = entry["embedding"]
+    return done
+
+
+def clear_checkpoint(checkpoint_file: Path = CHECKPOINT_FILE) -> None:
+    """Supprime le checkpoint une fois les embeddings sauvegardés dans le store"""
+    if checkpoint_file and checkpoint_file.exists():
+        checkpoint_file.unlink()
+
+
+def embed_documents(
+    texts: Dict[str, str],
+    task_type: str = "RETRIEVAL_DOCUMENT",
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    checkpoint_file: Optional[Path] = CHECKPOINT_FILE
+) -> Dict[str, List[float]]:
+    """
+    🚀 Embeddings de {doc_id: texte} par lots concurrents
+
+    Args:
+        texts: Textes à encoder
+        task_type: Type de tâche Gemini
+        batch_size: Taille des lots (défaut: settings.embedding_batch_size)
+        concurrency: Lots en vol simultanément (défaut: settings.embedding_concurrency)
+        checkpoint_file: Fichier de reprise (None pour désactiver)
+
+    Returns:
+        {doc_id: embedding} pour les documents encodés avec succès.
+        Les échecs sont absents du résultat (jamais de vecteur nul).
+    """
+    batch_size = max(1, min(batch_size or settings.embedding_batch_size, MAX_BATCH_SIZE))
+    concurrency = max(1, concurrency or settings.embedding_concurrency)
+
+    done = load_checkpoint(checkpoint_file, texts)
+    if done:
+        print(f"♻️ Reprise depuis le checkpoint: {len(done)} embeddings déjà calculés")
+
+    pending = [doc_id for doc_id in texts if doc_id not in done]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if not batches:
+        return done
+
+    print(f"📦 Embedding de {len(pending)} documents ({len(batches)} lots de {batch_size}, concurrence {concurrency})")
+
+    checkpoint_lock = threading.Lock()
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(embed_batch, [texts[doc_id] for doc_id in batch], task_type): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                embeddings = future.result()
+            except Exception as e:
+                failed += len(batch)
+                print(f"❌ Lot de {len(batch)} documents en échec: {e}")
+                continue
+
+            with checkpoint_lock:
+                if checkpoint_file:
+                    checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+                    with open(checkpoint_file, 'a', encoding='utf-8') as f:
+                        for doc_id, embedding in zip(batch, embeddings):
+                            f.write(json.dumps({
+                                "id": doc_id,
+                                "hash": text_hash(texts[doc_id]),
+                                "embedding": list(embedding)
+                            }) + "\n")
+                for doc_id, embedding in zip(batch, embeddings):
+                    done[doc_id] = list(embedding)
+
+            print(f"🔄 Lot embeddé: {len(done)}/{len(texts)}")
+
+    if failed:
+        print(f"⚠️ {failed} documents sans embedding (relancer pour reprendre)")
+
+    return done
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pré-calcul des embeddings de la knowledge base")
+    parser.add_argument(
+        "--kb", type=Path, action="append",
+        help="Fichier de knowledge base (répétable, défaut: settings.knowledge_base_files)"
+    )
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    # Import tardif : configure Gemini et le store d'embeddings
+    from services.semantic_search import create_knowledge_base_embeddings, passage_texts
+    from services.corpus import load_corpus
+
+    knowledge_base = load_corpus(args.kb).documents
+
+    embeddings = create_knowledge_base_embeddings(
+        knowledge_base,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency
+    )
+    # Les vecteurs sont stockés par passage (un document long en a plusieurs)
+    passage_ids = list(passage_texts(knowledge_base))
+    missing = [passage_id for passage_id in passage_ids if passage_id not in embeddings]
+    print(f"✅ {len(passage_ids) - len(missing)}/{len(passage_ids)} passages embeddés ({len(knowledge_base)} documents)")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+💽 Stockage binaire des embeddings (memory-mapped)
+
+- config/embeddings-<empreinte>.npy : matrice float32 (n_docs × dim), vecteurs normalisés
+- config/embeddings_manifest.json : ids (position = offset de ligne), dimension,
+  et pour chaque vecteur le hash du texte encodé + le modèle d'embedding ;
+  "matrix" désigne le fichier de la matrice
+
+Le fichier de matrice est nommé par son contenu (ids + vecteurs) et n'est jamais
+réécrit : remplacer le manifest est la seule bascule, un worker qui lit pendant
+une écriture voit l'ancienne paire ou la nouvelle, jamais un mélange.
+
+La matrice est ouverte avec np.memmap : les workers uvicorn partagent les mêmes
+pages du page cache et le démarrage ne parse plus de JSON.
+
+CLI:
+    python -m services.embedding_store convert [--json config/embeddings_cache.json] [--kb config/knowledge_base.json ... | --kb-settings]
+    python -m services.embedding_store export [--json config/embeddings_cache.json]
+    python -m services.embedding_store info
+    python -m services.embedding_store recall [--lists 0] [--nprobe 1,2,4,8,16] [--queries 200]
+    python -m services.embedding_store quantize [--queries 200]
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows (développement local, un seul processus)
+    fcntl = None
+
+from services.vector_index import IVFIndex, normalize_rows, recall_check
+from services.quantization import Int8Index, PQIndex, compare_topk
+from config.settings import settings
+
+STORE_DIR = Path(__file__).parent.parent / 'config'
+MATRIX_FILENAME = 'embeddings.npy'  # stores écrits avant les fichiers versionnés
+MATRIX_PATTERN = 'embeddings-*.npy'
+MANIFEST_FILENAME = 'embeddings_manifest.json'
+LEGACY_JSON_FILE = STORE_DIR / 'embeddings_cache.json'
+IVF_PATTERN = 'embeddings_ivf-*.npz'
+LOCK_FILENAME = 'embeddings.lock'
+STORE_VERSION = 2
+DEFAULT_MODEL = settings.embedding_model
+
+
+class EmbeddingStore:
+    """Matrice d'embeddings + manifest des ids (lecture seule si memory-mapped)"""
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        model: str = DEFAULT_MODEL,
+        hashes: Optional[Dict[str, str]] = None,
+        models: Optional[Dict[str, str]] = None
+    ):
+        self.ids: List[str] = list(ids)
+        self.matrix = matrix
+        self.model = model
+        self.id_to_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        # Métadonnées par vecteur (absentes pour un store v1 → considérés périmés)
+        self.hashes: Dict[str, str] = dict(hashes or {})
+        self.models: Dict[str, str] = dict(models or {})
+
+    def metadata(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """{doc_id: {"hash": ..., "model": ...}}"""
+        return {
+            doc_id: {"hash": self.hashes.get(doc_id), "model": self.models.get(doc_id)}
+            for doc_id in self.ids
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.id_to_row
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def get(self, doc_id: str) -> Optional[np.ndarray]:
+        """Vecteur d'un document (vue sur la matrice, sans copie)"""
+        row = self.id_to_row.get(doc_id)
+        return None if row is None else self.matrix[row]
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """{doc_id: vecteur} sous forme de vues sur la matrice"""
+        return {doc_id: self.matrix[row] for doc_id, row in self.id_to_row.items()}
+
+    def row_indices(self, ids: Sequence[str]) -> Optional[np.ndarray]:
+        """Lignes de la matrice pour ces ids (None si un id manque)"""
+        if any(doc_id not in self.id_to_row for doc_id in ids):
+            return None
+        return np.array([self.id_to_row[doc_id] for doc_id in ids], dtype=np.int64)
+
+    def rows_for(self, ids: Sequence[str]) -> Optional[np.ndarray]:
+        """
+        Sous-matrice pour ces ids, dans cet ordre.
+        Sans copie si les ids correspondent exactement au store.
+        """
+        if list(ids) == self.ids:
+            return self.matrix
+        rows = self.row_indices(ids)
+        return None if rows is None else self.matrix[rows]
+
+
+@contextmanager
+def store_lock(blocking: bool = True, directory: Optional[Path] = None) -> Iterator[bool]:
+    """
+    Verrou entre processus (workers uvicorn) sur le store : un seul à la fois embedde,
+    écrit le store et publie les index partagés. Non bloquant : False si déjà pris.
+    """
+    if fcntl is None:
+        yield True
+        return
+    path = Path(directory or STORE_DIR) / LOCK_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def manifest_path(directory: Optional[Path] = None) -> Path:
+    """Manifest du store : change à chaque écriture (suivi par KnowledgeWatcher)"""
+    return Path(directory or STORE_DIR) / MANIFEST_FILENAME
+
+
+def ivf_path(fingerprint: str, directory: Path = STORE_DIR) -> Path:
+    """Fichier IVF d'un ensemble de vecteurs (un par index : corpus complet, partitions)"""
+    return Path(directory) / f"embeddings_ivf-{fingerprint[:20]}.npz"
+
+
+def prune_ivf(keep: Iterable[Path], directory: Path = STORE_DIR) -> int:
+    """Supprime les fichiers IVF qu'aucun index de la version courante (corpus, partitions) n'utilise"""
+    keep = {Path(path).name for path in keep}
+    removed = 0
+    for path in Path(directory).glob(IVF_PATTERN):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _matrix_name(ids: Sequence[str], matrix: np.ndarray) -> str:
+    """Nom du fichier de matrice : empreinte des ids (ordre compris) et des vecteurs"""
+    digest = hashlib.sha256()
+    digest.update("\n".join(ids).encode("utf-8"))
+    digest.update(str(matrix.shape).encode("utf-8"))
+    digest.update(np.ascontiguousarray(matrix).tobytes())
+    return f"embeddings-{digest.hexdigest()[:16]}.npy"
+
+
+def _prune_matrices(directory: Path, keep: Sequence[str]):
+    """
+    Supprime les matrices qui ne sont plus référencées (hors matrice courante et précédente :
+    un worker qui vient de lire l'ancien manifest peut encore l'ouvrir)
+    """
+    for path in [*directory.glob(MATRIX_PATTERN), directory / MATRIX_FILENAME]:
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+
+
+def save_store(
+    embeddings: Dict[str, Sequence[float]],
+    directory: Path = STORE_DIR,
+    model: str = DEFAULT_MODEL,
+    metadata: Optional[Dict[str, Dict[str, Optional[str]]]] = None
+) -> EmbeddingStore:
+    """
+    Écrit le store binaire (écriture atomique : fichiers temporaires + os.replace).
+    Les vecteurs sont normalisés à l'écriture : seule la direction compte pour le cosinus.
+    metadata: {doc_id: {"hash": ..., "model": ...}} enregistré avec chaque vecteur
+    """
+    metadata = metadata or {}
+    directory = Path(directory)
+    manifest_path = directory / MANIFEST_FILENAME
+    directory.mkdir(parents=True, exist_ok=True)
+
+    ids = list(embeddings.keys())
+    if ids:
+        matrix = normalize_rows(np.vstack([np.asarray(embeddings[doc_id], dtype=np.float32) for doc_id in ids]))
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+
+    matrix_name = _matrix_name(ids, matrix)
+    manifest = {
+        "version": STORE_VERSION,
+        "matrix": matrix_name,
+        "model": model,
+        "count": len(ids),
+        "dim": int(matrix.shape[1]) if ids else 0,
+        "dtype": "float32",
+        "normalized": True,
+        "ids": ids,
+        "hashes": [metadata.get(doc_id, {}).get("hash") for doc_id in ids],
+        "models": [metadata.get(doc_id, {}).get("model") for doc_id in ids]
+    }
+
+    try:
+        previous = _read_manifest(manifest_path) or {}
+    except Exception:
+        previous = {}
+
+    # 1. Matrice sous un nom neuf (un fichier déjà publié n'est jamais modifié)
+    matrix_path = directory / matrix_name
+    if not matrix_path.exists():
+        tmp_matrix = matrix_path.with_name(f".{matrix_path.name}.{os.getpid()}.tmp")
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp_matrix, matrix_path)
+
+    # 2. Bascule : un seul os.replace, celui du manifest
+    tmp_manifest = manifest_path.with_name(f".{manifest_path.name}.{os.getpid()}.tmp")
+    with open(tmp_manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_manifest, manifest_path)
+
+    _prune_matrices(directory, [matrix_name, previous.get("matrix", MATRIX_FILENAME)])
+
+    return EmbeddingStore(ids, matrix, model=model, **_manifest_metadata(manifest))
+
+
+def _manifest_metadata(manifest: Dict) -> Dict[str, Dict[str, str]]:
+    """Hashes et modèles par id depuis le manifest (listes alignées sur les ids)"""
+    ids = manifest.get("ids", [])
+    return {
+        "hashes": {doc_id: h for doc_id, h in zip(ids, manifest.get("hashes") or []) if h},
+        "models": {doc_id: m for doc_id, m in zip(ids, manifest.get("models") or []) if m},
+    }
+
+
+def _read_manifest(manifest_path: Path) -> Optional[Dict]:
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_store(directory: Path = STORE_DIR) -> Optional[EmbeddingStore]:
+    """Ouvre le store en memory-map (lecture seule). None si absent ou incohérent."""
+    directory = Path(directory)
+    try:
+        manifest = _read_manifest(directory / MANIFEST_FILENAME)
+        if manifest is None:
+            return None
+        # La matrice est celle que désigne le manifest lu (MATRIX_FILENAME pour un ancien store)
+        matrix_path = directory / manifest.get("matrix", MATRIX_FILENAME)
+        if not matrix_path.exists():
+            return None
+
+        ids = manifest.get("ids", [])
+        if not ids:
+            return EmbeddingStore([], np.zeros((0, 0), dtype=np.float32), model=manifest.get("model", DEFAULT_MODEL))
+
+        matrix = np.load(matrix_path, mmap_mode='r')
+        if matrix.dtype != np.float32 or matrix.shape != (manifest["count"], manifest["dim"]) or len(ids) != matrix.shape[0]:
+            print(f"⚠️ Store embeddings incohérent ({matrix.shape} vs manifest {manifest['count']}x{manifest['dim']})")
+            return None
+
+        return EmbeddingStore(ids, matrix, model=manifest.get("model", DEFAULT_MODEL), **_manifest_metadata(manifest))
+
+    except Exception as e:
+        print(f"⚠️ Erreur lecture store embeddings: {e}")
+        return None
+
+
+def import_json(
+    json_path: Path = LEGACY_JSON_FILE,
+    directory: Path = STORE_DIR,
+    metadata: Optional[Dict[str, Dict[str, str]]] = None
+) -> EmbeddingStore:
+    """
+    Convertit l'ancien cache JSON {doc_id: [floats]} en store binaire.
+    Sans metadata, les vecteurs importés n'ont pas de hash et seront ré-embeddés.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        embeddings = json.load(f)
+    return save_store(embeddings, directory, metadata=metadata)
+
+
+def export_json(json_path: Path = LEGACY_JSON_FILE, directory: Path = STORE_DIR) -> int:
+    """Réécrit le store binaire au format JSON (diff lisible, compatibilité)"""
+    store = load_store(directory)
+    if store is None:
+        raise FileNotFoundError(f"Aucun store binaire dans {directory}")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {doc_id: [float(x) for x in vector] for doc_id, vector in store.to_dict().items()},
+            f, ensure_ascii=False, indent=2
+        )
+    return len(store)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Store binaire des embeddings PhoenixCare")
+    parser.add_argument("command", choices=["convert", "export", "info", "recall", "quantize"])
+    parser.add_argument("--json", type=Path, default=LEGACY_JSON_FILE, help="Cache JSON (source ou destination)")
+    parser.add_argument("--dir", type=Path, default=STORE_DIR, help="Dossier du store binaire")
+    parser.add_argument(
+        "--kb", type=Path, action="append",
+        help="Knowledge base dont le contenu actuel correspond au JSON (estampille les hashes)"
+    )
+    parser.add_argument(
+        "--kb-settings", action="store_true",
+        help="Estampille avec tous les fichiers de settings.knowledge_base_files (comme le serveur)"
+    )
+    parser.add_argument("--lists", type=int, default=0, help="recall: nombre de listes IVF (0 = ~√n)")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="recall: valeurs de nprobe à comparer")
+    parser.add_argument("--queries", type=int, default=200, help="recall/quantize: nombre de requêtes échantillonnées")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        if not args.json.exists():
+            print(f"❌ Fichier introuvable: {args.json}")
+            return 1
+        metadata = None
+        if args.kb or args.kb_settings:
+            # Import tardif : évite de charger Gemini pour les autres commandes.
+            # Corpus fusionné comme au démarrage (ids, espaces de noms) puis hashes par passage
+            from services.corpus import load_corpus
+            from services.semantic_search import embedding_metadata
+            corpus = load_corpus(None if args.kb_settings else args.kb)
+            metadata = embedding_metadata(corpus.documents)
+        store = import_json(args.json, args.dir, metadata=metadata)
+        stamped = sum(1 for doc_id in store.ids if doc_id in (metadata or {}))
+        print(f"🏷️ {stamped}/{len(store)} embeddings estampillés (hash + modèle)")
+        print(f"✅ {len(store)} embeddings convertis → {args.dir} ({store.dim} dims)")
+        return 0
+
+    if args.command == "export":
+        count = export_json(args.json, args.dir)
+        print(f"✅ {count} embeddings exportés → {args.json}")
+        return 0
+
+    store = load_store(args.dir)
+    if store is None:
+        print(f"⚠️ Aucun store binaire dans {args.dir}")
+        return 1
+
+    # Requêtes = vecteurs du store bruités (proches mais distincts des documents)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(store), min(args.queries, len(store)), replace=False)
+    queries = store.matrix[rows] + rng.normal(scale=0.02, size=(len(rows), store.dim)).astype(np.float32)
+
+    if args.command == "quantize":
+        print(f"🗜️ Quantification: {len(store)} vecteurs, float32 = {store.dim * 4} octets/vecteur")
+        for name, index in (
+            ("int8", Int8Index(store.ids, store.matrix, normalized=True)),
+            ("pq", PQIndex(store.ids, store.matrix, normalized=True, n_subvectors=settings.pq_subvectors)),
+        ):
+            quality = compare_topk(index, queries, top_k=3)
+            print(
+                f"  {name:<5} {quality['bytes_per_vector']:.0f} octets/vecteur  "
+                f"top-3 identique={quality['same_topk']:.1%}  rappel@3={quality['recall']:.3f}"
+            )
+        return 0
+
+    if args.command == "recall":
+        index = IVFIndex(store.ids, store.matrix, normalized=True, n_lists=args.lists or None)
+        print(f"🗂️ IVF: {len(store)} vecteurs, {index.n_lists} listes, rappel@10 sur {len(rows)} requêtes")
+        for line in recall_check(index, queries, nprobes=[int(n) for n in args.nprobe.split(",")]):
+            print(
+                f"  nprobe={line['nprobe']:>3}  rappel={line['recall']:.3f}  "
+                f"{line['ms_per_query']:.2f} ms (exact {line['exact_ms_per_query']:.2f} ms)  "
+                f"visités={line['visited']:.1%}"
+            )
+        return 0
+
+    print(f"📦 {len(store)} embeddings, {store.dim} dims, modèle {store.model}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+🏷️ Facettes de la knowledge base (partitions de recherche par intention)
+
+Chaque document reçoit au chargement une ou plusieurs facettes :
+- champ "facets" explicite dans le JSON s'il existe
+- sinon déduites de son titre et de ses mots-clés (FACET_TERMS)
+
+Les intentions de detect_intent sont associées à une facette : la recherche
+ne parcourt que la partition correspondante (voir find_relevant_documents),
+avec repli sur le corpus complet si les résultats sont peu pertinents.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from services.lexical_index import tokenize
+from config.settings import settings
+
+# Termes (sans accents) qui rattachent un document à une facette
+FACET_TERMS: Dict[str, frozenset] = {
+    "demarches": frozenset("""
+        mdph dossier dossiers formulaire formulaires cerfa recours contestation cdaph commission
+        courrier decision demarches demande delais tribunal gracieux contentieux mediation
+    """.split()),
+    "aides": frozenset("""
+        allocation allocations prestation aeeh aah pch ajpp ajpa rsa ars cumul cumuls montant montants
+        bareme baremes financement complement majoration majorations reduction reductions rente
+        aide aides revenu carte cmi
+    """.split()),
+    "soutien": frozenset("""
+        aidant aidants repit fratrie soutien psychologique urgence crise vacances loisirs sejours
+        association organismes accompagnement conge famille familles grands parents
+    """.split()),
+}
+
+# Intention (services/intent_service.py) → facette recherchée ; absente = corpus complet
+INTENT_FACETS: Dict[str, str] = {
+    "admin_courrier": "demarches",
+    "suivi_demarche": "demarches",
+    "admin_aide": "aides",
+    "fatigue": "soutien",
+}
+
+
+def document_facets(doc: Dict) -> Tuple[str, ...]:
+    """Facettes d'un document (explicites, sinon déduites du titre et des mots-clés)"""
+    explicit = doc.get("facets")
+    if explicit:
+        return tuple(explicit)
+    terms = set(tokenize(doc.get("title", "")))
+    for keyword in doc.get("keywords", []):
+        terms.update(tokenize(keyword))
+    return tuple(facet for facet, facet_terms in FACET_TERMS.items() if terms & facet_terms)
+
+
+def intent_facet(intent: Optional[str]) -> Optional[str]:
+    """Facette à rechercher pour une intention (None = corpus complet)"""
+    return INTENT_FACETS.get(intent) if intent else None
+
+
+def partition_is_confident(result: Mapping[str, Any]) -> bool:
+    """
+    Meilleur document d'une partition assez pertinent pour ne pas chercher dans le corpus
+    complet : cosinus brut ou score lexical brut (BM25 + fuzzy) au-dessus de son seuil.
+    Le score fusionné ne convient pas : normalisé sur la partition (RRF, normalize_max),
+    son premier document a toujours un score élevé, même hors sujet.
+    """
+    return (
+        result.get("semantic", 0.0) >= settings.facet_min_semantic
+        or result.get("keyword_raw", result.get("score", 0.0)) >= settings.facet_min_keyword
+    )
+
+
+def build_partitions(documents: Dict[str, Dict]) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, Dict[str, Dict]]]:
+    """
+    (facettes par document, partitions) : une partition est un sous-dict du corpus
+    (mêmes objets documents) qui reçoit ses propres index
+    """
+    facets_by_doc = {doc_id: document_facets(doc) for doc_id, doc in documents.items()}
+    partitions: Dict[str, Dict[str, Dict]] = {}
+    for doc_id, facets in facets_by_doc.items():
+        for facet in facets:
+            partitions.setdefault(facet, {})[doc_id] = documents[doc_id]
+    return facets_by_doc, partitions
+
+
+def facet_counts(partitions: Dict[str, Dict[str, Dict]]) -> Dict[str, int]:
+    """Nombre de documents par facette (stats)"""
+    return {facet: len(documents) for facet, documents in sorted(partitions.items())}
+
+
+def untagged(facets_by_doc: Dict[str, Tuple[str, ...]]) -> List[str]:
+    """Documents sans facette (uniquement trouvés via le corpus complet)"""
+    return [doc_id for doc_id, facets in facets_by_doc.items() if not facets]
@@ -0,0 +1,108 @@
+"""
+🔀 Fusion des scores sémantiques et lexicaux
+
+Les deux scorers produisent un tableau de scores sur TOUS les documents
+(même ordre que l'index BM25) : la fusion est une poignée d'opérations NumPy,
+sans troncature préalable des candidats.
+
+- "linear" : w × sémantique + (1 - w) × keyword normalisé par son max
+- "rrf" : reciprocal rank fusion, w / (k + rang sémantique) + (1 - w) / (k + rang keyword),
+  ramené entre 0 et 1 ; insensible aux échelles des deux scores
+
+Les résultats sont des SearchResult immuables (lecture type dict : doc["title"]).
+"""
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+FUSION_METHODS = ("linear", "rrf")
+
+
+@dataclass(frozen=True)
+class SearchResult(Mapping):
+    """Document retrouvé par la recherche (jamais modifié après création)"""
+    id: str
+    title: str
+    content: str
+    passages: Tuple[Dict[str, Any], ...] = ()
+    score: float = 0.0
+    semantic: float = 0.0
+    keyword: float = 0.0  # normalisé sur la base interrogée (le meilleur document vaut 1)
+    keyword_raw: float = 0.0  # BM25 + fuzzy brut, comparable d'une base à l'autre
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _RESULT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_RESULT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(_RESULT_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copie sérialisable (JSON, analytics)"""
+        return {**{key: getattr(self, key) for key in _RESULT_FIELDS}, "passages": [dict(p) for p in self.passages]}
+
+
+_RESULT_FIELDS = tuple(field.name for field in fields(SearchResult))
+
+
+def normalize_max(scores: np.ndarray) -> np.ndarray:
+    """Scores divisés par le maximum (0 partout si aucun score positif)"""
+    top = float(scores.max()) if scores.size else 0.0
+    if top <= 0:
+        return np.zeros_like(scores, dtype=np.float32)
+    return np.maximum(scores, 0).astype(np.float32) / top
+
+
+def reciprocal_ranks(scores: np.ndarray, k: int = 60) -> np.ndarray:
+    """1 / (k + rang) pour les documents de score positif, 0 pour les autres"""
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty(scores.shape[0], dtype=np.float32)
+    ranks[order] = np.arange(1, scores.shape[0] + 1, dtype=np.float32)
+    return np.where(scores > 0, 1.0 / (k + ranks), 0.0).astype(np.float32)
+
+
+def linear_fusion(semantic: np.ndarray, keyword: np.ndarray, semantic_weight: float = 0.7) -> np.ndarray:
+    """Combinaison linéaire (scores sémantiques cosinus déjà entre 0 et 1)"""
+    return semantic_weight * np.maximum(semantic, 0) + (1 - semantic_weight) * normalize_max(keyword)
+
+
+def rrf_fusion(semantic: np.ndarray, keyword: np.ndarray, semantic_weight: float = 0.7, k: int = 60) -> np.ndarray:
+    """Reciprocal rank fusion pondérée, ramenée entre 0 et 1 (1 = premier dans les deux listes)"""
+    fused = semantic_weight * reciprocal_ranks(semantic, k) + (1 - semantic_weight) * reciprocal_ranks(keyword, k)
+    return fused * (k + 1)
+
+
+def fuse(
+    semantic: np.ndarray,
+    keyword: np.ndarray,
+    method: str = "linear",
+    semantic_weight: float = 0.7,
+    rrf_k: int = 60
+) -> np.ndarray:
+    """Scores fusionnés de tous les documents"""
+    if method == "linear":
+        return linear_fusion(semantic, keyword, semantic_weight)
+    if method == "rrf":
+        return rrf_fusion(semantic, keyword, semantic_weight, rrf_k)
+    raise ValueError(f"Méthode de fusion inconnue: {method} (attendu: {', '.join(FUSION_METHODS)})")
+
+
+def align_rows(source_ids: Sequence[str], target_rows: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (lignes source, lignes cible) des ids présents des deux côtés :
+    target[target_rows] = source[source_rows] recopie des scores d'un index à l'autre
+    """
+    pairs: List[Tuple[int, int]] = [
+        (row, target_rows[doc_id]) for row, doc_id in enumerate(source_ids) if doc_id in target_rows
+    ]
+    if not pairs:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    source, target = zip(*pairs)
+    return np.array(source, dtype=np.int64), np.array(target, dtype=np.int64)
@@ -0,0 +1,194 @@
+"""
+🤖 Client de génération Gemini asynchrone (concurrence bornée)
+
+model.generate_content est bloquant : appelé dans une route async, une génération lente
+(jusqu'à 30 s) gelait tout l'event loop du worker, /health compris. Ce client passe par
+l'API async du SDK (generate_content_async) :
+
+- un sémaphore par processus plafonne les appels Gemini simultanés ; au-delà,
+  les requêtes attendent leur tour sur l'event loop (temps d'attente mesuré)
+- la génération est annulée si le client HTTP se déconnecte pendant l'attente
+- stream() transmet le texte au fil de l'eau (endpoint /api/chat/stream)
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """Le client HTTP s'est déconnecté avant la fin de la génération"""
+
+
+class GeminiClient:
+    """Appels generate_content_async limités à `max_concurrency` par processus"""
+
+    def __init__(self, model, max_concurrency: int = 8, timeout: float = 30.0):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Métriques (par worker)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.queue_timeouts = 0  # budget de la requête épuisé avant d'obtenir un créneau
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def _request_options(self, timeout: Optional[float]) -> Dict[str, Any]:
+        # Pas de retry interne du SDK : les tentatives sont gérées par services/resilience.py
+        return {"timeout": timeout or self.timeout, "retry": None}
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, model=None, **kwargs) -> Any:
+        """
+        Réponse brute de Gemini (lève l'exception du SDK en cas d'échec).
+        `model` remplace le modèle par défaut (tier choisi par services/model_tiers.py) ;
+        le plafond de concurrence reste commun à tous les modèles.
+        L'attente d'un créneau compte dans les métriques, pas dans le timeout de l'appel.
+        """
+        await self.acquire()
+        try:
+            return await self.request(prompt, timeout=timeout, model=model, **kwargs)
+        finally:
+            self.release()
+
+    async def request(self, prompt: str, timeout: Optional[float] = None, model=None, **kwargs) -> Any:
+        """
+        Appel Gemini sans prise de créneau : l'appelant en tient déjà un (acquire/release),
+        comme resilient_call, qui ne chronomètre ainsi que l'appel lui-même.
+        """
+        try:
+            response = await (model or self.model).generate_content_async(
+                prompt, request_options=self._request_options(timeout), **kwargs
+            )
+            self.completed += 1
+            return response
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+    async def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        model=None,
+        on_usage: Optional[Callable[[Any], None]] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Texte généré, morceau par morceau (generate_content_async(stream=True)).
+        Le créneau est gardé jusqu'à la fin du flux ; fermer le générateur annule l'appel.
+        on_usage(usage_metadata) est appelé à la fin du flux (tokens consommés).
+        """
+        await self.acquire()
+        try:
+            response = await (model or self.model).generate_content_async(
+                prompt, stream=True, request_options=self._request_options(timeout), **kwargs
+            )
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Morceau sans texte (métadonnées, blocage de sécurité)
+                    continue
+                if text:
+                    yield text
+            self.completed += 1
+            if on_usage is not None:
+                on_usage(getattr(response, "usage_metadata", None))
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.release()
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        Attend un créneau (temps d'attente mesuré).
+        timeout: attente maximale (budget restant de la requête) → asyncio.TimeoutError
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        try:
+            if timeout is None or not self._semaphore.locked():
+                await self._semaphore.acquire()
+            else:
+                await asyncio.wait_for(self._semaphore.acquire(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        wait = time.monotonic() - queued_at
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.in_flight += 1
+
+    async def try_acquire(self) -> bool:
+        """Prend un créneau seulement s'il est libre tout de suite (requête doublée du hedging)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore.locked() or self.waiting:
+            return False
+        # Sémaphore libre : acquire() aboutit sans suspendre la coroutine
+        await self._semaphore.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "queue_timeouts": self.queue_timeouts,
+            "queue_wait_avg_ms": round(1000 * self.queue_wait_total / started, 1) if started else 0.0,
+            "queue_wait_max_ms": round(1000 * self.queue_wait_max, 1),
+        }
+
+
+async def until_disconnected(
+    coro: Awaitable[T],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float = 0.5
+) -> T:
+    """
+    Attend `coro` en surveillant le client (ex: request.is_disconnected de Starlette).
+    Déconnexion → la tâche est annulée (l'appel Gemini avec) et ClientDisconnected est levée.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
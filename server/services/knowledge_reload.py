@@ -0,0 +1,265 @@
+"""
+🔄 Rechargement à chaud de la knowledge base
+
+- Le nouveau corpus et ses index sont construits à côté de l'actuel (thread de fond) :
+  les requêtes continuent d'être servies par le snapshot courant
+- Bascule atomique (une seule affectation) vers le nouveau snapshot, numéro de version +1 ;
+  une requête en cours garde la référence de l'ancien snapshot jusqu'à sa fin
+- Rapport : durée de construction, documents ajoutés / modifiés / supprimés
+- Watcher optionnel : chaque worker sonde les fichiers (mtime/taille, puis sha256)
+  et se recharge quand leur contenu change (settings.kb_watch_interval)
+- Entre workers : embeddings, écriture du store et publication des index partagés
+  sous un verrou de fichier (embedding_store.store_lock). Le worker qui le prend
+  embedde les passages modifiés ; les autres attendent puis construisent depuis
+  le store publié, sans appel Gemini. Le watcher suit aussi le manifest du store :
+  un store publié par un autre worker (rechargement admin) est repris
+"""
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from services.corpus import Corpus, load_corpus, resolve_paths
+from services.embedding_store import manifest_path, store_lock
+from services.shared_index import shared_stats
+from core.cache import cache
+
+
+@dataclass(frozen=True)
+class KnowledgeSnapshot:
+    """Version de la knowledge base servie aux requêtes (jamais modifiée après publication)"""
+    version: int
+    corpus: Corpus
+    fingerprint: str
+    loaded_at: float
+    build_seconds: float
+
+    @property
+    def knowledge_base(self) -> Dict[str, Dict]:
+        return self.corpus.documents
+
+
+_SNAPSHOT: Optional[KnowledgeSnapshot] = None
+_RELOAD_LOCK = threading.Lock()
+LAST_RELOAD: Optional[Dict[str, Any]] = None
+
+
+def current_snapshot() -> Optional[KnowledgeSnapshot]:
+    """Snapshot courant (à lire une fois par requête)"""
+    return _SNAPSHOT
+
+
+def diff_documents(old: Dict[str, Dict], new: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """Documents ajoutés, supprimés et modifiés (titre, contenu ou mots-clés) entre deux versions"""
+    return {
+        "added": sorted(doc_id for doc_id in new if doc_id not in old),
+        "removed": sorted(doc_id for doc_id in old if doc_id not in new),
+        "changed": sorted(
+            doc_id for doc_id in new
+            if doc_id in old and any(old[doc_id].get(field) != new[doc_id].get(field) for field in ("title", "content", "keywords"))
+        ),
+    }
+
+
+def _publish(corpus: Corpus, build_seconds: float) -> KnowledgeSnapshot:
+    """Bascule atomique vers un nouveau snapshot"""
+    global _SNAPSHOT
+
+    previous = _SNAPSHOT
+    snapshot = KnowledgeSnapshot(
+        version=previous.version + 1 if previous else 1,
+        corpus=corpus,
+        fingerprint=corpus.fingerprint,
+        loaded_at=time.time(),
+        build_seconds=build_seconds
+    )
+    _SNAPSHOT = snapshot
+    # Réponses en cache : nouvelles clés pour la nouvelle version (identiques dans tous les workers)
+    cache.namespace = snapshot.fingerprint
+    return snapshot
+
+
+def build_indexes(corpus: Corpus, embed: bool = True):
+    """
+    Index du corpus, une seule synchronisation des embeddings à la fois entre workers.
+    Verrou libre : ce worker embedde les passages modifiés, écrit le store et publie les index partagés.
+    Verrou pris (un autre worker s'en charge) ou embed=False : attente, puis index depuis le store publié.
+    """
+    if embed:
+        with store_lock(blocking=False) as leader:
+            if leader:
+                corpus.build_indexes()
+                return
+        print("⏳ Store d'embeddings mis à jour par un autre worker : attente puis lecture")
+    with store_lock():
+        corpus.build_indexes(embed=False)
+
+
+def load_initial_snapshot(files: Optional[Iterable[Union[str, Path]]] = None) -> KnowledgeSnapshot:
+    """Chargement au démarrage : corpus + index (recherche sémantique optionnelle)"""
+    start = time.perf_counter()
+    corpus = load_corpus(files)
+    if corpus.documents:
+        try:
+            build_indexes(corpus)
+        except Exception as e:
+            print(f"⚠️ Recherche sémantique indisponible, fallback sur keyword matching: {e}")
+    return _publish(corpus, time.perf_counter() - start)
+
+
+def reload_knowledge_base(
+    files: Optional[Iterable[Union[str, Path]]] = None,
+    reason: str = "admin",
+    embed: bool = True
+) -> Dict[str, Any]:
+    """
+    🔄 Recharge les fichiers, construit les index puis bascule.
+    Bloquant (à lancer dans un thread) ; un seul rechargement à la fois.
+    En cas d'échec ou de corpus vide, le snapshot courant reste en service.
+    embed=False : store publié par un autre worker, repris tel quel (aucun appel Gemini).
+    """
+    global LAST_RELOAD
+
+    previous = _SNAPSHOT
+    if not _RELOAD_LOCK.acquire(blocking=False):
+        return {"status": "already_running", "version": previous.version if previous else 0}
+
+    try:
+        print(f"🔄 Rechargement de la knowledge base ({reason})...")
+        start = time.perf_counter()
+        try:
+            corpus = load_corpus(files)
+            if not corpus.documents:
+                raise ValueError("corpus vide")
+            build_indexes(corpus, embed=embed)
+        except Exception as e:
+            print(f"❌ Rechargement annulé, version {previous.version if previous else 0} conservée: {e}")
+            LAST_RELOAD = {
+                "status": "failed",
+                "reason": reason,
+                "error": str(e),
+                "version": previous.version if previous else 0,
+                "finished_at": time.time()
+            }
+            return LAST_RELOAD
+
+        build_seconds = time.perf_counter() - start
+        diff = diff_documents(previous.knowledge_base if previous else {}, corpus.documents)
+        snapshot = _publish(corpus, build_seconds)
+
+        LAST_RELOAD = {
+            "status": "reloaded",
+            "reason": reason,
+            "version": snapshot.version,
+            "previous_version": previous.version if previous else 0,
+            "fingerprint": snapshot.fingerprint,
+            "build_seconds": round(build_seconds, 3),
+            "documents": len(corpus.documents),
+            "added": diff["added"],
+            "removed": diff["removed"],
+            "changed": diff["changed"],
+            "unchanged": len(corpus.documents) - len(diff["added"]) - len(diff["changed"]),
+            "sources": corpus.stats()["sources"],
+            "finished_at": time.time()
+        }
+        print(
+            f"✅ Knowledge base v{snapshot.version}: {len(corpus.documents)} documents en {build_seconds:.2f}s "
+            f"(+{len(diff['added'])} ~{len(diff['changed'])} -{len(diff['removed'])})"
+        )
+        return LAST_RELOAD
+    finally:
+        _RELOAD_LOCK.release()
+
+
+def knowledge_status() -> Dict[str, Any]:
+    """Version servie et dernier rechargement"""
+    snapshot = _SNAPSHOT
+    return {
+        "version": snapshot.version if snapshot else 0,
+        "fingerprint": snapshot.fingerprint if snapshot else None,
+        "documents": len(snapshot.knowledge_base) if snapshot else 0,
+        "loaded_at": snapshot.loaded_at if snapshot else None,
+        "build_seconds": round(snapshot.build_seconds, 3) if snapshot else None,
+        "reloading": _RELOAD_LOCK.locked(),
+        "last_reload": LAST_RELOAD,
+        "shared_indexes": shared_stats()
+    }
+
+
+def files_stats(paths: Iterable[Path]) -> Tuple:
+    """mtime/taille des fichiers, sans lire leur contenu"""
+    stats = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stats.append((str(path), None))
+            continue
+        stats.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(stats)
+
+
+def files_digest(paths: Iterable[Path]) -> str:
+    """sha256 du contenu des fichiers (fichiers absents ignorés)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class KnowledgeWatcher:
+    """
+    👀 Sonde les fichiers de la knowledge base et recharge quand leur contenu change.
+    Le contenu n'est haché que si mtime/taille ont bougé ; un fichier ré-enregistré
+    à l'identique ne déclenche rien.
+    Sonde aussi le manifest du store : un store écrit par un autre worker est repris sans embedding.
+    """
+
+    def __init__(self, interval: float, files: Optional[Iterable[Union[str, Path]]] = None):
+        self.interval = interval
+        self.files = list(files) if files is not None else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        paths = resolve_paths(self.files)
+        self._stats, self._digest = files_stats(paths), files_digest(paths)
+        self._store_stats = files_stats([manifest_path()])
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """Recharge si le contenu ou le store a changé depuis le dernier passage (rapport ou None)"""
+        paths = resolve_paths(self.files)
+        stats = files_stats(paths)
+        if stats != self._stats:
+            self._stats = stats
+            digest = files_digest(paths)
+            if digest != self._digest:
+                self._digest = digest
+                return self._reload("watcher")
+        if files_stats([manifest_path()]) != self._store_stats:
+            return self._reload("store", embed=False)
+        return None
+
+    def _reload(self, reason: str, embed: bool = True) -> Dict[str, Any]:
+        report = reload_knowledge_base(self.files, reason=reason, embed=embed)
+        # Store écrit par ce rechargement (ou attendu pendant) : déjà pris en compte
+        self._store_stats = files_stats([manifest_path()])
+        return report
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Watcher knowledge base: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kb-watcher", daemon=True)
+            self._thread.start()
+            print(f"👀 Watcher knowledge base actif (toutes les {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+
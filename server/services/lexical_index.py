@@ -0,0 +1,196 @@
+"""
+📚 Index lexical BM25 pour la knowledge base
+Index inversé pré-calculé sur les tokens sans accents (titre, mots-clés, contenu) :
+une requête ne touche que les postings de ses propres termes
+"""
+import re
+import math
+import unicodedata
+import numpy as np
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from services.vector_index import top_k_indices
+
+# Mots vides français (trop fréquents pour discriminer)
+STOPWORDS = frozenset("""
+a au aux avec ce ces cette dans de des du elle elles en est et etre il ils je
+la le les leur leurs lui ma mais me mes moi mon ne nos notre nous on ou par pas
+peut pour qu que quel quelle quels quelles qui sa se ses son sont sur ta te tes
+toi ton tu un une vos votre vous y d l j s n c m t comment
+""".split())
+
+# Poids des champs (BM25F simplifié : un token du titre compte comme 3 occurrences)
+FIELD_WEIGHTS = {"title": 3, "keywords": 3, "content": 1}
+
+
+def fold_accents(text: str) -> str:
+    """Minuscules sans accents : « Éducation » → « education »"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens sans accents, hors mots vides et tokens d'un caractère"""
+    return [
+        token for token in re.findall(r"[a-z0-9]+", fold_accents(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def char_ngrams(word: str, n: int = 3) -> Set[str]:
+    """N-grammes de caractères avec bordures : « aeh » → {" ae", "aeh", "eh "}"""
+    padded = f" {word} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NGramIndex:
+    """
+    🔤 Index de trigrammes sur un vocabulaire (mots-clés de la KB)
+    Un mot mal orthographié n'est comparé qu'aux termes qui partagent
+    au moins un n-gramme avec lui, au lieu de tout le vocabulaire.
+    """
+
+    def __init__(self, terms: Iterable[str], n: int = 3):
+        self.n = n
+        self.terms: List[str] = list(dict.fromkeys(terms))
+        self.postings: Dict[str, List[int]] = {}
+        for position, term in enumerate(self.terms):
+            for gram in char_ngrams(term, n):
+                self.postings.setdefault(gram, []).append(position)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def candidates(self, word: str) -> Counter:
+        """{position du terme: nombre de n-grammes partagés}"""
+        shared: Counter = Counter()
+        for gram in char_ngrams(word, self.n):
+            shared.update(self.postings.get(gram, ()))
+        return shared
+
+    def lookup(self, word: str, threshold: float = 0.75) -> List[Tuple[str, float]]:
+        """
+        Termes similaires à `word` (ratio SequenceMatcher > threshold),
+        triés par similarité décroissante
+        """
+        matches = []
+        for position in self.candidates(word):
+            term = self.terms[position]
+            # Borne supérieure du ratio : 2·min(len) / (somme des len)
+            if 2 * min(len(word), len(term)) / (len(word) + len(term)) <= threshold:
+                continue
+            similarity = SequenceMatcher(None, word, term).ratio()
+            if similarity > threshold:
+                matches.append((term, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+
+class BM25Index:
+    """
+    Index inversé BM25 construit une fois au chargement de la KB.
+    Les poids BM25 (tf saturé × idf) sont pré-calculés par posting :
+    scorer une requête = quelques additions vectorisées.
+    """
+
+    def __init__(self, documents: Dict[str, Dict], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = list(documents.keys())
+        self.id_to_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+        term_frequencies: List[Counter] = []
+        for doc_id in self.ids:
+            doc = documents[doc_id]
+            frequencies: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = doc.get(field, "")
+                if isinstance(value, list):
+                    value = " ".join(value)
+                for token in tokenize(value):
+                    frequencies[token] += weight
+            term_frequencies.append(frequencies)
+
+        n_docs = len(self.ids)
+        lengths = np.array([sum(tf.values()) for tf in term_frequencies], dtype=np.float32)
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+        length_norm = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(n_docs, k1, dtype=np.float32)
+
+        # Mots-clés (sans accents) → documents, pour le matching fuzzy
+        keyword_rows: Dict[str, List[int]] = {}
+        for row, doc_id in enumerate(self.ids):
+            for keyword in documents[doc_id].get("keywords", []):
+                rows = keyword_rows.setdefault(fold_accents(keyword), [])
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+        self.keyword_rows: Dict[str, np.ndarray] = {
+            keyword: np.array(rows, dtype=np.int64) for keyword, rows in keyword_rows.items()
+        }
+        self.keyword_ngrams = NGramIndex(self.keyword_rows.keys())
+
+        rows_by_term: Dict[str, List[int]] = {}
+        for row, frequencies in enumerate(term_frequencies):
+            for term in frequencies:
+                rows_by_term.setdefault(term, []).append(row)
+
+        # postings[term] = (lignes, poids BM25 pré-calculés)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, rows in rows_by_term.items():
+            rows_array = np.array(rows, dtype=np.int64)
+            tf = np.array([term_frequencies[row][term] for row in rows], dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            weights = idf * tf * (k1 + 1) / (tf + length_norm[rows_array])
+            self.postings[term] = (rows_array, weights.astype(np.float32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vocabulary(self) -> List[str]:
+        return list(self.postings.keys())
+
+    def score_terms(self, terms: Sequence[str]) -> np.ndarray:
+        """Scores BM25 de tous les documents pour ces termes (déjà tokenisés)"""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if posting is not None:
+                rows, weights = posting
+                scores[rows] += weights
+        return scores
+
+    def fuzzy_keyword_scores(
+        self,
+        terms: Sequence[str],
+        threshold: float = 0.75,
+        min_length: int = 3,
+        weight: float = 1.5
+    ) -> np.ndarray:
+        """
+        Bonus pour les mots-clés proches des termes hors vocabulaire (fautes de frappe).
+        Les termes déjà connus de l'index sont scorés par BM25 et ignorés ici.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(terms):
+            if len(term) < min_length or term in self.postings:
+                continue
+            for keyword, similarity in self.keyword_ngrams.lookup(term, threshold):
+                scores[self.keyword_rows[keyword]] += weight * similarity
+        return scores
+
+    def score(self, query: str) -> np.ndarray:
+        """Scores BM25 de tous les documents pour une requête brute"""
+        return self.score_terms(tokenize(query))
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Top K (doc_id, score BM25) avec score > 0"""
+        scores = self.score(query)
+        return [
+            (self.ids[row], float(scores[row]))
+            for row in top_k_indices(scores, top_k)
+            if scores[row] > 0
+        ]
@@ -0,0 +1,77 @@
+"""
+🛟 Embedder local de secours (CPU, sans réseau)
+
+TF-IDF sur n-grammes de caractères hachés, projeté en `dim` dimensions par une
+projection aléatoire creuse fixe (chaque bucket contribue à `k` dimensions avec un signe).
+Tout est déterministe (crc32 + graine fixe) : mêmes vecteurs dans tous les workers.
+
+Moins précis que Gemini, mais robuste aux fautes et aux variantes (« handicapé » / « handicap »),
+et toujours disponible : utilisé quand l'embedding Gemini échoue.
+"""
+import zlib
+import numpy as np
+from typing import Iterable, List, Sequence
+
+from services.lexical_index import tokenize
+
+
+class LocalEmbedder:
+    """Embeddings TF-IDF de n-grammes de caractères hachés + projection fixe"""
+
+    def __init__(
+        self,
+        dim: int = 384,
+        ngram_sizes: Sequence[int] = (3, 4, 5),
+        n_buckets: int = 2 ** 18,
+        projections: int = 2,
+        seed: int = 0
+    ):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.n_buckets = n_buckets
+        self.idf = np.ones(n_buckets, dtype=np.float32)
+
+        # Projection fixe : bucket → `projections` dimensions de sortie, signe ±1
+        rng = np.random.default_rng(seed)
+        self.projection_dims = rng.integers(0, dim, size=(n_buckets, projections), dtype=np.int16 if dim < 2 ** 15 else np.int32)
+        self.projection_signs = rng.choice(np.array([-1, 1], dtype=np.int8), size=(n_buckets, projections))
+
+    def buckets(self, text: str) -> np.ndarray:
+        """Buckets du mot entier et de ses n-grammes (bordés d'espaces), hors mots vides"""
+        grams = []
+        for word in tokenize(text):
+            padded = f" {word} "
+            grams.append(padded)
+            for n in self.ngram_sizes:
+                if len(padded) < n:
+                    continue
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return np.array([zlib.crc32(gram.encode("utf-8")) % self.n_buckets for gram in grams], dtype=np.int64)
+
+    def fit(self, texts: Iterable[str]) -> "LocalEmbedder":
+        """IDF des buckets sur le corpus (à refaire quand la knowledge base change)"""
+        document_frequency = np.zeros(self.n_buckets, dtype=np.float32)
+        n_docs = 0
+        for text in texts:
+            document_frequency[np.unique(self.buckets(text))] += 1
+            n_docs += 1
+        self.idf = (np.log((1 + n_docs) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def embed(self, text: str) -> np.ndarray:
+        """Vecteur normalisé (dim,) ; vecteur nul si le texte n'a aucun n-gramme"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        buckets, counts = np.unique(self.buckets(text), return_counts=True)
+        if not len(buckets):
+            return vector
+        # TF sous-linéaire × IDF
+        weights = (1 + np.log(counts)).astype(np.float32) * self.idf[buckets]
+        for column in range(self.projection_dims.shape[1]):
+            np.add.at(vector, self.projection_dims[buckets, column], self.projection_signs[buckets, column] * weights)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        """Matrice (n, dim) des embeddings"""
+        vectors: List[np.ndarray] = [self.embed(text) for text in texts]
+        return np.vstack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
@@ -0,0 +1,184 @@
+"""
+🎚️ Choix du modèle Gemini par requête (tiering)
+
+Toutes les requêtes partaient sur le même modèle avec max_output_tokens=2000,
+du « merci » à la question de cumul AAH + RSA. Le tier est choisi après la recherche,
+à partir de signaux déjà calculés (aucun appel réseau) :
+
+- route du message (services/routing.py) : small talk / prompt léger → fast
+- complexité du message : longueur, plusieurs prestations citées, cumul → deep
+- confiance de la recherche : question administrative sans source → deep ;
+  question courte et bien couverte par la KB → fast
+- sinon → standard (settings.gemini_model)
+
+Les modèles (genai.GenerativeModel) sont créés au premier usage de chaque tier
+puis réutilisés ; latences et tokens sont comptés par tier (/health).
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from services.lexical_index import fold_accents
+from services.resilience import LatencyTracker
+from services.routing import RouteDecision
+from config.settings import settings
+
+TIER_FAST = "fast"
+TIER_STANDARD = "standard"
+TIER_DEEP = "deep"
+
+# Prestations (sans accents) : en citer plusieurs = question de cumul / comparaison
+BENEFITS = re.compile(
+    r"\b(aah|aeeh|pch|rsa|apl|als|alf|ajpp|ajpa|ars|asf|paje|mva|cmi|ass|aspa|"
+    r"prime d'activite|complement familial|allocations? familiales?)\b"
+)
+COMBINATION = re.compile(r"\b(cumul\w*|a la fois|en meme temps|combiner|compatibles?|incompatibles?|plusieurs)\b")
+
+# Intentions administratives : sans source, la réponse repose sur le modèle seul
+ADMIN_INTENTS = frozenset({"admin_aide", "admin_courrier"})
+# Intentions dont une question courte et bien couverte par la KB passe sur le tier rapide
+FAST_INTENTS = frozenset({"info_generale", "suivi_demarche"})
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """Modèle et configuration de génération d'un tier"""
+    name: str
+    model_name: str
+    max_output_tokens: int
+    temperature: float = 0.7
+
+
+@dataclass(frozen=True)
+class TierDecision:
+    tier: str
+    reason: str
+    complexity: float = 0.0
+
+
+def tiers_from_settings() -> Dict[str, ModelTier]:
+    """Tiers configurés (GEMINI_MODEL_FAST / GEMINI_MODEL / GEMINI_MODEL_DEEP)"""
+    return {
+        TIER_FAST: ModelTier(TIER_FAST, settings.gemini_model_fast or settings.gemini_model, settings.gemini_fast_max_tokens),
+        TIER_STANDARD: ModelTier(TIER_STANDARD, settings.gemini_model, settings.gemini_max_tokens),
+        TIER_DEEP: ModelTier(TIER_DEEP, settings.gemini_model_deep or settings.gemini_model, settings.gemini_deep_max_tokens, 0.4),
+    }
+
+
+def message_complexity(message: str) -> float:
+    """
+    Score de complexité (~0 pour « merci », ≥ 2 pour une question de cumul détaillée) :
+    longueur + prestations citées au-delà de la première + vocabulaire de cumul + questions multiples
+    """
+    text = fold_accents(message)
+    score = len(text.split()) / 40
+    score += max(0, len(set(BENEFITS.findall(text))) - 1)
+    if COMBINATION.search(text):
+        score += 1.0
+    score += 0.5 * max(0, message.count("?") - 1)
+    return round(score, 2)
+
+
+def select_tier(route: RouteDecision, message: str, relevant_docs: List[Dict]) -> TierDecision:
+    """🎚️ Tier de génération d'un message. En cas de doute : standard."""
+    if not settings.tiering_enabled:
+        return TierDecision(TIER_STANDARD, "disabled")
+
+    if not route.retrieval:
+        return TierDecision(TIER_FAST, route.reason)
+
+    complexity = message_complexity(message)
+    if complexity >= settings.tier_deep_complexity:
+        return TierDecision(TIER_DEEP, "complex", complexity)
+
+    if not relevant_docs and route.intent in ADMIN_INTENTS:
+        return TierDecision(TIER_DEEP, "admin_without_sources", complexity)
+
+    if (
+        relevant_docs
+        and route.intent in FAST_INTENTS
+        and route.lexical_confidence >= settings.tier_fast_min_confidence
+        and len(message.split()) <= settings.tier_fast_max_words
+    ):
+        return TierDecision(TIER_FAST, "simple_lookup", complexity)
+
+    return TierDecision(TIER_STANDARD, "default", complexity)
+
+
+class TierStats:
+    """Compteurs d'un tier (par worker)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        # Latences des appels réussis : p95 du hedging, propre au tier
+        self.latencies = LatencyTracker()
+
+    def record(self, seconds: float, usage: Any = None):
+        self.requests += 1
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_token_count", 0) or 0
+            self.output_tokens += getattr(usage, "candidates_token_count", 0) or 0
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latencies.percentile(95)
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_avg_ms": round(1000 * self.latency_total / self.requests) if self.requests else 0,
+            "latency_max_ms": round(1000 * self.latency_max),
+            "latency_p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_output_tokens": round(self.output_tokens / self.requests) if self.requests else 0,
+        }
+
+
+class ModelPool:
+    """Un modèle par tier, créé au premier usage par `build(tier)` puis réutilisé"""
+
+    def __init__(self, tiers: Dict[str, ModelTier], build: Callable[[ModelTier], Any]):
+        self.tiers = tiers
+        self.build = build
+        self._models: Dict[tuple, Any] = {}
+        self._stats: Dict[str, TierStats] = {name: TierStats() for name in tiers}
+        self._lock = threading.Lock()
+
+    def resolve(self, tier: Optional[str]) -> str:
+        """Tier inconnu ou absent → standard"""
+        return tier if tier in self.tiers else TIER_STANDARD
+
+    def model(self, tier: Optional[str]) -> Any:
+        config = self.tiers[self.resolve(tier)]
+        # Tiers de même modèle et même configuration → même objet
+        key = (config.model_name, config.max_output_tokens, config.temperature)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._models[key] = self.build(config)
+                    print(f"🎚️ Modèle {config.model_name} prêt (tier {config.name}, {config.max_output_tokens} tokens max)")
+        return model
+
+    def tier_stats(self, tier: Optional[str]) -> TierStats:
+        return self._stats[self.resolve(tier)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "model": config.model_name,
+                "max_output_tokens": config.max_output_tokens,
+                "loaded": (config.model_name, config.max_output_tokens, config.temperature) in self._models,
+                **self._stats[name].stats(),
+            }
+            for name, config in self.tiers.items()
+        }
+
@@ -0,0 +1,219 @@
+"""
+🗜️ Index vectoriels quantifiés (mémoire par worker ÷4 à ÷32)
+
+- Int8Index : quantification scalaire int8, une échelle par vecteur (768 + 4 octets / vecteur)
+- PQIndex : product quantization, m sous-vecteurs codés sur 1 octet (m octets / vecteur)
+
+Scoring asymétrique : la requête reste en float32, seuls les vecteurs indexés
+sont compressés. Les `rerank` meilleurs candidats sont ensuite re-scorés
+exactement sur les vecteurs float (store memory-mapped : seules leurs pages sont lues).
+"""
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+from services.vector_index import VectorIndex, normalize_rows, normalize_vector, top_k_indices
+
+CHUNK_SIZE = 4096  # lignes décodées à la fois (borne la mémoire temporaire d'une requête)
+
+
+def quantize_int8(matrix: np.ndarray):
+    """(codes int8, échelles float32) : vecteur ≈ codes × échelle"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def kmeans(data: np.ndarray, k: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """K-means euclidien (Lloyd), retourne les centroïdes (k × dim)"""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, data.shape[0]))
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(n_iter):
+        # argmin ‖x - c‖² = argmax (x·c - ‖c‖²/2)
+        labels = np.argmax(data @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class QuantizedIndex(VectorIndex, ABC):
+    """
+    Base abstraite des index quantifiés : mêmes méthodes que VectorIndex (score, search).
+    Une sous-classe fournit _encode, approximate_score et nbytes.
+    `matrix` (souvent le store memory-mapped) ne sert qu'au re-rank exact ;
+    `rows` fait correspondre les ids de l'index aux lignes de `matrix` sans copie.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        normalized: bool = False,
+        rerank: int = 100,
+        rows: Optional[np.ndarray] = None
+    ):
+        self.ids: List[str] = list(ids)
+        self.id_to_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.matrix = matrix
+        self.normalized = normalized
+        self.rerank = rerank
+        self.rows = None if rows is None else np.asarray(rows, dtype=np.int64)
+        if self.ids:
+            self._encode()
+
+    def _float_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Vecteurs float normalisés de ces lignes de l'index"""
+        source_rows = rows if self.rows is None else self.rows[rows]
+        vectors = np.asarray(self.matrix[source_rows], dtype=np.float32)
+        return vectors if self.normalized else normalize_rows(vectors)
+
+    def _chunks(self):
+        """Vecteurs float normalisés, par blocs (l'encodage ne copie jamais toute la matrice)"""
+        for start in range(0, len(self.ids), CHUNK_SIZE):
+            yield self._float_rows(np.arange(start, min(start + CHUNK_SIZE, len(self.ids))))
+
+    @abstractmethod
+    def _encode(self):
+        """Compresse les vecteurs de l'index (appelé par __init__)"""
+
+    @abstractmethod
+    def approximate_score(self, query: np.ndarray) -> np.ndarray:
+        """Scores approximatifs d'une requête normalisée sur tous les vecteurs"""
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """Mémoire privée de l'index (codes + tables), hors matrice float de re-rank"""
+
+    def score(self, query_vector: Sequence[float]) -> np.ndarray:
+        """Scores approximatifs de tous les vecteurs, exacts pour les `rerank` meilleurs"""
+        if not self.ids:
+            return np.zeros(0, dtype=np.float32)
+        query = normalize_vector(query_vector)
+        scores = self.approximate_score(query)
+        if self.rerank > 0:
+            candidates = np.sort(top_k_indices(scores, self.rerank))
+            scores[candidates] = self._float_rows(candidates) @ query
+        return scores
+
+    def score_many(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Scores de plusieurs requêtes (re-rank exact propre à chacune)"""
+        queries = np.atleast_2d(query_vectors)
+        return np.vstack([self.score(query) for query in queries]) if len(queries) else np.zeros((0, len(self.ids)), dtype=np.float32)
+
+    def exact_score(self, query_vector: Sequence[float]) -> np.ndarray:
+        """Scores exacts (parcours complet en float), référence pour la qualité"""
+        if not self.ids:
+            return np.zeros(0, dtype=np.float32)
+        query = normalize_vector(query_vector)
+        return np.concatenate([chunk @ query for chunk in self._chunks()])
+
+
+class Int8Index(QuantizedIndex):
+    """🔢 Quantification scalaire int8 avec une échelle par vecteur (÷4 vs float32)"""
+
+    def _encode(self):
+        codes, scales = zip(*(quantize_int8(chunk) for chunk in self._chunks()))
+        self.codes = np.concatenate(codes)
+        self.scales = np.concatenate(scales)
+
+    def approximate_score(self, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), CHUNK_SIZE):
+            block = slice(start, start + CHUNK_SIZE)
+            scores[block] = (self.codes[block].astype(np.float32) @ query) * self.scales[block]
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+
+class PQIndex(QuantizedIndex):
+    """
+    🧩 Product quantization : le vecteur est coupé en m sous-vecteurs,
+    chacun remplacé par l'indice (1 octet) de son centroïde parmi 256.
+    Score asymétrique = somme de m lectures dans une table requête × centroïdes.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        normalized: bool = False,
+        rerank: int = 100,
+        rows: Optional[np.ndarray] = None,
+        n_subvectors: int = 96,
+        n_centroids: int = 256,
+        max_train: int = 10000,
+        seed: int = 0
+    ):
+        self.n_subvectors = n_subvectors
+        self.n_centroids = min(n_centroids, 256)
+        self.max_train = max_train
+        self.seed = seed
+        super().__init__(ids, matrix, normalized=normalized, rerank=rerank, rows=rows)
+
+    def _encode(self):
+        dim = self._float_rows(np.arange(1)).shape[1]
+        if dim % self.n_subvectors:
+            raise ValueError(f"Dimension {dim} non divisible par {self.n_subvectors} sous-vecteurs")
+        self.sub_dim = dim // self.n_subvectors
+
+        # Apprentissage des codebooks sur un échantillon
+        rng = np.random.default_rng(self.seed)
+        n = len(self.ids)
+        sample = np.sort(rng.choice(n, min(n, self.max_train), replace=False))
+        train = self._float_rows(sample).reshape(len(sample), self.n_subvectors, self.sub_dim)
+        self.codebooks = np.stack([
+            kmeans(train[:, j], self.n_centroids, seed=self.seed + j) for j in range(self.n_subvectors)
+        ]).astype(np.float32)  # (m, k, sub_dim)
+
+        codes = []
+        half_norms = 0.5 * (self.codebooks ** 2).sum(axis=2)  # (m, k)
+        for chunk in self._chunks():
+            sub = chunk.reshape(len(chunk), self.n_subvectors, self.sub_dim)
+            # Centroïde le plus proche de chaque sous-vecteur
+            chunk_codes = np.empty((len(chunk), self.n_subvectors), dtype=np.uint8)
+            for j in range(self.n_subvectors):
+                chunk_codes[:, j] = np.argmax(sub[:, j] @ self.codebooks[j].T - half_norms[j], axis=1)
+            codes.append(chunk_codes)
+        # Stockés par sous-espace (m × n) : le scoring lit chaque sous-espace d'un seul tenant
+        self.codes = np.ascontiguousarray(np.concatenate(codes).T)
+
+    def approximate_score(self, query: np.ndarray) -> np.ndarray:
+        # Table (m, k) des produits scalaires sous-requête × centroïdes
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.n_subvectors, self.sub_dim))
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for j in range(self.n_subvectors):
+            scores += np.take(table[j], self.codes[j])
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.codebooks.nbytes
+
+
+def compare_topk(index: QuantizedIndex, queries: np.ndarray, top_k: int = 3) -> Dict[str, float]:
+    """
+    📏 Qualité d'un index quantifié vs recherche exacte float :
+    part des requêtes au top-k identique (même ordre) et rappel@k
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    same = found = 0
+    for query in queries:
+        expected = top_k_indices(index.exact_score(query), top_k).tolist()
+        actual = top_k_indices(index.score(query), top_k).tolist()
+        same += expected == actual
+        found += len(set(expected) & set(actual))
+    return {
+        "same_topk": same / max(1, len(queries)),
+        "recall": found / max(1, len(queries) * min(top_k, len(index))),
+        "bytes_per_vector": index.nbytes / max(1, len(index)),
+    }
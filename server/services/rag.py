@@ -4,12 +4,15 @@ Extrait de simple_rag_server.py
 """
 import os
 import json
+import time
+import asyncio
 from pathlib import Path
 from difflib import SequenceMatcher
 import google.generativeai as genai
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, AsyncIterator, Tuple, List, Optional
+from config.settings import settings
+from services.model_tiers import ModelPool, ModelTier, TIER_STANDARD, tiers_from_settings
 
 # ===== CONFIGURATION GEMINI =====
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -34,11 +37,7 @@ safety_settings = {
     HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
 }
 
-model = genai.GenerativeModel(
-    model_name="models/gemini-2.5-flash",
-    generation_config=generation_config,
-    safety_settings=safety_settings,
-    system_instruction="""Tu es PhoenixIA, conseiller social expert multi-domaines.
+SYSTEM_INSTRUCTION = """Tu es PhoenixIA, conseiller social expert multi-domaines.
 
 EXPERTISE COMPLÈTE:
 - 🏛️ MDPH: Toutes allocations handicap (AEEH, AAH, PCH), cartes, orientations
@@ -68,7 +67,19 @@ Règles STRICTES pour les champs "situation", "priority", "next_step":
 
 Ne donne pas de conseils médicaux. Ne fais pas de suppositions non présentes dans le texte.
 """
-)
+
+def build_model(tier: ModelTier) -> genai.GenerativeModel:
+    """Modèle Gemini d'un tier (même prompt système et mêmes filtres de sécurité pour tous)"""
+    return genai.GenerativeModel(
+        model_name=tier.model_name,
+        generation_config={**generation_config, "temperature": tier.temperature, "max_output_tokens": tier.max_output_tokens},
+        safety_settings=safety_settings,
+        system_instruction=SYSTEM_INSTRUCTION
+    )
+
+# 🎚️ Un modèle par tier (services/model_tiers.py), créé au premier usage
+model_pool = ModelPool(tiers_from_settings(), build_model)
+model = model_pool.model(TIER_STANDARD)
 
 # ===== CHARGEMENT PROMPTS =====
 def load_prompts() -> dict:
@@ -92,47 +103,71 @@ def load_prompts() -> dict:
 PROMPTS = load_prompts()
 
 # ===== CHARGEMENT KNOWLEDGE BASE =====
-def load_knowledge_base() -> dict:
-    """Charge la base de connaissances depuis config/knowledge_base.json"""
-    try:
-        config_path = Path(__file__).parent.parent / 'config' / 'knowledge_base.json'
-
-        if not config_path.exists():
-            print(f"⚠️ Fichier knowledge_base.json introuvable: {config_path}")
-            print("📝 Créez le fichier ou vérifiez le chemin")
-            return {}
-
-        with open(config_path, 'r', encoding='utf-8') as f:
-            knowledge_base = json.load(f)
-
-        print(f"✅ Base de connaissances chargée: {len(knowledge_base)} documents")
-        return knowledge_base
-
-    except json.JSONDecodeError as e:
-        print(f"❌ Erreur JSON dans knowledge_base.json: {e}")
-        return {}
-    except Exception as e:
-        print(f"❌ Erreur chargement knowledge_base: {e}")
-        return {}
+from services.corpus import load_corpus
 
-knowledge_base = load_knowledge_base()
+def load_knowledge_base() -> dict:
+    """
+    Charge et fusionne les fichiers de la base de connaissances (settings.knowledge_base_files)
+    Fichiers absents ou invalides ignorés avec un warning (voir services/corpus.py)
+    """
+    return load_corpus().documents
 
 # ===== RECHERCHE SÉMANTIQUE =====
-from services.semantic_search import initialize_semantic_search, hybrid_search
+from services.semantic_search import (
+    hybrid_search, batch_hybrid_search, keyword_search_internal, indexes_for, get_query_embedding_async
+)
+from services.retrieval_executor import RetrievalExecutor
+from services.gemini_client import GeminiClient
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, RetryableGeminiError, classify_error, resilient_call
+)
+from services.stream_parser import Event, IncrementalJSONParser
+from services.facets import partition_is_confident
+from services.knowledge_reload import current_snapshot, load_initial_snapshot
 
-# Initialiser les embeddings au démarrage
-if knowledge_base:
-    try:
-        initialize_semantic_search(knowledge_base)
-    except Exception as e:
-        print(f"⚠️ Recherche sémantique indisponible, fallback sur keyword matching: {e}")
+# Corpus + index construits au démarrage (une seule passe pour tous les fichiers),
+# remplacés ensuite par rechargement à chaud (services/knowledge_reload.py)
+snapshot = load_initial_snapshot()
+knowledge_base = snapshot.knowledge_base  # version chargée au démarrage
+
+def current_knowledge_base() -> dict:
+    """Documents de la version servie actuellement (à lire une fois par requête)"""
+    return current_snapshot().knowledge_base
 
 # ===== FONCTIONS RAG =====
 def fuzzy_match(s1: str, s2: str) -> float:
     """Calcule similarité fuzzy entre deux strings (0-1)"""
     return SequenceMatcher(None, s1.lower(), s2.lower()).ratio()
 
-def find_relevant_documents(query: str, use_semantic: bool = True) -> list:
+def search_knowledge_base(
+    query: str,
+    knowledge_base: dict,
+    use_semantic: bool = True,
+    query_embedding: Optional[List[float]] = None,
+    fusion: Optional[str] = None
+) -> Tuple[list, bool]:
+    """Top 3 d'une base (corpus ou partition) : (documents, pertinence jugée suffisante)"""
+    # Tenter recherche hybride (sémantique + keyword)
+    if use_semantic:
+        try:
+            results = hybrid_search(
+                query, knowledge_base, top_k=3, semantic_weight=0.7, query_embedding=query_embedding, fusion=fusion
+            )
+            return results, bool(results) and partition_is_confident(results[0])
+        except Exception as e:
+            print(f"⚠️ Recherche sémantique échouée, fallback sur keyword: {e}")
+
+    # Fallback: recherche lexicale BM25 (index pré-calculé, aucun appel Gemini)
+    results = keyword_search_internal(query, knowledge_base, top_k=3)
+    return results, bool(results) and partition_is_confident(results[0])
+
+def find_relevant_documents(
+    query: str,
+    use_semantic: bool = True,
+    query_embedding: Optional[List[float]] = None,
+    fusion: Optional[str] = None,
+    facet: Optional[str] = None
+) -> list:
     """
     🔍 Recherche intelligente dans la base de connaissances
 
@@ -140,132 +175,210 @@ def find_relevant_documents(query: str, use_semantic: bool = True) -> list:
         query: Question de l'utilisateur
         use_semantic: Si True, utilise recherche hybride (sémantique + keyword)
                      Si False, fallback sur keyword matching uniquement
+        query_embedding: Embedding de la requête déjà calculé (ex: via le cache async)
+        fusion: "linear" ou "rrf" (défaut : settings.fusion_method)
+        facet: Limite la recherche à une partition (ex: intent_facet(detected_intent)) ;
+               corpus complet si la partition ne donne rien d'assez pertinent
 
     Returns:
         Liste des 3 documents les plus pertinents
     """
-    # Tenter recherche hybride (sémantique + keyword)
-    if use_semantic:
-        try:
-            return hybrid_search(query, knowledge_base, top_k=3, semantic_weight=0.7)
-        except Exception as e:
-            print(f"⚠️ Recherche sémantique échouée, fallback sur keyword: {e}")
+    # Une seule version de la base pour toute la requête (même si un rechargement bascule entre-temps)
+    snapshot = current_snapshot()
+    knowledge_base = snapshot.knowledge_base
+
+    partition = snapshot.corpus.partitions.get(facet) if facet else None
+    if partition:
+        # Index de la partition rattachés à la version du corpus (même durée de vie)
+        indexes_for(partition, root=knowledge_base)
+        results, confident = search_knowledge_base(query, partition, use_semantic, query_embedding, fusion)
+        if confident:
+            print(f"🏷️ Recherche limitée à la partition « {facet} » ({len(partition)}/{len(knowledge_base)} documents)")
+            return results
+        print(f"🏷️ Partition « {facet} » peu pertinente → corpus complet")
+
+    results, _ = search_knowledge_base(query, knowledge_base, use_semantic, query_embedding, fusion)
+    return results
+
+# Scoring CPU des routes async, hors event loop (pool borné, voir services/retrieval_executor.py)
+retrieval_executor = RetrievalExecutor(settings.retrieval_workers, settings.retrieval_max_pending)
+
+async def find_relevant_documents_async(
+    query: str,
+    use_semantic: bool = True,
+    query_embedding: Optional[List[float]] = None,
+    fusion: Optional[str] = None,
+    facet: Optional[str] = None
+) -> list:
+    """
+    ⚡ find_relevant_documents pour les routes async : l'embedding de la requête est attendu
+    (cache LRU/Redis puis Gemini hors event loop), le scoring tourne dans le pool de recherche.
+    Même signature et mêmes résultats que la version synchrone.
+    """
+    if use_semantic and query_embedding is None:
+        query_embedding = await get_query_embedding_async(query)
+    return await retrieval_executor.run(
+        find_relevant_documents, query, use_semantic, query_embedding, fusion, facet
+    )
 
-    # Fallback: keyword matching classique (ancienne méthode)
-    query_lower = query.lower()
-    relevant_docs = []
-
-    for doc_id, doc in knowledge_base.items():
-        score = 0
-
-        # 1. Score exact sur les mots-clés
-        for keyword in doc["keywords"]:
-            if keyword in query_lower:
-                score += 2.0
-
-        # 2. Score fuzzy sur les mots-clés
-        for keyword in doc["keywords"]:
-            query_words = query_lower.split()
-            for word in query_words:
-                if len(word) > 3:
-                    similarity = fuzzy_match(word, keyword)
-                    if similarity > 0.75:
-                        score += 1.5 * similarity
-
-        # 3. Score basé sur le contenu
-        content_lower = doc["content"].lower()
-        content_words = query_lower.split()
-        for word in content_words:
-            if len(word) > 3:
-                if word in content_lower:
-                    score += 0.5
-                else:
-                    for content_word in content_lower.split():
-                        if len(content_word) > 4:
-                            similarity = fuzzy_match(word, content_word)
-                            if similarity > 0.8:
-                                score += 0.3 * similarity
-
-        # 4. Bonus pour match dans le titre
-        if any(word in doc["title"].lower() for word in query_lower.split() if len(word) > 3):
-            score += 1.0
-
-        if score > 0:
-            relevant_docs.append({
-                "id": doc_id,
-                "title": doc["title"],
-                "content": doc["content"],
-                "score": round(score, 2)
-            })
-
-    # Tri par score décroissant
-    relevant_docs.sort(key=lambda x: x["score"], reverse=True)
-    return relevant_docs[:3]
-
-def generate_with_gemini_internal(prompt: str) -> Dict[str, Any]:
+def batch_find_relevant_documents(queries: List[str], top_k: int = 3, fusion: Optional[str] = None) -> List[list]:
     """
-    Appel Gemini brut, attend une réponse JSON structurée.
-    Retourne un dictionnaire avec les champs attendus ou un fallback.
+    📦 Recherche sur de nombreuses questions à la fois (scripts d'évaluation, pré-chauffage du cache) :
+    embeddings par lots et un produit matrice-matrice au lieu d'une recherche par question
     """
-    try:
-        response = model.generate_content(prompt, request_options={'timeout': 30})
+    return batch_hybrid_search(queries, current_knowledge_base(), top_k=top_k, semantic_weight=0.7, fusion=fusion)
 
-        if not response.text:
-            raise ValueError("Réponse vide de Gemini")
+# Champs attendus dans la réponse JSON de Gemini
+RESPONSE_FIELDS = ["answer", "situation", "priority", "next_step", "sources", "suggestions"]
 
-        # Tenter de parser la réponse comme JSON
-        try:
-            parsed_response = json.loads(response.text)
-            # Valider les champs essentiels
-            if not all(k in parsed_response for k in ["answer", "situation", "priority", "next_step", "sources", "suggestions"]):
-                raise ValueError("Réponse JSON de Gemini incomplète ou mal formée")
-            return parsed_response
-        except json.JSONDecodeError as e:
-            print(f"❌ Erreur de parsing JSON de la réponse Gemini: {e}")
-            print(f"Réponse brute: {response.text[:500]}...")
-            # Fallback si le JSON est invalide
-            return {
-                "answer": response.text,
-                "situation": "On parle de votre demande.",
-                "priority": "Aucune urgence immédiate.",
-                "next_step": "Me dire ce que vous avez déjà fait sur ce sujet.",
-                "sources": [],
-                "suggestions": []
-            }
+def parse_gemini_response(text: str) -> Dict[str, Any]:
+    """
+    Réponse JSON structurée de Gemini → dict avec les champs attendus.
+    JSON invalide → texte brut comme réponse ; JSON incomplet → ValueError.
+    """
+    if not text:
+        raise ValueError("Réponse vide de Gemini")
 
-    except Exception as e:
-        print(f"⚠️ Erreur lors de l'appel Gemini ou du traitement: {e}")
-        # Fallback général en cas d'erreur
+    # Tenter de parser la réponse comme JSON
+    try:
+        parsed_response = json.loads(text)
+        # Valider les champs essentiels
+        if not all(k in parsed_response for k in RESPONSE_FIELDS):
+            raise ValueError("Réponse JSON de Gemini incomplète ou mal formée")
+        return parsed_response
+    except json.JSONDecodeError as e:
+        print(f"❌ Erreur de parsing JSON de la réponse Gemini: {e}")
+        print(f"Réponse brute: {text[:500]}...")
+        # Fallback si le JSON est invalide
         return {
-            "answer": "Je rencontre des difficultés techniques pour le moment. Veuillez réessayer plus tard.",
-            "situation": "Problème technique.",
+            "answer": text,
+            "situation": "On parle de votre demande.",
             "priority": "Aucune urgence immédiate.",
-            "next_step": "Réessayer dans quelques instants.",
+            "next_step": "Me dire ce que vous avez déjà fait sur ce sujet.",
             "sources": [],
             "suggestions": []
         }
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=10),
-    retry=retry_if_exception_type((Exception,)),
-    reraise=True
-)
-def generate_with_gemini(prompt: str, max_retries: int = 3) -> Dict[str, Any]:
-    """Génère une réponse avec Gemini avec retry automatique (tenacity) et retourne un dict structuré."""
+def technical_error_response() -> Dict[str, Any]:
+    """Fallback général en cas d'erreur Gemini"""
+    return {
+        "answer": "Je rencontre des difficultés techniques pour le moment. Veuillez réessayer plus tard.",
+        "situation": "Problème technique.",
+        "priority": "Aucune urgence immédiate.",
+        "next_step": "Réessayer dans quelques instants.",
+        "sources": [],
+        "suggestions": [],
+        "degraded": True  # réponse de repli : jamais mise en cache
+    }
+
+# Résilience (services/resilience.py) : un disjoncteur par worker, latences par tier (model_pool)
+gemini_breaker = CircuitBreaker("gemini", settings.gemini_breaker_failures, settings.gemini_breaker_recovery)
+
+# Génération depuis les routes async : API async du SDK, appels simultanés plafonnés par worker
+gemini_client = GeminiClient(model, settings.gemini_max_concurrency, settings.gemini_timeout)
+
+def gemini_health() -> Dict[str, Any]:
+    """État du disjoncteur, file d'attente Gemini, latences et tokens par tier (pour /health)"""
+    return {
+        **gemini_client.stats(),
+        "breaker": gemini_breaker.stats(),
+        "tiers": model_pool.stats(),
+    }
+
+async def generate_with_gemini_async(
+    prompt: str,
+    deadline: Optional[Deadline] = None,
+    tier: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    ⚡ Génère la réponse structurée sans bloquer l'event loop, avec le modèle du `tier`.
+    Retry, disjoncteur et hedging dans le budget `deadline` de la requête ;
+    circuit ouvert → réponse de repli immédiate au lieu d'attendre le timeout.
+    L'annulation (client déconnecté) est propagée : l'appel Gemini est abandonné.
+    """
+    deadline = deadline or Deadline(settings.chat_deadline)
+    tier_model = model_pool.model(tier)
+    stats = model_pool.tier_stats(tier)
+    started = time.monotonic()
     try:
-        return generate_with_gemini_internal(prompt)
+        response = await resilient_call(
+            # Créneau pris par resilient_call (limiter) hors du timeout de la tentative
+            lambda timeout: gemini_client.request(prompt, timeout=timeout, model=tier_model),
+            gemini_breaker,
+            deadline,
+            attempt_timeout=settings.gemini_timeout,
+            retries=settings.gemini_retries,
+            latencies=stats.latencies,
+            hedge_percentile=settings.gemini_hedge_percentile or None,
+            # Requête doublée seulement si un créneau est libre (ni file d'attente, ni dépassement du plafond)
+            limiter=gemini_client
+        )
+        stats.record(time.monotonic() - started, getattr(response, "usage_metadata", None))
+        return parse_gemini_response(response.text)
+    except CircuitOpenError as e:
+        print(f"⚡ {e} : réponse de repli immédiate")
+        return technical_error_response()
     except Exception as e:
-        print(f"⚠️ Erreur Gemini après retries: {e}")
-        # Fallback si toutes les retries échouent
-        return {
-            "answer": "Malgré plusieurs tentatives, je n'ai pas pu générer de réponse. Veuillez réessayer plus tard.",
-            "situation": "Problème technique persistant.",
-            "priority": "Aucune urgence immédiate.",
-            "next_step": "Contacter le support si le problème persiste.",
-            "sources": [],
-            "suggestions": []
-        }
+        stats.failures += 1
+        print(f"⚠️ Erreur lors de l'appel Gemini ou du traitement: {e}")
+        return technical_error_response()
+
+async def stream_with_gemini(
+    prompt: str,
+    deadline: Optional[Deadline] = None,
+    tier: Optional[str] = None
+) -> AsyncIterator[Event]:
+    """
+    🌊 Génération en streaming (services/stream_parser.py) :
+    ("delta", texte) de "answer" au fil de l'eau, ("field", (nom, valeur)) dès qu'un champ
+    est complet, puis ("done", réponse complète) — même dict que generate_with_gemini_async.
+    Disjoncteur et budget de temps comme la génération non streamée, sans retry
+    (le texte déjà transmis ne peut pas être repris).
+    """
+    deadline = deadline or Deadline(settings.chat_deadline)
+    stats = model_pool.tier_stats(tier)
+    parser = IncrementalJSONParser()
+    usage = []
+    try:
+        if deadline.expired:
+            raise DeadlineExceeded("Budget de temps épuisé avant la génération")
+        gemini_breaker.allow()
+        started = time.monotonic()
+        try:
+            chunks = gemini_client.stream(
+                prompt,
+                timeout=min(settings.gemini_timeout, deadline.remaining()),
+                model=model_pool.model(tier),
+                on_usage=usage.append
+            )
+            async for chunk in chunks:
+                for event in parser.feed(chunk):
+                    yield event
+        except (asyncio.CancelledError, GeneratorExit):
+            gemini_breaker.release()
+            raise
+        except Exception as e:
+            error = classify_error(e)
+            if isinstance(error, RetryableGeminiError):
+                gemini_breaker.record_failure()
+            else:
+                gemini_breaker.release()
+            stats.failures += 1
+            raise error from e
+        gemini_breaker.record_success()
+        elapsed = time.monotonic() - started
+        stats.latencies.add(elapsed)
+        stats.record(elapsed, usage[0] if usage else None)
+
+        if parser.done and all(k in parser.fields for k in RESPONSE_FIELDS):
+            final = parser.fields
+        else:
+            # Pas de JSON (ou JSON incomplet) : même traitement que la réponse non streamée
+            final = parse_gemini_response(parser.raw_text)
+    except Exception as e:
+        print(f"⚠️ Erreur lors du streaming Gemini: {e}")
+        final = technical_error_response()
+    yield ("done", final)
 
 # ===== SÉCURITÉ =====
 def detect_prompt_injection(text: str) -> Tuple[bool, str]:
@@ -0,0 +1,273 @@
+"""
+🛡️ Résilience des appels Gemini : erreurs typées, retry, circuit breaker, hedging, deadlines
+
+Pendant une panne Gemini, chaque requête attendait jusqu'au timeout de 30 s (et le retry
+tenacity ne se déclenchait jamais : les exceptions étaient avalées plus bas).
+
+- classify_error : exception du SDK → RetryableGeminiError (timeout, 429, 5xx, réseau)
+  ou GeminiError (clé invalide, requête refusée : inutile de réessayer)
+- CircuitBreaker : après `failure_threshold` échecs consécutifs, ouvert pendant
+  `recovery_time` secondes → échec immédiat (CircuitOpenError) ; puis un appel test (half-open)
+- LatencyTracker : p95 des appels réussis, délai du hedging
+- Deadline : budget de temps de la requête HTTP, partagé par les tentatives
+- resilient_call : tentatives avec backoff dans le budget ; seconde requête « hedgée »
+  si la première dépasse le p95. Le créneau de concurrence locale (GeminiClient) est
+  pris avant le chronomètre : une file d'attente pleine n'est ni un timeout Gemini,
+  ni un échec du disjoncteur, ni une latence du p95
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class GeminiError(Exception):
+    """Échec d'un appel Gemini (non réessayable par défaut)"""
+
+
+class RetryableGeminiError(GeminiError):
+    """Échec transitoire : timeout, quota (429), erreur serveur (5xx), réseau"""
+
+
+class CircuitOpenError(GeminiError):
+    """Circuit ouvert : Gemini jugé indisponible, appel non tenté"""
+
+
+class DeadlineExceeded(RetryableGeminiError):
+    """Budget de temps de la requête épuisé"""
+
+
+def classify_error(error: BaseException) -> GeminiError:
+    """Exception du SDK (google.api_core) ou d'asyncio → erreur typée"""
+    if isinstance(error, GeminiError):
+        return error
+    # Import tardif : google.api_core vient avec google-generativeai
+    from google.api_core import exceptions as api_exceptions
+    retryable = (
+        asyncio.TimeoutError, TimeoutError, ConnectionError,
+        api_exceptions.DeadlineExceeded, api_exceptions.ServiceUnavailable,
+        api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests,
+        api_exceptions.ServerError, api_exceptions.RetryError,
+    )
+    name = type(error).__name__
+    if isinstance(error, retryable):
+        return RetryableGeminiError(f"{name}: {error}")
+    return GeminiError(f"{name}: {error}")
+
+
+class CircuitBreaker:
+    """Disjoncteur closed → open → half_open → closed (thread-safe, compteurs par worker)"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_time = recovery_time
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Lève CircuitOpenError si l'appel ne doit pas être tenté"""
+        with self._lock:
+            if self.state == BREAKER_OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_time:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit {self.name} ouvert")
+                self.state = BREAKER_HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == BREAKER_HALF_OPEN:
+                # Un seul appel test à la fois
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit {self.name} en test")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != BREAKER_OPEN:
+                    self.trips += 1
+                    print(f"🔌 Circuit {self.name} ouvert ({self.consecutive_failures} échecs) pendant {self.recovery_time}s")
+                self.state = BREAKER_OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Appel abandonné (annulation) : ni succès ni échec, libère l'appel test"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == BREAKER_OPEN and self.opened_at is not None:
+            retry_in = round(max(0.0, self.recovery_time - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_in_seconds": retry_in,
+        }
+
+
+class LatencyTracker:
+    """Latences des derniers appels réussis (fenêtre glissante)"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """None tant que la fenêtre n'a pas assez d'échantillons"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class Deadline:
+    """Budget de temps d'une requête (monotonic)"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+async def resilient_call(
+    call: Callable[[float], Awaitable[T]],
+    breaker: CircuitBreaker,
+    deadline: Deadline,
+    attempt_timeout: float,
+    retries: int = 2,
+    latencies: Optional[LatencyTracker] = None,
+    hedge_percentile: Optional[float] = None,
+    can_hedge: Callable[[], bool] = lambda: True,
+    backoff: float = 0.5,
+    limiter: Optional[Any] = None
+) -> T:
+    """
+    call(timeout) avec retry sur RetryableGeminiError, dans le budget `deadline`.
+    Hedging : si hedge_percentile est donné et que la tentative dépasse ce percentile
+    des latences récentes, une seconde requête identique part ; la première réponse gagne.
+    limiter : objet acquire(timeout) / try_acquire() / release() (GeminiClient) ; chaque tentative
+    attend son créneau dans le budget `deadline`, puis `call` (sans prise de créneau) est chronométré.
+    La requête doublée prend son propre créneau sans attendre : aucun libre → pas de doublon.
+    """
+    last_error: Optional[GeminiError] = None
+    for attempt in range(retries + 1):
+        if attempt:
+            # Backoff exponentiel avec jitter, sans dépasser le budget
+            await asyncio.sleep(min(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5), deadline.remaining()))
+        if deadline.expired:
+            raise DeadlineExceeded("Budget de temps épuisé") from last_error
+
+        breaker.allow()
+        if limiter is not None:
+            try:
+                await limiter.acquire(deadline.remaining())
+            except asyncio.TimeoutError:
+                # File d'attente locale pleine : Gemini n'a pas été appelé, le circuit n'est pas concerné
+                breaker.release()
+                raise DeadlineExceeded("Budget de temps épuisé en attente d'un créneau Gemini") from last_error
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+
+        try:
+            # Chronomètre démarré une fois le créneau obtenu : l'attente n'est pas une latence Gemini
+            timeout = min(attempt_timeout, deadline.remaining())
+            if timeout <= 0:
+                raise DeadlineExceeded("Budget de temps épuisé") from last_error
+            started = time.monotonic()
+            hedge_after = latencies.percentile(hedge_percentile) if latencies and hedge_percentile else None
+            result = await _hedged(call, timeout, hedge_after, can_hedge, limiter)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            breaker.release()
+            raise
+        except Exception as e:
+            error = classify_error(e)
+            if not isinstance(error, RetryableGeminiError):
+                # Requête refusée (clé, contenu) : Gemini répond, le circuit reste fermé
+                breaker.release()
+                raise error from e
+            breaker.record_failure()
+            last_error = error
+            print(f"⚠️ Gemini tentative {attempt + 1}/{retries + 1} échouée: {error}")
+            continue
+        else:
+            breaker.record_success()
+            if latencies is not None:
+                latencies.add(time.monotonic() - started)
+            return result
+        finally:
+            # Créneau rendu avant le backoff
+            if limiter is not None:
+                limiter.release()
+
+    raise last_error
+
+
+async def _hedged(
+    call: Callable[[float], Awaitable[T]],
+    timeout: float,
+    hedge_after: Optional[float],
+    can_hedge: Callable[[], bool],
+    limiter: Optional[Any] = None
+) -> T:
+    """Une tentative, doublée après `hedge_after` secondes si elle n'a pas encore répondu"""
+    first = asyncio.ensure_future(asyncio.wait_for(call(timeout), timeout))
+    if hedge_after is None or hedge_after >= timeout:
+        return await first
+
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and can_hedge() and (limiter is None or await limiter.try_acquire()):
+            remaining = max(0.001, timeout - hedge_after)
+            print(f"🏇 Requête Gemini doublée (> p95 {hedge_after:.1f}s)")
+            hedge = asyncio.ensure_future(asyncio.wait_for(call(remaining), remaining))
+            if limiter is not None:
+                # Créneau rendu à la fin de la requête doublée, même annulée avant d'avoir démarré
+                hedge.add_done_callback(lambda _: limiter.release())
+            tasks.add(hedge)
+
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
@@ -0,0 +1,67 @@
+"""
+🧵 Exécuteur borné pour le travail CPU de la recherche (hors event loop)
+
+Les routes async déportent le scoring (BM25, produits matrice-vecteur, fusion, MMR)
+dans un pool de threads dédié : NumPy libère le GIL pendant les calculs, l'event loop
+continue de servir les autres requêtes du worker.
+
+- max_workers : threads de scoring
+- max_pending : requêtes admises à la fois (exécution + file) ; au-delà, les appelants
+  attendent sur l'event loop au lieu d'empiler une file sans limite dans le pool
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class RetrievalExecutor:
+    """Pool de threads de recherche avec admission bornée"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, name: str = "retrieval"):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute fn(*args, **kwargs) dans le pool sans bloquer l'event loop"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._pool(), functools.partial(fn, *args, **kwargs))
+                self.completed += 1
+                return result
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        """Arrêt du pool (fin du lifespan) ; recréé au besoin"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
@@ -0,0 +1,79 @@
+"""
+🚦 Routage avant recherche : faut-il interroger la knowledge base ?
+
+Signaux bon marché (aucun appel réseau) :
+- intention détectée (detect_intent)
+- longueur du message et présence de mots porteurs de sens
+- confiance lexicale : meilleur score BM25 + fuzzy de la knowledge base
+
+Les messages de small talk ou d'épuisement sans sujet administratif
+(« merci », « je suis à bout ») passent par un prompt léger :
+pas d'embedding Gemini, pas de recherche hybride, pas de documents dans le prompt.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from services.lexical_index import fold_accents, tokenize
+from config.settings import settings
+
+ROUTE_RETRIEVAL = "retrieval"
+ROUTE_LIGHT = "light"
+
+# Formules de politesse / small talk (sans accents)
+SMALL_TALK = re.compile(
+    r"^(bonjour|bonsoir|salut|coucou|hello|merci( beaucoup| bien)?|ok|okay|d'?accord|super|genial|parfait|"
+    r"au revoir|bonne (journee|soiree)|a bientot|oui|non|top|cool|ca marche|(comment )?ca va|et (toi|vous))[\s!.?,😊🙏👍]*$"
+)
+
+# Intentions pour lesquelles la recherche n'est faite que si la KB répond clairement
+LOW_RETRIEVAL_INTENTS = frozenset({"fatigue"})
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Décision de routage d'un message (loggée dans les analytics)"""
+    route: str
+    reason: str
+    intent: Optional[str] = None
+    lexical_confidence: float = 0.0
+    tier: Optional[str] = None  # modèle de génération (services/model_tiers.py), fixé après la recherche
+
+    @property
+    def retrieval(self) -> bool:
+        return self.route == ROUTE_RETRIEVAL
+
+
+def lexical_confidence(message: str, knowledge_base: Dict[str, Dict]) -> float:
+    """Meilleur score lexical (BM25 + fuzzy mots-clés) du message sur la knowledge base"""
+    # Import tardif : semantic_search configure Gemini
+    from services.semantic_search import keyword_scores
+    _, scores = keyword_scores(message, knowledge_base)
+    return float(scores.max()) if scores.size else 0.0
+
+
+def is_small_talk(message: str) -> bool:
+    """Formule de politesse courte (« merci ! », « bonjour »)"""
+    normalized = fold_accents(message.strip())
+    return len(normalized.split()) <= settings.route_small_talk_max_words and bool(SMALL_TALK.match(normalized))
+
+
+def route_message(message: str, intent: Optional[str], knowledge_base: Dict[str, Dict]) -> RouteDecision:
+    """
+    🚦 Décide si la recherche documentaire doit tourner pour ce message.
+    En cas de doute, la recherche est conservée.
+    """
+    if not settings.routing_enabled:
+        return RouteDecision(ROUTE_RETRIEVAL, "disabled", intent)
+
+    if is_small_talk(message):
+        return RouteDecision(ROUTE_LIGHT, "small_talk", intent)
+
+    if not tokenize(message):
+        return RouteDecision(ROUTE_LIGHT, "no_content", intent)
+
+    confidence = lexical_confidence(message, knowledge_base)
+    if intent in LOW_RETRIEVAL_INTENTS and confidence < settings.route_min_lexical_score:
+        return RouteDecision(ROUTE_LIGHT, f"{intent}_low_confidence", intent, confidence)
+
+    return RouteDecision(ROUTE_RETRIEVAL, "informational", intent, confidence)
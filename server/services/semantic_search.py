@@ -3,11 +3,28 @@
 Remplace le keyword matching par une vraie compréhension du sens
 """
 import os
-import json
+import time
+import asyncio
+import threading
 import numpy as np
 from pathlib import Path
-from typing import List, Dict, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Set, Tuple, Optional
 import google.generativeai as genai
+from services.vector_index import VectorIndex, IVFIndex, UNSCORED, top_k_indices, vectors_fingerprint
+from services.quantization import Int8Index, PQIndex
+from services.local_embedder import LocalEmbedder
+from services.lexical_index import BM25Index, tokenize
+from services.fusion import SearchResult, align_rows, fuse, normalize_max
+from services.diversity import DocSimilarity, mmr
+from services.chunking import (
+    Passage, PassageIndex, chunk_knowledge_base, passage_embedding_text, join_passages
+)
+from services.shared_index import artifact_key, shared_array, shared_doc_similarity
+from services.embedding_store import EmbeddingStore, load_store, save_store, import_json, ivf_path, prune_ivf
+from services.embedding_pipeline import embed_documents, embed_batch, clear_checkpoint, text_hash, EMBEDDING_MODEL, MAX_BATCH_SIZE
+from core.cache import query_embedding_cache
+from config.settings import settings
 
 # Configuration Gemini (réutilise la clé existante)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -15,9 +32,69 @@ if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
 # Cache des embeddings pour éviter de recalculer à chaque requête
+# (vues sur le store binaire memory-mapped, voir services/embedding_store.py)
 EMBEDDINGS_CACHE = {}
+# {doc_id: {"hash": hash(titre+contenu), "model": modèle d'embedding}}
+EMBEDDINGS_METADATA: Dict[str, Dict[str, Optional[str]]] = {}
+EMBEDDINGS_STORE: Optional[EmbeddingStore] = None
+# Ancien format JSON : importé une fois vers le store binaire s'il n'existe pas encore
 EMBEDDINGS_CACHE_FILE = Path(__file__).parent.parent / 'config' / 'embeddings_cache.json'
 
+# Fichiers IVF lus ou écrits depuis la dernière initialisation (conservés par prune_ivf)
+_IVF_USED: Set[Path] = set()
+
+# Après un échec Gemini, les requêtes passent par l'index local jusqu'à cette date (monotonic)
+_REMOTE_EMBEDDING_RETRY_AT = 0.0
+
+
+class KnowledgeIndexes:
+    """
+    Index construits pour une version (un dict) de la knowledge base :
+    - passages_by_doc : découpage par sections (voir services/chunking.py)
+    - lexical : BM25 (scorer lexical de hybrid_search et fallback sans Gemini)
+    - semantic : vecteurs Gemini des passages, construit une fois
+    - local / local_embedder : index de secours (embeddings locaux) si Gemini échoue
+    - similarity / local_similarity : similarités doc × doc (MMR) de chacun des deux index
+    """
+
+    def __init__(self, knowledge_base: Dict[str, Dict], root: Optional[Dict[str, Dict]] = None):
+        self.knowledge_base = knowledge_base
+        # Corpus complet dont cette base est une partition (lui-même sinon)
+        self.root_id = id(root if root is not None else knowledge_base)
+        self.passages_by_doc: Optional[Dict[str, List[Passage]]] = None
+        self.lexical: Optional[BM25Index] = None
+        self.semantic: Optional[PassageIndex] = None
+        self.local_embedder: Optional[LocalEmbedder] = None
+        self.local: Optional[PassageIndex] = None
+        self.similarity: Optional[DocSimilarity] = None
+        self.local_similarity: Optional[DocSimilarity] = None
+        # id(index de passages) → (index, lignes passages-docs, lignes BM25) pour la fusion
+        self.alignments: Dict[int, Tuple[PassageIndex, np.ndarray, np.ndarray]] = {}
+
+
+# Index par version de la knowledge base (clé : id du dict ; les partitions par facette
+# comptent avec leur corpus). Pendant un rechargement à chaud, les requêtes en cours
+# terminent sur l'ancienne version, conservée jusqu'à ce que MAX_INDEXED_VERSIONS
+# versions plus récentes existent.
+MAX_INDEXED_VERSIONS = 2
+_INDEXES: "OrderedDict[int, KnowledgeIndexes]" = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+def indexes_for(knowledge_base: Dict[str, Dict], root: Optional[Dict[str, Dict]] = None) -> KnowledgeIndexes:
+    """Index de cette version de la knowledge base (créés vides au premier accès)"""
+    with _INDEXES_LOCK:
+        entry = _INDEXES.get(id(knowledge_base))
+        if entry is None or entry.knowledge_base is not knowledge_base:
+            entry = KnowledgeIndexes(knowledge_base, root)
+            _INDEXES[id(knowledge_base)] = entry
+            # Éviction par version : toutes les entrées (corpus + partitions) de la plus ancienne
+            roots = list(dict.fromkeys(cached.root_id for cached in _INDEXES.values()))
+            for root_id in roots[:max(0, len(roots) - MAX_INDEXED_VERSIONS)]:
+                for key in [key for key, cached in _INDEXES.items() if cached.root_id == root_id]:
+                    del _INDEXES[key]
+        return entry
+
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calcule la similarité cosinus entre deux vecteurs"""
@@ -34,92 +111,474 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     return float(dot_product / (norm1 * norm2))
 
 
-def get_embedding(text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
+def _embed_content(text: str, task_type: str) -> List[float]:
+    """Appel brut à Gemini text-embedding-004 (lève une exception en cas d'échec)"""
+    result = genai.embed_content(
+        model=EMBEDDING_MODEL,
+        content=text,
+        task_type=task_type,
+        title=text[:100] if task_type == "RETRIEVAL_DOCUMENT" else None,
+        request_options={"timeout": settings.embedding_query_timeout} if task_type == "RETRIEVAL_QUERY" else None
+    )
+    return result['embedding']
+
+
+def remote_embedding_available() -> bool:
+    """False pendant settings.embedding_fallback_cooldown secondes après un échec Gemini"""
+    return time.monotonic() >= _REMOTE_EMBEDDING_RETRY_AT
+
+
+def _remote_embedding_failed(error: Exception):
+    """Bascule les requêtes sur l'index local le temps du cooldown"""
+    global _REMOTE_EMBEDDING_RETRY_AT
+    _REMOTE_EMBEDDING_RETRY_AT = time.monotonic() + settings.embedding_fallback_cooldown
+    print(f"❌ Erreur embedding Gemini: {error} → index local pendant {settings.embedding_fallback_cooldown}s")
+
+
+def get_embedding(text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> Optional[List[float]]:
     """
     Génère un embedding avec Gemini text-embedding-004
 
     task_type options:
     - RETRIEVAL_DOCUMENT: Pour indexer les documents (knowledge base)
-    - RETRIEVAL_QUERY: Pour les requêtes utilisateur
+    - RETRIEVAL_QUERY: Pour les requêtes utilisateur (passent par le cache LRU)
+
+    Returns:
+        None si Gemini échoue (ou vient d'échouer) : la recherche passe alors par l'index local
     """
+    if task_type == "RETRIEVAL_QUERY":
+        cached = query_embedding_cache.get(text, task_type)
+        if cached is not None:
+            return cached
+
+    if not remote_embedding_available():
+        return None
+
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type=task_type,
-            title=text[:100] if task_type == "RETRIEVAL_DOCUMENT" else None
-        )
-        return result['embedding']
+        embedding = _embed_content(text, task_type)
     except Exception as e:
-        print(f"❌ Erreur embedding Gemini: {e}")
-        # Fallback: retourner un vecteur aléatoire pour éviter le crash
-        return [0.0] * 768  # text-embedding-004 fait 768 dimensions
+        _remote_embedding_failed(e)
+        return None
+
+    if task_type == "RETRIEVAL_QUERY":
+        query_embedding_cache.set(text, task_type, embedding)
+    return embedding
+
+
+async def get_query_embedding_async(query: str) -> Optional[List[float]]:
+    """
+    ⚡ Embedding d'une requête utilisateur depuis une route async
+    Cache LRU puis Redis ; en cas de miss, l'appel Gemini tourne hors de l'event loop.
+    None si Gemini est indisponible (recherche sur l'index local).
+    """
+    cached = await query_embedding_cache.aget(query, "RETRIEVAL_QUERY")
+    if cached is not None:
+        return cached
 
+    if not remote_embedding_available():
+        return None
 
-def load_embeddings_cache() -> Dict[str, List[float]]:
-    """Charge le cache des embeddings depuis le fichier JSON"""
-    global EMBEDDINGS_CACHE
+    try:
+        embedding = await asyncio.to_thread(_embed_content, query, "RETRIEVAL_QUERY")
+    except Exception as e:
+        _remote_embedding_failed(e)
+        return None
 
-    if EMBEDDINGS_CACHE_FILE.exists():
+    await query_embedding_cache.aset(query, "RETRIEVAL_QUERY", embedding)
+    return embedding
+
+
+def load_embeddings_cache(knowledge_base: Optional[Dict[str, Dict]] = None) -> Dict[str, List[float]]:
+    """
+    Charge le cache des embeddings depuis le store binaire (np.memmap, sans parsing JSON).
+    Si seul l'ancien embeddings_cache.json existe, il est converti une fois, avec les hashes
+    de `knowledge_base` (sinon tous ses vecteurs seraient ré-embeddés au premier démarrage).
+    """
+    global EMBEDDINGS_CACHE, EMBEDDINGS_METADATA, EMBEDDINGS_STORE
+
+    store = load_store()
+    if store is None and EMBEDDINGS_CACHE_FILE.exists():
         try:
-            with open(EMBEDDINGS_CACHE_FILE, 'r', encoding='utf-8') as f:
-                EMBEDDINGS_CACHE = json.load(f)
-            print(f"📦 Embeddings cache chargé: {len(EMBEDDINGS_CACHE)} documents")
+            print("🔄 Conversion embeddings_cache.json → store binaire...")
+            metadata = embedding_metadata(knowledge_base) if knowledge_base else None
+            import_json(EMBEDDINGS_CACHE_FILE, metadata=metadata)
+            store = load_store()
         except Exception as e:
-            print(f"⚠️ Erreur chargement cache embeddings: {e}")
-            EMBEDDINGS_CACHE = {}
+            print(f"⚠️ Erreur conversion cache embeddings: {e}")
+
+    if store is not None:
+        EMBEDDINGS_STORE = store
+        EMBEDDINGS_CACHE = store.to_dict()
+        EMBEDDINGS_METADATA = store.metadata()
+        print(f"📦 Embeddings cache chargé: {len(EMBEDDINGS_CACHE)} documents (memmap)")
 
     return EMBEDDINGS_CACHE
 
 
 def save_embeddings_cache():
-    """Sauvegarde le cache des embeddings dans un fichier JSON"""
+    """Sauvegarde le cache des embeddings dans le store binaire puis le ré-ouvre en memmap"""
+    global EMBEDDINGS_CACHE, EMBEDDINGS_METADATA, EMBEDDINGS_STORE
+
     try:
-        EMBEDDINGS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(EMBEDDINGS_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(EMBEDDINGS_CACHE, f, ensure_ascii=False, indent=2)
+        save_store(EMBEDDINGS_CACHE, metadata=EMBEDDINGS_METADATA)
+        store = load_store()
+        if store is not None:
+            EMBEDDINGS_STORE = store
+            EMBEDDINGS_CACHE = store.to_dict()
+            EMBEDDINGS_METADATA = store.metadata()
         print(f"💾 Cache embeddings sauvegardé: {len(EMBEDDINGS_CACHE)} documents")
     except Exception as e:
         print(f"❌ Erreur sauvegarde cache: {e}")
 
 
-def create_knowledge_base_embeddings(knowledge_base: Dict[str, Dict]) -> Dict[str, List[float]]:
-    """
-    Crée les embeddings pour toute la knowledge base
-    Utilise le cache pour éviter de recalculer
-    """
-    load_embeddings_cache()
+def document_text(doc: Dict) -> str:
+    """Texte à encoder pour un document (titre + contenu pour meilleure précision)"""
+    return f"{doc['title']}\n\n{doc['content']}"
 
-    new_embeddings_count = 0
 
-    for doc_id, doc in knowledge_base.items():
-        # Vérifier si embedding déjà en cache
-        if doc_id in EMBEDDINGS_CACHE:
-            continue
+def content_hash(doc: Dict) -> str:
+    """Empreinte du texte encodé (titre + contenu) d'un document"""
+    return text_hash(document_text(doc))
+
 
-        # Créer le texte à encoder (titre + contenu pour meilleure précision)
-        text_to_embed = f"{doc['title']}\n\n{doc['content']}"
+def passage_texts(knowledge_base: Dict[str, Dict]) -> Dict[str, str]:
+    """{id de passage: texte encodé} de toute la knowledge base"""
+    return {
+        passage.id: passage_embedding_text(passage)
+        for doc_passages in get_passages(knowledge_base).values()
+        for passage in doc_passages
+    }
 
-        # Générer l'embedding
-        embedding = get_embedding(text_to_embed, task_type="RETRIEVAL_DOCUMENT")
-        EMBEDDINGS_CACHE[doc_id] = embedding
-        new_embeddings_count += 1
 
-        print(f"🔄 Embedding créé pour: {doc['title']}")
+def embedding_metadata(knowledge_base: Dict[str, Dict]) -> Dict[str, Dict[str, str]]:
+    """
+    Hash + modèle attendus pour chaque passage de la knowledge base : estampille des vecteurs
+    importés sans métadonnées (un document court n'a qu'un passage, d'id = id du document)
+    """
+    return {
+        passage_id: {"hash": text_hash(text), "model": EMBEDDING_MODEL}
+        for passage_id, text in passage_texts(knowledge_base).items()
+    }
+
+
+def build_passages(knowledge_base: Dict[str, Dict]) -> Dict[str, List[Passage]]:
+    """Découpe la KB en passages (pas d'appel réseau)"""
+    passages = chunk_knowledge_base(
+        knowledge_base,
+        max_chars=settings.chunk_max_chars,
+        overlap=settings.chunk_overlap
+    )
+    passages_by_doc: Dict[str, List[Passage]] = {}
+    for passage in passages:
+        passages_by_doc.setdefault(passage.doc_id, []).append(passage)
+    indexes_for(knowledge_base).passages_by_doc = passages_by_doc
+    return passages_by_doc
+
+
+def get_passages(knowledge_base: Dict[str, Dict]) -> Dict[str, List[Passage]]:
+    """Passages de cette version de la knowledge base (découpés au premier accès)"""
+    passages_by_doc = indexes_for(knowledge_base).passages_by_doc
+    if passages_by_doc is None:
+        return build_passages(knowledge_base)
+    return passages_by_doc
+
+
+def create_knowledge_base_embeddings(
+    knowledge_base: Dict[str, Dict],
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    prune: bool = True
+) -> Dict[str, List[float]]:
+    """
+    Synchronise les embeddings des passages avec la knowledge base (incrémental)
 
-    # Sauvegarder le cache si de nouveaux embeddings ont été créés
-    if new_embeddings_count > 0:
+    - Nouveaux passages, contenu modifié ou modèle changé → ré-embeddés (par lots)
+    - Passages inchangés → vecteur du cache réutilisé
+    - Passages disparus de la KB (orphelins) → retirés du cache si prune=True
+      et si tous les passages actuels ont pu être encodés
+    """
+    load_embeddings_cache(knowledge_base)
+
+    texts = passage_texts(knowledge_base)
+    hashes = {passage_id: text_hash(text) for passage_id, text in texts.items()}
+    stale = {}
+    added = changed = 0
+    for passage_id, text in texts.items():
+        metadata = EMBEDDINGS_METADATA.get(passage_id) or {}
+        if passage_id not in EMBEDDINGS_CACHE:
+            added += 1
+        elif metadata.get("hash") != hashes[passage_id] or metadata.get("model") != EMBEDDING_MODEL:
+            changed += 1
+        else:
+            continue
+        stale[passage_id] = text
+
+    new_embeddings = embed_documents(stale, batch_size=batch_size, concurrency=concurrency) if stale else {}
+    # En cas d'échec, l'ancien vecteur est conservé avec son ancien hash : réessayé au prochain démarrage
+    for passage_id, embedding in new_embeddings.items():
+        EMBEDDINGS_CACHE[passage_id] = embedding
+        EMBEDDINGS_METADATA[passage_id] = {"hash": hashes[passage_id], "model": EMBEDDING_MODEL}
+
+    # Les orphelins (ex: vecteur du document entier avant découpage) servent de repli
+    # tant que tous les passages n'ont pas d'embedding
+    complete = len(new_embeddings) == len(stale)
+    orphans = [passage_id for passage_id in EMBEDDINGS_CACHE if passage_id not in texts] if prune and complete else []
+    for passage_id in orphans:
+        del EMBEDDINGS_CACHE[passage_id]
+        EMBEDDINGS_METADATA.pop(passage_id, None)
+
+    unchanged = len(texts) - len(stale)
+    print(f"♻️ Embeddings passages: {added} ajoutés, {changed} modifiés, {len(orphans)} supprimés, {unchanged} inchangés")
+
+    # Sauvegarder le cache si de nouveaux embeddings ont été créés ou des orphelins retirés
+    if new_embeddings or orphans:
         save_embeddings_cache()
-        print(f"✅ {new_embeddings_count} nouveaux embeddings créés")
+        if new_embeddings:
+            print(f"✅ {len(new_embeddings)} nouveaux embeddings créés")
+    if stale and complete:
+        clear_checkpoint()
 
     return EMBEDDINGS_CACHE
 
 
+def use_ann_index(n_vectors: int) -> bool:
+    """IVF si demandé explicitement, ou en mode "auto" au-delà de settings.ann_min_vectors"""
+    if settings.ann_index == "ivf":
+        return True
+    return settings.ann_index == "auto" and n_vectors >= settings.ann_min_vectors
+
+
+def build_vector_index(
+    ids: List[str],
+    matrix: np.ndarray,
+    normalized: bool = False,
+    rows: Optional[np.ndarray] = None,
+    key: Optional[str] = None
+) -> VectorIndex:
+    """
+    Index exact pour un petit corpus, IVF (approximatif) pour un gros corpus.
+    L'IVF est relu depuis config/embeddings_ivf-<empreinte>.npz s'il correspond à ces vecteurs,
+    sinon entraîné (k-means) puis sauvegardé. Empreinte = `key` (ids + hash du texte de
+    chaque vecteur + modèle, voir artifact_key), ou à défaut le contenu des vecteurs :
+    un ré-embedding ou un changement de modèle n'en réutilise jamais les centroïdes.
+    Index exact quantifié (int8 / PQ) si settings.vector_quantization le demande :
+    `matrix` + `rows` (lignes du store memmap) ne servent alors qu'au re-rank float.
+    """
+    if not ids:
+        return VectorIndex(ids, matrix, normalized=normalized)
+
+    if not use_ann_index(len(ids)) and settings.vector_quantization in ("int8", "pq"):
+        if settings.vector_quantization == "int8":
+            index = Int8Index(ids, matrix, normalized=normalized, rerank=settings.quantization_rerank, rows=rows)
+        else:
+            index = PQIndex(
+                ids, matrix, normalized=normalized, rerank=settings.quantization_rerank, rows=rows,
+                n_subvectors=settings.pq_subvectors
+            )
+        print(f"🗜️ Index quantifié {settings.vector_quantization}: {index.nbytes / len(ids):.0f} octets/vecteur")
+        return index
+
+    if rows is not None:
+        matrix = matrix[rows]
+    if not use_ann_index(len(ids)):
+        return VectorIndex(ids, matrix, normalized=normalized)
+
+    n_lists = settings.ivf_n_lists or None
+    fingerprint = key or vectors_fingerprint(ids, matrix, EMBEDDING_MODEL)
+    path = ivf_path(fingerprint)
+    index = IVFIndex.load(
+        path, ids, matrix, normalized=normalized, nprobe=settings.ivf_nprobe, n_lists=n_lists, fingerprint=fingerprint
+    )
+    _IVF_USED.add(path)
+    if index is not None:
+        print(f"🗂️ Index IVF chargé: {index.n_lists} listes, nprobe={index.nprobe}")
+        return index
+
+    index = IVFIndex(ids, matrix, normalized=normalized, n_lists=n_lists, nprobe=settings.ivf_nprobe)
+    try:
+        index.save(path, fingerprint=fingerprint)
+    except Exception as e:
+        print(f"⚠️ Erreur sauvegarde index IVF: {e}")
+    print(f"🗂️ Index IVF construit: {index.n_lists} listes, nprobe={index.nprobe}")
+    return index
+
+
+def build_semantic_index(knowledge_base: Dict[str, Dict]) -> PassageIndex:
+    """
+    Construit l'index vectoriel des passages de la knowledge base.
+    Ne déclenche jamais d'appel d'embedding : un document dont les passages
+    n'ont pas tous un embedding est indexé avec le vecteur de son document entier
+    s'il existe (migration), sinon il est absent de l'index.
+    """
+    if EMBEDDINGS_STORE is None and not EMBEDDINGS_CACHE:
+        load_embeddings_cache(knowledge_base)
+
+    indexed: List[Passage] = []
+    missing = 0
+    for doc_id, doc_passages in get_passages(knowledge_base).items():
+        if all(passage.id in EMBEDDINGS_CACHE for passage in doc_passages):
+            indexed.extend(doc_passages)
+        elif doc_id in EMBEDDINGS_CACHE:
+            doc = knowledge_base[doc_id]
+            indexed.append(Passage(id=doc_id, doc_id=doc_id, title=doc["title"], heading="", text=doc["content"], position=0))
+        else:
+            missing += 1
+    if missing:
+        print(f"⚠️ {missing} documents sans embedding (non indexés)")
+
+    passage_ids = [passage.id for passage in indexed]
+    # Vecteurs partagés entre workers : clé = passages + hash du texte encodé (services/shared_index.py)
+    key = artifact_key(passage_ids, (EMBEDDINGS_METADATA.get(pid, {}).get("hash") for pid in passage_ids), EMBEDDING_MODEL)
+    store_rows = EMBEDDINGS_STORE.row_indices(passage_ids) if EMBEDDINGS_STORE is not None else None
+    if store_rows is not None:
+        # Vecteurs déjà normalisés dans le store : pas de copie si l'ordre correspond
+        source = EMBEDDINGS_STORE.matrix
+        if EMBEDDINGS_STORE.ids == passage_ids:
+            store_rows = None
+        elif settings.shared_indexes:
+            # Lignes réordonnées une fois pour tous les workers
+            rows = store_rows
+            source = shared_array("passages", key, lambda: EMBEDDINGS_STORE.matrix[rows])
+            store_rows = None
+        vectors = build_vector_index(passage_ids, source, normalized=True, rows=store_rows, key=key)
+    else:
+        source = np.vstack([
+            np.asarray(EMBEDDINGS_CACHE[passage_id], dtype=np.float32) for passage_id in passage_ids
+        ]) if passage_ids else np.zeros((0, 0), dtype=np.float32)
+        vectors = build_vector_index(passage_ids, source, key=key)
+    index = PassageIndex(indexed, vectors)
+
+    entry = indexes_for(knowledge_base)
+    entry.semantic = index
+    entry.similarity = shared_doc_similarity("passages", key, index.doc_ids, lambda: DocSimilarity.from_passages(
+        index.doc_ids, index.offsets, source, rows=store_rows, max_matrix_docs=settings.mmr_max_docs
+    ))
+    print(f"🧮 Index sémantique construit: {len(index)} passages, {len(index.doc_ids)} documents")
+    return index
+
+
+def get_semantic_index(knowledge_base: Dict[str, Dict]) -> PassageIndex:
+    """Index vectoriel de cette version de la knowledge base (construit au premier accès)"""
+    index = indexes_for(knowledge_base).semantic
+    if index is None:
+        return build_semantic_index(knowledge_base)
+    return index
+
+
+def build_local_index(knowledge_base: Dict[str, Dict]) -> PassageIndex:
+    """
+    Index de secours : tous les passages, encodés par l'embedder local (pas d'appel réseau).
+    Couvre aussi les documents sans embedding Gemini.
+    """
+    passages = [passage for doc_passages in get_passages(knowledge_base).values() for passage in doc_passages]
+    texts = [passage_embedding_text(passage) for passage in passages]
+    passage_ids = [passage.id for passage in passages]
+    # IDF et vecteurs partagés entre workers (publiés par le premier qui les calcule)
+    key = artifact_key(passage_ids, (text_hash(text) for text in texts), f"local:{settings.local_embedding_dim}")
+    embedder = LocalEmbedder(dim=settings.local_embedding_dim)
+    embedder.idf = shared_array("local-idf", key, lambda: embedder.fit(texts).idf)
+    matrix = shared_array("local", key, lambda: embedder.embed_many(texts))
+    index = PassageIndex(passages, VectorIndex(passage_ids, matrix, normalized=True))
+
+    entry = indexes_for(knowledge_base)
+    entry.local_embedder, entry.local = embedder, index
+    entry.local_similarity = shared_doc_similarity("local", key, index.doc_ids, lambda: DocSimilarity.from_passages(
+        index.doc_ids, index.offsets, matrix, max_matrix_docs=settings.mmr_max_docs
+    ))
+    print(f"🛟 Index local de secours construit: {len(index)} passages ({embedder.dim} dims)")
+    return index
+
+
+def get_local_index(knowledge_base: Dict[str, Dict]) -> Tuple[PassageIndex, LocalEmbedder]:
+    """(index local, embedder) de cette version de la knowledge base (construits au premier accès)"""
+    entry = indexes_for(knowledge_base)
+    if entry.local is None or entry.local_embedder is None:
+        build_local_index(knowledge_base)
+    return entry.local, entry.local_embedder
+
+
+def passage_fields(selected: List[Tuple[Passage, float]]) -> Dict:
+    """Champs "content" (passages retenus) et "passages" d'un résultat"""
+    return {
+        "content": join_passages([passage for passage, _ in selected]),
+        "passages": [
+            {"id": passage.id, "heading": passage.heading, "score": round(score, 3)}
+            for passage, score in sorted(selected, key=lambda item: item[0].position)
+        ]
+    }
+
+
+def semantic_passage_scores(
+    query: str,
+    knowledge_base: Dict[str, Dict],
+    threshold: float = 0.3,
+    query_embedding: Optional[List[float]] = None
+) -> Tuple[PassageIndex, np.ndarray, float]:
+    """
+    Scores de tous les passages : (index utilisé, scores, seuil applicable).
+    Sans embedding Gemini (échec, timeout, index vide) → index local de secours.
+    """
+    index = get_semantic_index(knowledge_base)
+
+    # Générer l'embedding de la requête (si pas déjà fourni par l'appelant)
+    if query_embedding is None and len(index):
+        query_embedding = get_embedding(query, task_type="RETRIEVAL_QUERY")
+
+    if query_embedding is None or not len(index) or not np.any(query_embedding):
+        index, local_embedder = get_local_index(knowledge_base)
+        query_embedding = local_embedder.embed(query)
+        threshold = min(threshold, settings.local_embedding_threshold)
+        print("🛟 Recherche sémantique sur l'index local (Gemini indisponible)")
+
+    # Un seul produit matrice-vecteur sur les passages
+    return index, index.score(query_embedding), threshold
+
+
+def semantic_search_passages(
+    query: str,
+    knowledge_base: Dict[str, Dict],
+    top_k: int = 3,
+    threshold: float = 0.3,
+    query_embedding: Optional[List[float]] = None
+) -> Tuple[List[Dict], PassageIndex, np.ndarray]:
+    """
+    Recherche sémantique au niveau des passages.
+    Retourne (documents, index, scores de tous les passages).
+    """
+    index, passage_scores, threshold = semantic_passage_scores(query, knowledge_base, threshold, query_embedding)
+    doc_scores = index.doc_scores(passage_scores)
+    doc_results = [
+        (index.doc_ids[row], float(doc_scores[row]))
+        for row in top_k_indices(doc_scores, top_k)
+        if doc_scores[row] >= threshold
+    ]
+
+    results = []
+    for doc_id, similarity in doc_results:
+        doc = knowledge_base[doc_id]
+        selected = index.best_passages(doc_id, passage_scores, settings.max_passages_per_doc, threshold)
+        results.append({
+            "id": doc_id,
+            "title": doc["title"],
+            **passage_fields(selected),
+            "score": round(similarity, 3),
+            "similarity": similarity  # Pour debug
+        })
+
+    if results:
+        print(f"🔍 Recherche sémantique: {len(results)} documents trouvés (seuil: {threshold})")
+        for i, doc in enumerate(results, 1):
+            print(f"  {i}. [{doc['score']:.3f}] {doc['title']} ({len(doc['passages'])} passages)")
+
+    return results, index, passage_scores
+
+
 def semantic_search(
     query: str,
     knowledge_base: Dict[str, Dict],
     top_k: int = 3,
-    threshold: float = 0.3
+    threshold: float = 0.3,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict]:
     """
     🎯 Recherche sémantique dans la knowledge base
@@ -129,97 +588,193 @@ def semantic_search(
         knowledge_base: Base de connaissances complète
         top_k: Nombre de documents à retourner
         threshold: Seuil de similarité minimum (0-1)
+        query_embedding: Embedding de la requête déjà calculé (sinon généré ici)
 
     Returns:
-        Liste de documents triés par pertinence avec scores
+        Liste de documents triés par pertinence avec scores ;
+        "content" ne contient que les meilleurs passages de chaque document
     """
-    # S'assurer que les embeddings existent
-    if not EMBEDDINGS_CACHE:
-        print("📊 Création des embeddings de la knowledge base...")
-        create_knowledge_base_embeddings(knowledge_base)
+    results, _, _ = semantic_search_passages(query, knowledge_base, top_k, threshold, query_embedding)
+    return results
 
-    # Générer l'embedding de la requête
-    query_embedding = get_embedding(query, task_type="RETRIEVAL_QUERY")
 
-    # Calculer les similarités
-    similarities = []
-    for doc_id, doc in knowledge_base.items():
-        if doc_id not in EMBEDDINGS_CACHE:
-            # Créer embedding manquant
-            text_to_embed = f"{doc['title']}\n\n{doc['content']}"
-            EMBEDDINGS_CACHE[doc_id] = get_embedding(text_to_embed, task_type="RETRIEVAL_DOCUMENT")
+def lexical_passages(doc_id: str, terms: List[str], knowledge_base: Dict[str, Dict]) -> List[Tuple[Passage, float]]:
+    """Meilleurs passages d'un document selon le nombre de termes de la requête qu'ils contiennent"""
+    doc_passages = get_passages(knowledge_base).get(doc_id, [])
+    query_terms = set(terms)
+    scored = [
+        (passage, float(len(query_terms & set(tokenize(passage.text)))))
+        for passage in doc_passages
+    ]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:max(1, settings.max_passages_per_doc)]
 
-        doc_embedding = EMBEDDINGS_CACHE[doc_id]
-        similarity = cosine_similarity(query_embedding, doc_embedding)
 
-        # Filtrer par seuil
-        if similarity >= threshold:
-            similarities.append({
-                "id": doc_id,
-                "title": doc["title"],
-                "content": doc["content"],
-                "score": round(similarity, 3),
-                "similarity": similarity  # Pour debug
-            })
+def build_lexical_index(knowledge_base: Dict[str, Dict]) -> BM25Index:
+    """Construit l'index BM25 de la knowledge base (pas d'appel réseau)"""
+    index = BM25Index(knowledge_base)
+    indexes_for(knowledge_base).lexical = index
+    print(f"📚 Index BM25 construit: {len(index)} documents, {len(index.postings)} termes")
+    return index
 
-    # Trier par score décroissant
-    similarities.sort(key=lambda x: x["score"], reverse=True)
 
-    # Retourner top K
-    results = similarities[:top_k]
+def get_lexical_index(knowledge_base: Dict[str, Dict]) -> BM25Index:
+    """Index BM25 de cette version de la knowledge base (construit au premier accès)"""
+    index = indexes_for(knowledge_base).lexical
+    if index is None:
+        return build_lexical_index(knowledge_base)
+    return index
 
-    if results:
-        print(f"🔍 Recherche sémantique: {len(results)} documents trouvés (seuil: {threshold})")
-        for i, doc in enumerate(results, 1):
-            print(f"  {i}. [{doc['score']:.3f}] {doc['title']}")
-
-    return results
 
+def keyword_scores(
+    query: str,
+    knowledge_base: Dict[str, Dict],
+    fuzzy_threshold: Optional[float] = None
+) -> Tuple[BM25Index, np.ndarray]:
+    """
+    Scores lexicaux de tous les documents :
+    BM25 sur les tokens + bonus fuzzy sur les mots-clés via l'index de trigrammes
+    """
+    index = get_lexical_index(knowledge_base)
+    terms = tokenize(query)
+    threshold = settings.fuzzy_threshold if fuzzy_threshold is None else fuzzy_threshold
+    scores = index.score_terms(terms) + index.fuzzy_keyword_scores(terms, threshold=threshold)
+    return index, scores
 
-def keyword_search_internal(query: str, knowledge_base: Dict[str, Dict]) -> List[Dict]:
-    """Recherche keyword interne (copie pour éviter import circulaire)"""
-    from difflib import SequenceMatcher
 
-    def fuzzy_match(s1: str, s2: str) -> float:
-        return SequenceMatcher(None, s1.lower(), s2.lower()).ratio()
+def keyword_search_internal(query: str, knowledge_base: Dict[str, Dict], top_k: int = 5) -> List[Dict]:
+    """Recherche lexicale (BM25 + fuzzy mots-clés), sans appel Gemini"""
+    index, scores = keyword_scores(query, knowledge_base)
+    terms = tokenize(query)
 
-    query_lower = query.lower()
     relevant_docs = []
+    for row in top_k_indices(scores, top_k):
+        if scores[row] <= 0:
+            break
+        doc_id = index.ids[row]
+        doc = knowledge_base[doc_id]
+        relevant_docs.append({
+            "id": doc_id,
+            "title": doc["title"],
+            **passage_fields(lexical_passages(doc_id, terms, knowledge_base)),
+            "score": round(float(scores[row]), 2)
+        })
+
+    return relevant_docs
+
+
+def semantic_doc_scores(
+    knowledge_base: Dict[str, Dict],
+    passage_index: PassageIndex,
+    passage_scores: np.ndarray,
+    threshold: float
+) -> np.ndarray:
+    """
+    Score sémantique de chaque document dans l'ordre de l'index BM25
+    (meilleur passage ; 0 sous le seuil, non indexé ou non visité par l'IVF)
+    """
+    entry = indexes_for(knowledge_base)
+    lexical = get_lexical_index(knowledge_base)
+    cached = entry.alignments.get(id(passage_index))
+    if cached is None or cached[0] is not passage_index:
+        cached = (passage_index, *align_rows(passage_index.doc_ids, lexical.id_to_row))
+        entry.alignments[id(passage_index)] = cached
+    _, source_rows, target_rows = cached
+
+    scores = np.zeros(len(lexical.ids), dtype=np.float32)
+    if len(passage_index):
+        scores[target_rows] = passage_index.doc_scores(passage_scores)[source_rows]
+    scores[scores < threshold] = 0.0
+    return scores
 
-    for doc_id, doc in knowledge_base.items():
-        score = 0
 
-        # Score exact keywords
-        for keyword in doc.get("keywords", []):
-            if keyword in query_lower:
-                score += 2.0
+def get_doc_similarity(knowledge_base: Dict[str, Dict], passage_index: PassageIndex) -> Optional[DocSimilarity]:
+    """Similarités doc × doc de l'index utilisé par la requête (Gemini ou local)"""
+    entry = indexes_for(knowledge_base)
+    return entry.local_similarity if passage_index is entry.local else entry.similarity
 
-        # Fuzzy keywords
-        for keyword in doc.get("keywords", []):
-            for word in query_lower.split():
-                if len(word) > 3:
-                    similarity = fuzzy_match(word, keyword)
-                    if similarity > 0.75:
-                        score += 1.5 * similarity
 
-        if score > 0:
-            relevant_docs.append({
-                "id": doc_id,
-                "title": doc["title"],
-                "content": doc["content"],
-                "score": round(score, 2)
-            })
+def diversify(
+    knowledge_base: Dict[str, Dict],
+    passage_index: PassageIndex,
+    doc_ids: List[str],
+    fused: np.ndarray,
+    top_k: int,
+    mmr_lambda: Optional[float] = None
+) -> List[int]:
+    """
+    Lignes des top K documents : MMR parmi les `mmr_candidates` meilleurs scores fusionnés
+    (simple top K si λ = 1 ou s'il n'y a pas plus de candidats que de places)
+    """
+    lambda_ = settings.mmr_lambda if mmr_lambda is None else mmr_lambda
+    pool = max(top_k, settings.mmr_candidates) if lambda_ < 1 else top_k
+    candidates = [int(row) for row in top_k_indices(fused, pool) if fused[row] > 0]
 
-    relevant_docs.sort(key=lambda x: x["score"], reverse=True)
-    return relevant_docs[:5]
+    similarity = get_doc_similarity(knowledge_base, passage_index)
+    if lambda_ >= 1 or len(candidates) <= top_k or not similarity:
+        return candidates[:top_k]
+    pairwise = similarity.pairwise([doc_ids[row] for row in candidates])
+    return [candidates[i] for i in mmr(fused[candidates], pairwise, top_k, lambda_)]
+
+
+def rank_documents(
+    query: str,
+    knowledge_base: Dict[str, Dict],
+    passage_index: PassageIndex,
+    passage_scores: np.ndarray,
+    threshold: float,
+    top_k: int = 3,
+    semantic_weight: float = 0.7,
+    method: str = "linear",
+    mmr_lambda: Optional[float] = None
+) -> List[SearchResult]:
+    """Fusion sémantique + keyword, diversification et construction des résultats d'une requête"""
+    # 1. Scores de tous les documents, dans l'ordre de l'index BM25
+    semantic = semantic_doc_scores(knowledge_base, passage_index, passage_scores, threshold)
+    lexical, keyword = keyword_scores(query, knowledge_base)
+
+    # 2. Fusion vectorisée sur l'ensemble des candidats
+    fused = fuse(semantic, keyword, method, semantic_weight, settings.rrf_k)
+    keyword_normalized = normalize_max(keyword)
+    terms = tokenize(query)
+
+    # 3. Diversification : écarte les quasi-doublons du top K
+    candidates = diversify(knowledge_base, passage_index, lexical.ids, fused, top_k, mmr_lambda)
+
+    # 4. Résultats : passages choisis par similarité sémantique si le document
+    # est indexé (et visité par l'IVF), sinon par les termes de la requête
+    results = []
+    for row in candidates:
+        doc_id = lexical.ids[row]
+        selected = None
+        if doc_id in passage_index:
+            selected = passage_index.best_passages(doc_id, passage_scores, settings.max_passages_per_doc, threshold)
+            if selected[0][1] <= UNSCORED:
+                selected = None
+        chosen = passage_fields(selected or lexical_passages(doc_id, terms, knowledge_base))
+        results.append(SearchResult(
+            id=doc_id,
+            title=knowledge_base[doc_id]["title"],
+            content=chosen["content"],
+            passages=tuple(chosen["passages"]),
+            score=round(float(fused[row]), 3),
+            semantic=round(float(semantic[row]), 3),
+            keyword=round(float(keyword_normalized[row]), 3),
+            keyword_raw=round(float(keyword[row]), 3)
+        ))
+    return results
 
 
 def hybrid_search(
     query: str,
     knowledge_base: Dict[str, Dict],
     top_k: int = 3,
-    semantic_weight: float = 0.7
-) -> List[Dict]:
+    semantic_weight: float = 0.7,
+    query_embedding: Optional[List[float]] = None,
+    fusion: Optional[str] = None,
+    threshold: float = 0.3,
+    mmr_lambda: Optional[float] = None
+) -> List[SearchResult]:
     """
     🚀 Recherche hybride : combine sémantique + keyword matching
 
@@ -228,73 +783,148 @@ def hybrid_search(
         knowledge_base: Base de connaissances
         top_k: Nombre de résultats
         semantic_weight: Poids de la recherche sémantique (0-1)
+        query_embedding: Embedding de la requête déjà calculé (optionnel)
+        fusion: "linear" ou "rrf" (défaut : settings.fusion_method)
+        threshold: Similarité minimale pour qu'un document ait un score sémantique
+        mmr_lambda: Diversification MMR, 1 = désactivée (défaut : settings.mmr_lambda)
 
     Returns:
-        Meilleurs documents combinant les deux approches
+        Meilleurs documents combinant les deux approches (SearchResult immuables)
     """
+    method = fusion or settings.fusion_method
+    passage_index, passage_scores, threshold = semantic_passage_scores(query, knowledge_base, threshold, query_embedding)
+    results = rank_documents(
+        query, knowledge_base, passage_index, passage_scores, threshold,
+        top_k=top_k, semantic_weight=semantic_weight, method=method, mmr_lambda=mmr_lambda
+    )
 
-    # 1. Recherche sémantique
-    semantic_results = semantic_search(query, knowledge_base, top_k=top_k * 2)
+    print(f"🎯 Recherche hybride ({method}, semantic={semantic_weight}, keyword={1-semantic_weight}):")
+    for i, doc in enumerate(results, 1):
+        print(f"  {i}. [{doc.score:.3f}] {doc.title} (sem:{doc.semantic:.2f} kw:{doc.keyword:.2f})")
 
-    # 2. Recherche keyword (méthode interne)
-    keyword_results = keyword_search_internal(query, knowledge_base)
-
-    # 3. Fusionner les scores
-    combined_scores = {}
+    return results
 
-    # Normaliser les scores sémantiques (déjà entre 0-1)
-    for doc in semantic_results:
-        doc_id = doc["id"]
-        combined_scores[doc_id] = {
-            "doc": doc,
-            "semantic_score": doc["score"],
-            "keyword_score": 0.0
-        }
 
-    # Normaliser les scores keyword (peuvent être > 1)
-    max_keyword_score = max([d["score"] for d in keyword_results], default=1.0)
-    for doc in keyword_results:
-        doc_id = doc["id"]
-        normalized_score = doc["score"] / max_keyword_score if max_keyword_score > 0 else 0
+def get_query_embeddings(queries: List[str]) -> List[Optional[List[float]]]:
+    """
+    Embeddings de plusieurs requêtes : cache LRU/Redis d'abord, puis les manquantes
+    par lots batchEmbedContents (settings.embedding_batch_size).
+    None pour une requête si Gemini échoue (recherche sur l'index local).
+    """
+    embeddings: List[Optional[List[float]]] = [query_embedding_cache.get(query, "RETRIEVAL_QUERY") for query in queries]
+    missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+
+    computed: Dict[str, List[float]] = {}
+    batch_size = max(1, min(settings.embedding_batch_size, MAX_BATCH_SIZE))
+    for start in range(0, len(missing), batch_size):
+        if not remote_embedding_available():
+            break
+        batch = missing[start:start + batch_size]
+        try:
+            vectors = embed_batch(batch, task_type="RETRIEVAL_QUERY")
+        except Exception as e:
+            _remote_embedding_failed(e)
+            break
+        for query, vector in zip(batch, vectors):
+            computed[query] = vector
+            query_embedding_cache.set(query, "RETRIEVAL_QUERY", vector)
 
-        if doc_id in combined_scores:
-            combined_scores[doc_id]["keyword_score"] = normalized_score
-        else:
-            combined_scores[doc_id] = {
-                "doc": doc,
-                "semantic_score": 0.0,
-                "keyword_score": normalized_score
-            }
+    if missing:
+        print(f"🧮 Embeddings de requêtes: {len(computed)}/{len(missing)} calculés par lots, {len(queries) - len(missing)} en cache")
+    return [embedding if embedding is not None else computed.get(query) for query, embedding in zip(queries, embeddings)]
 
-    # 4. Calculer score final hybride
-    final_results = []
-    for doc_id, scores in combined_scores.items():
-        hybrid_score = (
-            semantic_weight * scores["semantic_score"] +
-            (1 - semantic_weight) * scores["keyword_score"]
-        )
 
-        doc = scores["doc"]
-        doc["score"] = round(hybrid_score, 3)
-        doc["semantic"] = round(scores["semantic_score"], 3)
-        doc["keyword"] = round(scores["keyword_score"], 3)
-        final_results.append(doc)
+def batch_hybrid_search(
+    queries: List[str],
+    knowledge_base: Dict[str, Dict],
+    top_k: int = 3,
+    semantic_weight: float = 0.7,
+    query_embeddings: Optional[List[Optional[List[float]]]] = None,
+    fusion: Optional[str] = None,
+    threshold: float = 0.3,
+    mmr_lambda: Optional[float] = None
+) -> List[List[SearchResult]]:
+    """
+    📦 Recherche hybride de nombreuses requêtes (évaluation, pré-chauffage du cache)
 
-    # Trier par score hybride
-    final_results.sort(key=lambda x: x["score"], reverse=True)
+    Embeddings par lots, puis un produit matrice-matrice par bloc de requêtes
+    (settings.batch_search_block) au lieu d'un parcours du corpus par requête.
+    Mêmes résultats que hybrid_search, dans l'ordre des requêtes.
+    """
+    method = fusion or settings.fusion_method
+    if query_embeddings is None:
+        query_embeddings = get_query_embeddings(queries)
+
+    # Requêtes avec embedding Gemini → index sémantique ; les autres → index local
+    index = get_semantic_index(knowledge_base)
+    remote = [
+        i for i, embedding in enumerate(query_embeddings)
+        if len(index) and embedding is not None and np.any(embedding)
+    ]
+    local = sorted(set(range(len(queries))) - set(remote))
+    groups = []
+    if remote:
+        groups.append((index, remote, np.array([query_embeddings[i] for i in remote], dtype=np.float32), threshold))
+    if local:
+        local_index, local_embedder = get_local_index(knowledge_base)
+        vectors = local_embedder.embed_many([queries[i] for i in local])
+        groups.append((local_index, local, vectors, min(threshold, settings.local_embedding_threshold)))
+
+    results: List[List[SearchResult]] = [[] for _ in queries]
+    block = max(1, settings.batch_search_block)
+    for passage_index, rows, vectors, group_threshold in groups:
+        for start in range(0, len(rows), block):
+            scores = passage_index.score_many(vectors[start:start + block])
+            for offset, i in enumerate(rows[start:start + block]):
+                results[i] = rank_documents(
+                    queries[i], knowledge_base, passage_index, scores[offset], group_threshold,
+                    top_k=top_k, semantic_weight=semantic_weight, method=method, mmr_lambda=mmr_lambda
+                )
+
+    print(f"📦 Recherche hybride par lot: {len(queries)} requêtes ({len(remote)} Gemini, {len(local)} index local)")
+    return results
 
-    print(f"🎯 Recherche hybride (semantic={semantic_weight}, keyword={1-semantic_weight}):")
-    for i, doc in enumerate(final_results[:top_k], 1):
-        print(f"  {i}. [{doc['score']:.3f}] {doc['title']} (sem:{doc['semantic']:.2f} kw:{doc['keyword']:.2f})")
 
-    return final_results[:top_k]
+# ===== INITIALISATION AU DÉMARRAGE =====
+def build_partition_indexes(knowledge_base: Dict[str, Dict], partitions: Dict[str, Dict[str, Dict]]):
+    """
+    Index BM25 et vectoriel de chaque partition (facette) du corpus.
+    Passages et embeddings sont ceux du corpus complet (aucun appel réseau) ;
+    l'index local de secours d'une partition n'est construit qu'au premier besoin.
+    """
+    passages_by_doc = get_passages(knowledge_base)
+    for facet, documents in partitions.items():
+        entry = indexes_for(documents, root=knowledge_base)
+        entry.passages_by_doc = {doc_id: passages_by_doc[doc_id] for doc_id in documents if doc_id in passages_by_doc}
+        build_lexical_index(documents)
+        build_semantic_index(documents)
+        print(f"🏷️ Partition « {facet} » indexée: {len(documents)} documents")
 
 
-# ===== INITIALISATION AU DÉMARRAGE =====
-def initialize_semantic_search(knowledge_base: Dict[str, Dict]):
+def initialize_semantic_search(
+    knowledge_base: Dict[str, Dict],
+    partitions: Optional[Dict[str, Dict[str, Dict]]] = None,
+    embed: bool = True
+):
     """
     À appeler au démarrage du serveur pour pré-calculer les embeddings
+    embed=False : index construits depuis les vecteurs du store uniquement, aucun appel Gemini
+    (passages sans vecteur : vecteur du document entier s'il existe, sinon hors de l'index sémantique)
     """
     print("🚀 Initialisation recherche sémantique...")
-    create_knowledge_base_embeddings(knowledge_base)
+    _IVF_USED.clear()
+    # Index lexical et local d'abord : ils servent de fallback si Gemini est indisponible
+    build_lexical_index(knowledge_base)
+    build_local_index(knowledge_base)
+    if embed:
+        create_knowledge_base_embeddings(knowledge_base)
+    else:
+        load_embeddings_cache(knowledge_base)
+    build_semantic_index(knowledge_base)
+    if partitions:
+        build_partition_indexes(knowledge_base, partitions)
+    # IVF des versions précédentes (ré-embedding, changement de modèle ou de partitions)
+    removed = prune_ivf(_IVF_USED)
+    if removed:
+        print(f"🧹 {removed} index IVF périmé(s) supprimé(s)")
     print("✅ Recherche sémantique prête !")
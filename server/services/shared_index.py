@@ -0,0 +1,181 @@
+"""
+🤝 Index partagés entre les workers uvicorn (fichiers .npy memory-mapped)
+
+Avec --workers 4, chaque worker importe services/rag.py et reconstruisait seul les
+mêmes matrices : vecteurs des passages réordonnés depuis le store, index local TF-IDF
+(IDF + vecteurs), similarités doc × doc du MMR. Ces tableaux sont maintenant publiés
+une fois, à la construction de l'image (depuis les vecteurs du store, sans appel Gemini) :
+
+    python -m services.shared_index build
+
+puis ouverts en lecture seule (np.load mmap_mode='r') par chaque worker, qui partage
+les mêmes pages du page cache au lieu d'en garder sa propre copie.
+
+- Fichiers nommés par leur contenu (ids + hash du texte de chaque vecteur) : une KB
+  modifiée donne d'autres fichiers, jamais un fichier périmé
+- Fichier absent (pas de build, rechargement à chaud) : le premier worker qui construit
+  publie (écriture atomique), les suivants s'y attachent
+- Le corpus (dicts Python) et l'index BM25 restent propres à chaque worker
+
+CLI:
+    python -m services.shared_index build   # RUN du Dockerfile (aucun appel réseau)
+    python -m services.shared_index info
+"""
+import os
+import sys
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from services.diversity import DocSimilarity
+from config.settings import settings
+
+SHARED_DIR = Path(settings.shared_index_dir) if settings.shared_index_dir else Path(__file__).parent.parent / 'config' / 'shared_index'
+
+# Fichiers ouverts ou publiés par ce processus (conservés par `build`, les autres sont supprimés)
+_USED: Set[Path] = set()
+
+
+def artifact_key(ids: Sequence[str], hashes: Iterable[Optional[str]], *extra: str) -> Optional[str]:
+    """
+    Empreinte d'un tableau : ids dans l'ordre + hash du contenu de chaque ligne (+ paramètres).
+    None si une ligne n'a pas de hash (vecteur d'origine inconnue) : tableau non partagé.
+    """
+    digest = hashlib.sha256()
+    for part in extra:
+        digest.update(f"{part}\n".encode("utf-8"))
+    for row_id, row_hash in zip(ids, hashes):
+        if row_hash is None:
+            return None
+        digest.update(f"{row_id}:{row_hash}\n".encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def artifact_path(kind: str, key: str, directory: Optional[Path] = None) -> Path:
+    return Path(directory or SHARED_DIR) / f"{kind}-{key}.npy"
+
+
+def attach(kind: str, key: str, directory: Optional[Path] = None) -> Optional[np.ndarray]:
+    """Tableau publié, ouvert en memory-map lecture seule. None si absent ou illisible."""
+    path = artifact_path(kind, key, directory)
+    if not path.exists():
+        return None
+    try:
+        array = np.load(path, mmap_mode='r')
+    except Exception as e:
+        print(f"⚠️ Index partagé illisible ({path.name}): {e}")
+        return None
+    _USED.add(path)
+    return array
+
+
+def publish(kind: str, key: str, array: np.ndarray, directory: Optional[Path] = None) -> Optional[np.ndarray]:
+    """
+    Écrit le tableau (fichier temporaire + os.replace : un worker ne lit jamais un fichier
+    à moitié écrit) puis le ré-ouvre en memory-map. None en cas d'erreur d'écriture.
+    """
+    path = artifact_path(kind, key, directory)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"⚠️ Erreur publication index partagé ({path.name}): {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+    return attach(kind, key, directory)
+
+
+def shared_array(kind: str, key: Optional[str], build: Callable[[], np.ndarray]) -> np.ndarray:
+    """Tableau partagé s'il est publié, sinon construit ici et publié pour les autres workers"""
+    if not settings.shared_indexes or key is None:
+        return build()
+    array = attach(kind, key)
+    if array is not None:
+        return array
+    array = build()
+    shared = publish(kind, key, array)
+    return array if shared is None else shared
+
+
+def shared_doc_similarity(kind: str, key: Optional[str], doc_ids: Sequence[str], build: Callable[[], DocSimilarity]) -> DocSimilarity:
+    """
+    Similarités doc × doc partagées : vecteurs des documents + matrice (absente au-delà
+    de settings.mmr_max_docs). La matrice est publiée avant les vecteurs : un worker
+    qui trouve les vecteurs trouve aussi la matrice.
+    """
+    if not settings.shared_indexes or key is None:
+        return build()
+    vectors = attach(f"{kind}-docs", key)
+    if vectors is not None:
+        return DocSimilarity.from_arrays(doc_ids, vectors, attach(f"{kind}-sim", key))
+
+    similarity = build()
+    if not len(similarity):
+        return similarity
+    matrix = publish(f"{kind}-sim", key, similarity.matrix) if similarity.matrix is not None else None
+    vectors = publish(f"{kind}-docs", key, similarity.vectors)
+    if vectors is None or (similarity.matrix is not None and matrix is None):
+        return similarity
+    return DocSimilarity.from_arrays(doc_ids, vectors, matrix)
+
+
+def prune(keep: Iterable[Path], directory: Optional[Path] = None) -> int:
+    """Supprime les tableaux qui ne correspondent plus à la knowledge base"""
+    directory = Path(directory or SHARED_DIR)
+    keep = {Path(path).name for path in keep}
+    removed = 0
+    for path in directory.glob("*.npy") if directory.exists() else []:
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def shared_stats(directory: Optional[Path] = None) -> Dict[str, object]:
+    """Fichiers publiés et taille totale (pour /api/admin/knowledge/status)"""
+    directory = Path(directory or SHARED_DIR)
+    files = sorted(directory.glob("*.npy")) if directory.exists() else []
+    return {
+        "enabled": settings.shared_indexes,
+        "directory": str(directory),
+        "files": len(files),
+        "bytes": sum(path.stat().st_size for path in files),
+        "attached": len(_USED),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Index partagés entre les workers PhoenixCare")
+    parser.add_argument("command", choices=["build", "info"])
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if not settings.shared_indexes:
+            print("⚠️ Index partagés désactivés (SHARED_INDEXES=false)")
+            return 0
+        # Import tardif : corpus → semantic_search configure Gemini
+        from services.corpus import load_corpus
+        corpus = load_corpus()
+        # Vecteurs du store tels quels : aucun appel Gemini (les passages manquants sont
+        # embeddés par les workers, qui publient alors leurs propres tableaux)
+        corpus.build_indexes(embed=False)
+        # Lancé avec `python -m`, ce fichier s'exécute sous le nom __main__ : les index ont publié
+        # via le module services.shared_index, dont on relit les fichiers utilisés
+        from services import shared_index
+        removed = prune(shared_index._USED)
+        stats = shared_stats()
+        print(f"✅ Index partagés publiés: {stats['files']} fichiers, {stats['bytes'] / 1e6:.1f} Mo ({removed} périmés supprimés)")
+        return 0
+
+    stats = shared_stats()
+    print(f"🤝 {stats['files']} fichiers, {stats['bytes'] / 1e6:.1f} Mo dans {stats['directory']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
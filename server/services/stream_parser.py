@@ -0,0 +1,189 @@
+"""
+🌊 Parsing incrémental de la réponse JSON structurée de Gemini (streaming)
+
+Gemini renvoie {"answer": "...", "situation": "...", ..., "suggestions": [...]} par morceaux
+arbitraires (coupés au milieu d'une clé, d'un échappement \\uXXXX...). Le parser :
+
+- émet le texte de "answer" au fil de l'eau (deltas décodés)
+- émet chaque autre champ dès que sa valeur JSON est complète
+- ignore ce qui précède la première accolade (```json) et ce qui suit la dernière
+
+Si Gemini ne renvoie pas de JSON, aucun événement n'est émis : l'appelant se rabat
+sur le texte complet (voir parse_gemini_response).
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+# Champ dont le texte est transmis au fil de l'eau
+STREAMED_FIELD = "answer"
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Événements : ("delta", texte) pour answer, ("field", (nom, valeur)) pour un champ complet
+Event = Tuple[str, Any]
+
+
+class IncrementalJSONParser:
+    """Automate sur l'objet JSON de premier niveau (les valeurs imbriquées sont bufferisées)"""
+
+    def __init__(self, streamed_field: str = STREAMED_FIELD):
+        self.streamed_field = streamed_field
+        self.fields = {}
+        self.text = []  # tout le texte reçu (fallback si pas de JSON)
+        self._state = "before_object"
+        self._key: List[str] = []
+        self._current_key: Optional[str] = None
+        self._escape: Optional[str] = None  # séquence d'échappement en cours ("\\", "\\u12"...)
+        self._pending_surrogate: Optional[str] = None
+        # Valeur non streamée : texte JSON brut, profondeur, état chaîne
+        self._raw: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._raw_escape = False
+        self._delta: List[str] = []  # texte de "answer" pas encore émis
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self.text)
+
+    def feed(self, chunk: str) -> List[Event]:
+        """Consomme un morceau de texte, retourne les événements complets"""
+        self.text.append(chunk)
+        events: List[Event] = []
+        for char in chunk:
+            self._step(char, events)
+        self._flush_delta(events)
+        return events
+
+    def _flush_delta(self, events: List[Event]):
+        if self._delta:
+            events.append(("delta", "".join(self._delta)))
+            self._delta = []
+
+    # ----- automate -----
+    def _step(self, char: str, events: List[Event]):
+        state = self._state
+        if state == "before_object":
+            if char == "{":
+                self._state = "before_key"
+        elif state == "before_key":
+            if char == '"':
+                self._key, self._state = [], "key"
+            elif char == "}":
+                self._state = "done"
+        elif state == "key":
+            if self._escape is not None:
+                self._key.append(ESCAPES.get(char, char))
+                self._escape = None
+            elif char == "\\":
+                self._escape = "\\"
+            elif char == '"':
+                self._current_key, self._state = "".join(self._key), "colon"
+            else:
+                self._key.append(char)
+        elif state == "colon":
+            if char == ":":
+                self._state = "before_value"
+        elif state == "before_value":
+            if char.isspace():
+                return
+            if self._current_key == self.streamed_field and char == '"':
+                self._key, self._state = [], "streamed_string"
+            else:
+                self._raw, self._depth, self._in_string, self._raw_escape = [], 0, False, False
+                self._state = "raw_value"
+                self._raw_step(char, events)
+        elif state == "streamed_string":
+            self._streamed_step(char, events)
+        elif state == "raw_value":
+            self._raw_step(char, events)
+        elif state == "after_value":
+            if char == ",":
+                self._state = "before_key"
+            elif char == "}":
+                self._state = "done"
+
+    def _streamed_step(self, char: str, events: List[Event]):
+        """Chaîne "answer" : décodée caractère par caractère (échappements compris)"""
+        if self._escape is not None:
+            self._escape += char
+            if self._escape.startswith("\\u"):
+                if len(self._escape) < 6:
+                    return
+                decoded = self._decode_unicode(self._escape[2:])
+            else:
+                decoded = ESCAPES.get(char, char)
+            self._escape = None
+            if decoded:
+                self._key.append(decoded)
+                self._delta.append(decoded)
+        elif char == "\\":
+            self._escape = "\\"
+        elif char == '"':
+            self._complete(self.streamed_field, "".join(self._key), events)
+        else:
+            self._key.append(char)
+            self._delta.append(char)
+
+    def _decode_unicode(self, hex_digits: str) -> str:
+        """\\uXXXX, paires de substitution (emoji) comprises"""
+        try:
+            code = int(hex_digits, 16)
+        except ValueError:
+            return ""
+        if 0xD800 <= code < 0xDC00:
+            self._pending_surrogate = hex_digits
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._pending_surrogate:
+            high = int(self._pending_surrogate, 16)
+            self._pending_surrogate = None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        return chr(code)
+
+    def _raw_step(self, char: str, events: List[Event]):
+        """Autre valeur : texte brut accumulé jusqu'à sa fin, puis json.loads"""
+        if self._in_string:
+            self._raw.append(char)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif char == "\\":
+                self._raw_escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._finish_raw(events)
+            return
+
+        if self._depth == 0 and self._raw and (char in ",}" or char.isspace()):
+            # Fin d'un scalaire (nombre, true, null)
+            self._finish_raw(events)
+            self._step(char, events)
+            return
+
+        self._raw.append(char)
+        if char == '"':
+            self._in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}":
+            self._depth -= 1
+            if self._depth == 0:
+                self._finish_raw(events)
+
+    def _finish_raw(self, events: List[Event]):
+        try:
+            value = json.loads("".join(self._raw))
+        except json.JSONDecodeError:
+            value = None
+        self._complete(self._current_key, value, events)
+
+    def _complete(self, key: str, value: Any, events: List[Event]):
+        # Deltas avant le champ complet : l'ordre des événements suit le texte
+        self._flush_delta(events)
+        self.fields[key] = value
+        events.append(("field", (key, value)))
+        self._state = "after_value"
@@ -0,0 +1,334 @@
+"""
+🧮 Index vectoriel pour la recherche sémantique
+Tous les vecteurs dans une seule matrice float32 pré-normalisée :
+une requête = un produit matrice-vecteur + argpartition pour le top-k
+
+Pour les gros corpus, IVFIndex (k-means sphérique, NumPy CPU) ne compare
+la requête qu'aux vecteurs des `nprobe` clusters les plus proches.
+"""
+import os
+import time
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Score des vecteurs non visités par l'IVF (un cosinus ne descend pas sous -1)
+UNSCORED = -1.0
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normalise chaque ligne (norme L2 = 1), les vecteurs nuls restent nuls"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def normalize_vector(vector: Sequence[float]) -> np.ndarray:
+    """Normalise un vecteur requête en float32"""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return vector
+    return vector / norm
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, triés par score décroissant"""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Index exact (similarité cosinus) construit une fois au démarrage"""
+
+    def __init__(self, ids: Sequence[str], matrix: np.ndarray, normalized: bool = False):
+        """
+        normalized=True : la matrice est déjà normalisée (ex: store memory-mapped),
+        elle est utilisée telle quelle, sans copie
+        """
+        self.ids: List[str] = list(ids)
+        if not self.ids:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+        elif normalized:
+            self.matrix = matrix
+        else:
+            self.matrix = normalize_rows(matrix)
+        self.id_to_row: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Dict[str, Sequence[float]]) -> "VectorIndex":
+        """Construit l'index depuis un dict {doc_id: embedding}"""
+        ids = list(embeddings.keys())
+        if not ids:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        return cls(ids, np.vstack([np.asarray(embeddings[doc_id], dtype=np.float32) for doc_id in ids]))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.id_to_row
+
+    def score(self, query_vector: Sequence[float]) -> np.ndarray:
+        """Similarité cosinus de la requête avec tous les documents"""
+        if not self.ids:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ normalize_vector(query_vector)
+
+    def score_many(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Scores (requêtes × documents) de plusieurs requêtes en un seul produit matrice-matrice"""
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        if not self.ids:
+            return np.zeros((queries.shape[0], 0), dtype=np.float32)
+        return queries @ self.matrix.T
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int = 3,
+        threshold: float = 0.0
+    ) -> List[Tuple[str, float]]:
+        """
+        Retourne les top_k (doc_id, score) au-dessus du seuil,
+        triés par score décroissant
+        """
+        scores = self.score(query_vector)
+        return [
+            (self.ids[row], float(scores[row]))
+            for row in top_k_indices(scores, top_k)
+            if scores[row] >= threshold
+        ]
+
+
+def ids_fingerprint(ids: Sequence[str]) -> str:
+    """Empreinte de la liste ordonnée des ids (un index IVF n'est valide que pour ces lignes)"""
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()
+
+
+def vectors_fingerprint(ids: Sequence[str], matrix: np.ndarray, *extra: str) -> str:
+    """Empreinte des ids et du contenu des vecteurs (quand les hashes par ligne ne sont pas connus)"""
+    digest = hashlib.sha256()
+    for part in extra:
+        digest.update(f"{part}\n".encode("utf-8"))
+    digest.update("\n".join(ids).encode("utf-8"))
+    digest.update(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def default_n_lists(n_vectors: int) -> int:
+    """Nombre de clusters par défaut : ~√n"""
+    return max(1, int(round(np.sqrt(n_vectors))))
+
+
+def assign_clusters(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Cluster le plus proche (cosinus) de chaque ligne, par blocs pour borner la mémoire"""
+    labels = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], chunk_size):
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(
+    matrix: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    max_train: int = 256
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    K-means sur vecteurs normalisés (centroïdes renormalisés à chaque itération).
+    Entraîné sur au plus max_train vecteurs par cluster, puis tous les vecteurs sont assignés.
+    Retourne (centroïdes, cluster de chaque ligne).
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    k = max(1, min(n_clusters, n))
+
+    if n > max_train * k:
+        train = np.asarray(matrix[np.sort(rng.choice(n, max_train * k, replace=False))], dtype=np.float32)
+    else:
+        train = np.asarray(matrix, dtype=np.float32)
+
+    centroids = train[rng.choice(train.shape[0], k, replace=False)].copy()
+    labels = None
+    for _ in range(n_iter):
+        new_labels = assign_clusters(train, centroids)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        # Somme des vecteurs de chaque cluster (tri par cluster + reduceat)
+        counts = np.bincount(labels, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(train[np.argsort(labels, kind="stable")], starts, axis=0)
+        # Cluster vide : ré-initialisé sur les vecteurs les plus éloignés de leur centroïde
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            fit = np.einsum("ij,ij->i", train, centroids[labels])
+            sums[empty] = train[np.argsort(fit)[:len(empty)]]
+        centroids = normalize_rows(sums)
+
+    return centroids, assign_clusters(matrix, centroids)
+
+
+class IVFIndex(VectorIndex):
+    """
+    🗂️ Index approximatif IVF (inverted file) : k-means sur les vecteurs,
+    une requête ne parcourt que les listes des `nprobe` centroïdes les plus proches.
+
+    - nprobe : compromis rappel / latence (nprobe = n_lists → recherche exacte)
+    - La matrice n'est pas réordonnée : un store memory-mapped reste sans copie
+    - save() / load() : centroïdes + affectations persistés en .npz
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        normalized: bool = False,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+        seed: int = 0
+    ):
+        super().__init__(ids, matrix, normalized=normalized)
+        if not self.ids:
+            centroids, assignments = np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32)
+        elif centroids is None or assignments is None:
+            centroids, assignments = spherical_kmeans(self.matrix, n_lists or default_n_lists(len(self.ids)), seed=seed)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.nprobe = nprobe
+
+        # Listes inversées : lignes de chaque cluster
+        order = np.argsort(self.assignments, kind="stable")
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.lists: List[np.ndarray] = np.split(order, np.cumsum(counts)[:-1]) if len(self.centroids) else []
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def probe(self, query_vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Lignes (triées) des listes des nprobe centroïdes les plus proches de la requête"""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        if nprobe <= 0:
+            return np.empty(0, dtype=np.int64)
+        clusters = top_k_indices(self.centroids @ query_vector, nprobe)
+        return np.sort(np.concatenate([self.lists[cluster] for cluster in clusters]))
+
+    def score(self, query_vector: Sequence[float], nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Similarité cosinus des vecteurs visités ; les autres valent UNSCORED (-1).
+        Même forme que VectorIndex.score : les appelants n'ont pas à changer.
+        """
+        if not self.ids:
+            return np.zeros(0, dtype=np.float32)
+        query = normalize_vector(query_vector)
+        rows = self.probe(query, nprobe)
+        scores = np.full(len(self.ids), UNSCORED, dtype=np.float32)
+        if len(rows):
+            scores[rows] = self.matrix[rows] @ query
+        return scores
+
+    def score_many(self, query_vectors: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Scores approximatifs de plusieurs requêtes (chacune visite ses propres listes)"""
+        queries = np.atleast_2d(query_vectors)
+        return np.vstack([self.score(query, nprobe) for query in queries]) if len(queries) else np.zeros((0, len(self.ids)), dtype=np.float32)
+
+    def exact_score(self, query_vector: Sequence[float]) -> np.ndarray:
+        """Scores exacts (parcours complet), référence pour le rappel"""
+        return VectorIndex.score(self, query_vector)
+
+    def save(self, path: Path, fingerprint: Optional[str] = None) -> None:
+        """
+        Persiste centroïdes + affectations (écriture atomique).
+        fingerprint: empreinte des vecteurs indexés (défaut : ids seuls)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp,
+            centroids=self.centroids,
+            assignments=self.assignments,
+            fingerprint=np.array(fingerprint or ids_fingerprint(self.ids))
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        ids: Sequence[str],
+        matrix: np.ndarray,
+        normalized: bool = False,
+        nprobe: int = 8,
+        n_lists: Optional[int] = None,
+        fingerprint: Optional[str] = None
+    ) -> Optional["IVFIndex"]:
+        """
+        IVF persisté pour ces ids, None s'il est absent, illisible ou construit pour d'autres vecteurs.
+        fingerprint: même empreinte qu'à la sauvegarde (défaut : ids seuls)
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data["fingerprint"]) != (fingerprint or ids_fingerprint(list(ids))):
+                    return None
+                centroids, assignments = data["centroids"], data["assignments"]
+        except Exception as e:
+            print(f"⚠️ Index IVF illisible ({path.name}): {e}")
+            return None
+        if len(assignments) != len(ids) or (n_lists and len(centroids) != n_lists):
+            return None
+        return cls(ids, matrix, normalized=normalized, nprobe=nprobe, centroids=centroids, assignments=assignments)
+
+
+def recall_check(
+    index: IVFIndex,
+    queries: np.ndarray,
+    top_k: int = 10,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)
+) -> List[Dict[str, float]]:
+    """
+    📏 Rappel@k de l'IVF par rapport à la recherche exacte, pour plusieurs nprobe
+    Retourne [{nprobe, recall, ms_per_query, exact_ms_per_query, visited}]
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    start = time.perf_counter()
+    exact = [set(top_k_indices(index.exact_score(query), top_k).tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+    report = []
+    for nprobe in sorted({min(n, index.n_lists) for n in nprobes}):
+        found = visited = 0
+        start = time.perf_counter()
+        for query, expected in zip(queries, exact):
+            scores = index.score(query, nprobe=nprobe)
+            approx = top_k_indices(scores, top_k)
+            found += len(expected & set(approx[scores[approx] > UNSCORED].tolist()))
+            visited += int(np.count_nonzero(scores > UNSCORED))
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+        report.append({
+            "nprobe": nprobe,
+            "recall": found / max(1, sum(len(expected) for expected in exact)),
+            "ms_per_query": elapsed_ms,
+            "exact_ms_per_query": exact_ms,
+            "visited": visited / max(1, len(queries)) / max(1, len(index))
+        })
+    return report
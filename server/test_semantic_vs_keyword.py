@@ -14,7 +14,7 @@ load_dotenv()
 # Ajouter le dossier parent au path pour imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from services.rag import find_relevant_documents, load_knowledge_base
+from services.rag import find_relevant_documents, batch_find_relevant_documents, load_knowledge_base
 
 # Questions de test (réutilise celles de l'audit)
 TEST_QUESTIONS = [
@@ -88,7 +88,14 @@ def compare_methods():
     semantic_correct = 0
     keyword_correct = 0
 
-    for q in TEST_QUESTIONS:
+    # Recherche hybride de toutes les questions en un lot (embeddings groupés)
+    try:
+        semantic_batch = batch_find_relevant_documents([q['question'] for q in TEST_QUESTIONS])
+    except Exception as e:
+        print(f"❌ ERREUR recherche par lot: {e}")
+        semantic_batch = [None] * len(TEST_QUESTIONS)
+
+    for q, batch_results in zip(TEST_QUESTIONS, semantic_batch):
         print(f"\n{'='*80}")
         print(f"Q{q['id']}: {q['question']}")
         print(f"{'='*80}")
@@ -97,7 +104,7 @@ def compare_methods():
         # Test recherche sémantique
         print(f"\n🎯 RECHERCHE SÉMANTIQUE:")
         try:
-            semantic_results = test_search_method(q['question'], use_semantic=True)
+            semantic_results = batch_results if batch_results is not None else test_search_method(q['question'], use_semantic=True)
             if semantic_results and semantic_results[0]['id'] == q['expected_doc']:
                 print(f"  ✅ CORRECT - Top 1: {semantic_results[0]['title']} (score: {semantic_results[0]['score']})")
                 semantic_correct += 1
@@ -0,0 +1,13 @@
+"""
+🧪 Fixtures communes
+"""
+import pytest
+from services import shared_index
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_indexes(tmp_path, monkeypatch):
+    """Index partagés publiés dans un dossier temporaire (jamais dans config/shared_index)"""
+    monkeypatch.setattr(shared_index, "SHARED_DIR", tmp_path / "shared_index")
+    monkeypatch.setattr(shared_index, "_USED", set())
+    return tmp_path / "shared_index"
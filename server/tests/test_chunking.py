@@ -0,0 +1,76 @@
+"""
+🧪 Tests pour le découpage en passages
+"""
+import numpy as np
+from services.chunking import PassageIndex, chunk_document, detect_heading, join_passages
+from services.vector_index import VectorIndex
+
+LONG_DOC = {
+    "title": "AEEH",
+    "content": "\n".join([
+        "L'AEEH compense les frais d'éducation.",
+        "",
+        "CONDITIONS:",
+        *[f"- Condition numéro {i} à remplir pour bénéficier de l'allocation" for i in range(12)],
+        "",
+        "DÉMARCHES:",
+        "1. Dossier MDPH avec formulaire Cerfa 15692",
+        "2. Certificat médical récent",
+        "",
+        "**MONTANTS 2025 :**",
+        "- Base: 151,80 € par mois",
+    ])
+}
+
+
+def test_detect_heading():
+    """Titres en majuscules avec deux-points, gras markdown, ##"""
+    assert detect_heading("CONDITIONS:") == "CONDITIONS"
+    assert detect_heading("DÉMARCHE: Dossier MDPH obligatoire") == "DÉMARCHE"
+    assert detect_heading("**QUI PEUT DEMANDER LA PCH ?**") == "QUI PEUT DEMANDER LA PCH ?"
+    assert detect_heading("## Recours") == "Recours"
+    assert detect_heading("- Enfant de moins de 20 ans") == ""
+
+
+def test_short_document_single_passage():
+    """Document court : un seul passage d'id = doc_id, texte inchangé"""
+    doc = {"title": "AAH", "content": "\nL'AAH garantit un minimum de ressources.\n"}
+    passages = chunk_document("aah", doc)
+    assert len(passages) == 1
+    assert passages[0].id == "aah"
+    assert passages[0].text == doc["content"]
+
+
+def test_long_document_split_by_sections():
+    """Sections respectées, passages bornés, chevauchement dans les sections longues"""
+    passages = chunk_document("aeeh", LONG_DOC, max_chars=300, overlap=80)
+
+    assert [p.id for p in passages] == [f"aeeh#{i}" for i in range(len(passages))]
+    assert all(len(p.text) <= 300 + 80 for p in passages)
+    headings = [p.heading for p in passages]
+    assert "CONDITIONS" in headings and "DÉMARCHES" in headings
+
+    conditions = [p for p in passages if p.heading == "CONDITIONS"]
+    assert len(conditions) > 1
+    assert all(p.text.startswith("CONDITIONS:") for p in conditions)
+    # La dernière ligne d'une fenêtre est reprise au début de la suivante
+    last_line = conditions[0].text.splitlines()[-1]
+    assert last_line in conditions[1].text
+
+    assert "[...]" in join_passages([passages[-1], passages[0]])
+    assert join_passages([passages[-1], passages[0]]).startswith(passages[0].text)
+
+
+def test_passage_index_groups_by_document():
+    """Score document = meilleur passage ; passages contigus par document"""
+    passages = chunk_document("aeeh", LONG_DOC, max_chars=300, overlap=80) + \
+        chunk_document("aah", {"title": "AAH", "content": "Court"})
+    vectors = np.eye(len(passages), dtype=np.float32)
+    index = PassageIndex(passages, VectorIndex([p.id for p in passages], vectors))
+
+    query = vectors[1] * 0.9 + vectors[-1] * 0.1
+    results, passage_scores = index.search(query, top_k=2)
+    assert [doc_id for doc_id, _ in results] == ["aeeh", "aah"]
+
+    best = index.best_passages("aeeh", passage_scores, max_passages=2, min_score=0.5)
+    assert [p.id for p, _ in best] == ["aeeh#1"]
@@ -0,0 +1,60 @@
+"""
+🧪 Tests pour le corpus multi-fichiers
+"""
+import json
+from services.corpus import load_corpus, source_namespace
+
+
+def write_kb(path, documents):
+    path.write_text(json.dumps(documents, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def test_merge_dedup_and_namespace(tmp_path):
+    """Doublons exacts fusionnés, collisions de contenu renommées"""
+    write_kb(tmp_path / "knowledge_base.json", {
+        "aah": {"title": "AAH", "content": "Allocation adulte handicapé", "keywords": ["aah"]},
+        "pch": {"title": "PCH", "content": "Prestation de compensation", "keywords": ["pch"]},
+    })
+    write_kb(tmp_path / "knowledge_base_maladies_2025.json", {
+        "aah": {"title": "AAH", "content": "Allocation adulte handicapé", "keywords": ["aah", "adulte"]},
+        "pch": {"title": "PCH 2025", "content": "Nouvelle version", "keywords": ["pch"]},
+        "ald": {"title": "ALD", "content": "Affection longue durée", "keywords": ["ald"]},
+    })
+
+    corpus = load_corpus(["knowledge_base.json", "knowledge_base_maladies_2025.json"], directory=tmp_path)
+
+    assert set(corpus.documents) == {"aah", "pch", "ald", "maladies_2025:pch"}
+    assert corpus.documents["aah"]["keywords"] == ["aah", "adulte"]
+    assert corpus.documents["pch"]["title"] == "PCH"
+    assert corpus.source_of("ald") == "knowledge_base_maladies_2025.json"
+    assert corpus.collisions == [{
+        "id": "pch",
+        "renamed": "maladies_2025:pch",
+        "source": "knowledge_base_maladies_2025.json",
+        "existing_source": "knowledge_base.json"
+    }]
+
+    stats = corpus.stats()["sources"]["knowledge_base_maladies_2025.json"]
+    assert (stats["added"], stats["duplicates"], stats["renamed"]) == (1, 1, 1)
+    assert stats["sha256"]
+
+
+def test_missing_and_invalid_sources(tmp_path):
+    """Fichier absent, JSON invalide et documents incomplets ignorés"""
+    write_kb(tmp_path / "kb.json", {
+        "ok": {"title": "OK", "content": "Contenu"},
+        "vide": {"title": "Sans contenu"},
+    })
+    (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+
+    corpus = load_corpus(["kb.json", "broken.json", "absent.json"], directory=tmp_path)
+
+    assert list(corpus.documents) == ["ok"]
+    assert list(corpus.sources) == ["kb.json"]
+    assert corpus.sources["kb.json"].invalid == 1
+
+
+def test_source_namespace():
+    assert source_namespace("knowledge_base_enhanced_2025.json") == "enhanced_2025"
+    assert source_namespace("guides.json") == "guides"
@@ -0,0 +1,66 @@
+"""
+🧪 Tests pour la diversification MMR des sources
+"""
+import inspect
+
+import numpy as np
+import pytest
+import services.semantic_search as semantic_search
+from config.settings import Settings
+from services.diversity import DocSimilarity, mmr
+
+KB = {
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé.", "keywords": ["aeeh"]},
+    "aeeh_2025": {"title": "AEEH 2025", "content": "Allocation d'éducation de l'enfant handicapé en 2025.", "keywords": ["aeeh"]},
+    "pch": {"title": "PCH", "content": "Prestation de compensation du handicap de l'enfant.", "keywords": ["pch"]},
+}
+
+
+def test_mmr_skips_near_duplicates():
+    relevance = np.array([1.0, 0.95, 0.6], dtype=np.float32)
+    similarity = np.array([
+        [1.0, 0.98, 0.3],
+        [0.98, 1.0, 0.3],
+        [0.3, 0.3, 1.0],
+    ], dtype=np.float32)
+    assert mmr(relevance, similarity, top_k=2, lambda_=0.5) == [0, 2]
+    assert mmr(relevance, similarity, top_k=2, lambda_=1.0) == [0, 1]
+
+
+def test_mmr_default_matches_settings():
+    """Un seul λ par défaut, prudent : la pertinence l'emporte sur la diversité"""
+    default = inspect.signature(mmr).parameters["lambda_"].default
+    assert Settings.model_fields["mmr_lambda"].default == default >= 0.7
+
+
+def test_doc_similarity_from_passages():
+    """Vecteurs de documents = somme des passages, matrice pré-calculée ou calcul à la volée"""
+    matrix = np.array([[0.0, 1.0], [1.0, 0.0], [1.0, 0.1], [0.0, 2.0]], dtype=np.float32)
+    rows = np.array([1, 2, 0])  # passages de l'index → lignes du store
+    offsets = np.array([0, 2])  # doc "a" : 2 passages, doc "b" : 1
+
+    precomputed = DocSimilarity.from_passages(["a", "b"], offsets, matrix, rows=rows)
+    on_the_fly = DocSimilarity.from_passages(["a", "b"], offsets, matrix, rows=rows, max_matrix_docs=0)
+
+    assert on_the_fly.matrix is None
+    pairwise = precomputed.pairwise(["b", "a", "inconnu"])
+    assert np.allclose(pairwise, on_the_fly.pairwise(["b", "a", "inconnu"]), atol=1e-3)
+    assert pairwise[0, 0] == pytest.approx(1.0, abs=1e-3)
+    assert pairwise[0, 1] == pytest.approx(0.05, abs=1e-2)
+    assert not pairwise[2].any()
+
+
+def test_hybrid_search_diversifies_sources(monkeypatch):
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {
+        "aeeh": [1.0, 0.0, 0.0], "aeeh_2025": [0.99, 0.05, 0.0], "pch": [0.6, 0.0, 0.8],
+    })
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    monkeypatch.setattr(semantic_search.settings, "mmr_candidates", 10)
+    semantic_search.build_semantic_index(KB)
+
+    query = [1.0, 0.0, 0.0]
+    plain = semantic_search.hybrid_search("allocation enfant", KB, top_k=2, query_embedding=query, mmr_lambda=1.0)
+    diverse = semantic_search.hybrid_search("allocation enfant", KB, top_k=2, query_embedding=query, mmr_lambda=0.3)
+
+    assert {doc.id for doc in plain} == {"aeeh", "aeeh_2025"}
+    assert [doc.id for doc in diverse][1] == "pch"
@@ -0,0 +1,87 @@
+"""
+🧪 Tests pour le pipeline d'embedding par lots
+"""
+import services.embedding_pipeline as pipeline
+from google.api_core import exceptions as google_exceptions
+from tenacity import wait_none
+from services.embedding_pipeline import embed_batch, embed_documents, load_checkpoint
+
+
+def fake_embed_content(calls, fail_on=None):
+    def embed_content(model, content, task_type, request_options=None):
+        calls.append(list(content))
+        if fail_on and fail_on in content:
+            raise ValueError("boom")
+        return {"embedding": [[float(len(text)), 1.0] for text in content]}
+    return embed_content
+
+
+def test_batches_and_checkpoint_resume(tmp_path, monkeypatch):
+    """Lots de taille fixe, puis reprise sans ré-embedder ce qui est fait"""
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    texts = {f"doc{i}": "x" * (i + 1) for i in range(5)}
+
+    calls = []
+    monkeypatch.setattr(pipeline.genai, "embed_content", fake_embed_content(calls, fail_on="xxxxx"))
+    result = embed_documents(texts, batch_size=2, concurrency=2, checkpoint_file=checkpoint)
+
+    assert len(calls) == 3
+    assert set(result) == {"doc0", "doc1", "doc2", "doc3"}  # doc4 a échoué, pas de vecteur nul
+    assert set(load_checkpoint(checkpoint, texts)) == set(result)
+
+    calls.clear()
+    monkeypatch.setattr(pipeline.genai, "embed_content", fake_embed_content(calls))
+    result = embed_documents(texts, batch_size=2, concurrency=2, checkpoint_file=checkpoint)
+
+    assert calls == [["xxxxx"]]
+    assert result["doc4"] == [5.0, 1.0]
+
+
+def test_checkpoint_ignores_changed_text(tmp_path, monkeypatch):
+    """Un texte modifié depuis le checkpoint est ré-embeddé"""
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    calls = []
+    monkeypatch.setattr(pipeline.genai, "embed_content", fake_embed_content(calls))
+
+    embed_documents({"aeeh": "ancien"}, checkpoint_file=checkpoint)
+    embed_documents({"aeeh": "nouveau contenu"}, checkpoint_file=checkpoint)
+
+    assert calls == [["ancien"], ["nouveau contenu"]]
+
+
+def test_transient_errors_retried_by_tenacity_only(monkeypatch):
+    """503 → nouvel essai tenacity ; le retry interne du SDK est désactivé"""
+    calls = []
+
+    def embed_content(model, content, task_type, request_options=None):
+        calls.append(request_options)
+        if len(calls) < 3:
+            raise google_exceptions.ServiceUnavailable("indisponible")
+        return {"embedding": [[1.0, 0.0] for _ in content]}
+
+    monkeypatch.setattr(pipeline.genai, "embed_content", embed_content)
+    assert embed_batch.retry_with(wait=wait_none())(["aeeh"]) == [[1.0, 0.0]]
+    assert len(calls) == 3
+    assert all(options == {"retry": None} for options in calls)
+
+
+def test_cli_checks_every_passage(monkeypatch):
+    """Document long découpé en passages : le CLI exige un vecteur par passage, pas par document"""
+    import services.corpus as corpus
+    import services.semantic_search as semantic_search
+
+    loaded = corpus.Corpus()
+    loaded.documents = {
+        "court": {"title": "Court", "content": "Une phrase.", "keywords": []},
+        "long": {"title": "Long", "content": "\n\n".join(f"## Section {i}\n" + "texte " * 150 for i in range(4)), "keywords": []},
+    }
+    monkeypatch.setattr(corpus, "load_corpus", lambda files=None: loaded)
+    passage_ids = list(semantic_search.passage_texts(loaded.documents))
+    assert len(passage_ids) > 2 and "long" not in passage_ids
+
+    embedded = {passage_id: [1.0] for passage_id in passage_ids}
+    monkeypatch.setattr(semantic_search, "create_knowledge_base_embeddings", lambda kb, **kwargs: embedded)
+    assert pipeline.main([]) == 0
+
+    del embedded[passage_ids[-1]]
+    assert pipeline.main([]) == 1
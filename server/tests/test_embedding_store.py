@@ -0,0 +1,62 @@
+"""
+🧪 Tests pour le store binaire des embeddings
+"""
+import json
+import numpy as np
+from services.embedding_store import load_store, save_store, import_json, export_json
+
+
+def test_save_and_load_memmap(tmp_path):
+    """Le store est relu en memmap avec les mêmes ids et des vecteurs normalisés"""
+    embeddings = {"aeeh": [3.0, 4.0], "aah": [0.0, 2.0], "vide": [0.0, 0.0]}
+    save_store(embeddings, tmp_path)
+
+    store = load_store(tmp_path)
+    assert store is not None
+    assert isinstance(store.matrix, np.memmap)
+    assert store.ids == ["aeeh", "aah", "vide"]
+    assert store.dim == 2
+    np.testing.assert_allclose(store.get("aeeh"), [0.6, 0.8], rtol=1e-6)
+    np.testing.assert_allclose(store.get("vide"), [0.0, 0.0])
+    assert store.rows_for(["aeeh", "aah", "vide"]) is store.matrix
+    assert store.rows_for(["inconnu"]) is None
+
+
+def test_json_roundtrip(tmp_path):
+    """Import du cache JSON legacy puis ré-export"""
+    legacy = tmp_path / "embeddings_cache.json"
+    legacy.write_text(json.dumps({"pch": [1.0, 0.0, 0.0]}), encoding="utf-8")
+
+    store = import_json(legacy, tmp_path)
+    assert len(store) == 1
+
+    exported = tmp_path / "export.json"
+    assert export_json(exported, tmp_path) == 1
+    assert json.loads(exported.read_text(encoding="utf-8")) == {"pch": [1.0, 0.0, 0.0]}
+
+
+def test_missing_store(tmp_path):
+    """Pas de store → None (le service retombe sur le JSON)"""
+    assert load_store(tmp_path) is None
+
+
+def test_rewrite_never_pairs_new_matrix_with_old_manifest(tmp_path):
+    """Réécriture de même taille : l'ancien manifest désigne toujours l'ancienne matrice"""
+    save_store({"aeeh": [1.0, 0.0], "aah": [0.0, 1.0]}, tmp_path)
+    old_manifest = (tmp_path / "embeddings_manifest.json").read_text(encoding="utf-8")
+
+    save_store({"aah": [1.0, 0.0], "aeeh": [0.0, 1.0]}, tmp_path)
+    new_manifest = (tmp_path / "embeddings_manifest.json").read_text(encoding="utf-8")
+
+    # Worker qui a lu l'ancien manifest juste avant la bascule
+    (tmp_path / "embeddings_manifest.json").write_text(old_manifest, encoding="utf-8")
+    store = load_store(tmp_path)
+    np.testing.assert_allclose(store.get("aeeh"), [1.0, 0.0])
+
+    (tmp_path / "embeddings_manifest.json").write_text(new_manifest, encoding="utf-8")
+    store = load_store(tmp_path)
+    np.testing.assert_allclose(store.get("aeeh"), [0.0, 1.0])
+
+    # Une troisième écriture supprime la matrice qui n'est plus référencée
+    save_store({"pch": [1.0, 1.0]}, tmp_path)
+    assert len(list(tmp_path.glob("embeddings-*.npy"))) == 2
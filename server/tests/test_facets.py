@@ -0,0 +1,94 @@
+"""
+🧪 Tests pour les facettes et les index partitionnés
+"""
+import pytest
+import services.semantic_search as semantic_search
+from services.corpus import Corpus
+from services.facets import build_partitions, document_facets, intent_facet, partition_is_confident
+
+KB = {
+    "dossier_mdph": {"title": "Constitution Dossier MDPH", "content": "Pièces du dossier.", "keywords": ["mdph", "formulaire"]},
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé.", "keywords": ["aeeh", "allocation"]},
+    "fratrie": {"title": "Accompagnement de la fratrie", "content": "Soutien des frères et sœurs.", "keywords": ["fratrie", "soutien"]},
+    "ulis": {"title": "ULIS", "content": "Unités localisées pour l'inclusion scolaire.", "keywords": ["ulis", "école"]},
+}
+
+
+def test_document_facets_inferred_or_explicit():
+    assert document_facets(KB["dossier_mdph"]) == ("demarches",)
+    assert document_facets(KB["aeeh"]) == ("aides",)
+    assert document_facets(KB["ulis"]) == ()
+    assert document_facets({**KB["ulis"], "facets": ["scolarite"]}) == ("scolarite",)
+
+
+def test_intent_facet():
+    assert intent_facet("fatigue") == "soutien"
+    assert intent_facet("admin_courrier") == "demarches"
+    assert intent_facet("info_generale") is None
+
+
+def test_partitions_share_documents():
+    corpus = Corpus()
+    corpus.add_source("kb.json", KB)
+    corpus.tag_facets()
+
+    assert set(corpus.partitions) == {"demarches", "aides", "soutien"}
+    assert corpus.partitions["soutien"]["fratrie"] is corpus.documents["fratrie"]
+    assert corpus.stats()["facets"] == {"aides": 1, "demarches": 1, "soutien": 1}
+
+
+def test_partition_indexes_live_with_their_corpus(monkeypatch):
+    """Les partitions d'une version ne comptent pas comme des versions (pas d'éviction du corpus)"""
+    monkeypatch.setattr(semantic_search, "_INDEXES", semantic_search.OrderedDict())
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {doc_id: [1.0, float(i)] for i, doc_id in enumerate(KB)})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    _, partitions = build_partitions(KB)
+
+    semantic_search.build_lexical_index(KB)
+    semantic_search.build_semantic_index(KB)
+    semantic_search.build_partition_indexes(KB, partitions)
+
+    aides = semantic_search.indexes_for(partitions["aides"])
+    assert aides.lexical.ids == ["aeeh"]
+    assert aides.passages_by_doc["aeeh"] is semantic_search.get_passages(KB)["aeeh"]
+    assert semantic_search.indexes_for(KB).semantic is not None
+
+    results = semantic_search.keyword_search_internal("allocation", partitions["aides"])
+    assert [doc["id"] for doc in results] == ["aeeh"]
+
+    # Deux nouvelles versions : l'ancienne disparaît avec toutes ses partitions
+    semantic_search.indexes_for(dict(KB))
+    semantic_search.indexes_for(dict(KB))
+    assert id(KB) not in semantic_search._INDEXES
+    assert id(partitions["aides"]) not in semantic_search._INDEXES
+
+
+@pytest.mark.parametrize("fusion", ["rrf", "linear"])
+def test_partition_miss_falls_back_to_full_corpus(monkeypatch, fusion):
+    """
+    Question hors de la partition : son meilleur document a un score fusionné élevé
+    (relatif à la partition) mais ni cosinus ni BM25 bruts suffisants → corpus complet
+    """
+    monkeypatch.setattr(semantic_search, "_INDEXES", semantic_search.OrderedDict())
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {
+        "dossier_mdph": [1.0, 0.0, 0.0, 0.0],
+        "aeeh": [0.0, 1.0, 0.0, 0.0],
+        "fratrie": [0.0, 0.0, 1.0, 0.0],
+        "ulis": [0.0, 0.0, 0.0, 1.0],
+    })
+    monkeypatch.setattr(semantic_search.settings, "fusion_method", fusion)
+    _, partitions = build_partitions(KB)
+    semantic_search.build_lexical_index(KB)
+    semantic_search.build_semantic_index(KB)
+    semantic_search.build_partition_indexes(KB, partitions)
+
+    query, embedding = "soutien de la fratrie", [0.1, 0.35, 0.9, 0.0]
+    in_partition = semantic_search.hybrid_search(query, partitions["aides"], query_embedding=embedding, fusion=fusion)
+    assert in_partition[0]["id"] == "aeeh"
+    if fusion == "rrf":
+        assert in_partition[0]["score"] >= 0.7  # premier rang sémantique de la partition
+    assert not partition_is_confident(in_partition[0])
+
+    full = semantic_search.hybrid_search(query, KB, query_embedding=embedding, fusion=fusion)
+    assert full[0]["id"] == "fratrie" and partition_is_confident(full[0])
@@ -0,0 +1,99 @@
+"""
+🧪 Tests pour la fusion des scores (linéaire / RRF) et les résultats immuables
+"""
+import dataclasses
+import numpy as np
+import pytest
+import services.semantic_search as semantic_search
+from services.fusion import SearchResult, fuse, reciprocal_ranks
+
+KB = {
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé, versée par la CAF.", "keywords": ["aeeh"]},
+    "aah": {"title": "AAH", "content": "Allocation aux adultes handicapés, cumul avec un emploi.", "keywords": ["aah"]},
+    "cmi": {"title": "Carte mobilité inclusion", "content": "Carte de stationnement et priorité.", "keywords": ["cmi"]},
+    "pch": {"title": "PCH", "content": "Prestation de compensation du handicap, aide humaine.", "keywords": ["pch"]},
+}
+
+
+def test_reciprocal_ranks_ignore_unscored_documents():
+    """Rang 1 → 1/(k+1), documents sans score → 0"""
+    ranks = reciprocal_ranks(np.array([0.2, 0.0, 0.9, -1.0], dtype=np.float32), k=10)
+    assert np.allclose(ranks, [1 / 12, 0.0, 1 / 11, 0.0])
+
+
+def test_linear_and_rrf_fusion():
+    semantic = np.array([0.9, 0.5, 0.0], dtype=np.float32)
+    keyword = np.array([0.0, 4.0, 2.0], dtype=np.float32)
+
+    linear = fuse(semantic, keyword, "linear", semantic_weight=0.5)
+    assert np.allclose(linear, [0.45, 0.75, 0.25])
+
+    # RRF : seul l'ordre compte, 1 = premier dans les deux listes
+    rrf = fuse(semantic, keyword * 1000, "rrf", semantic_weight=0.5, rrf_k=60)
+    assert np.argmax(rrf) == 1
+    assert fuse(np.ones(1), np.ones(1), "rrf")[0] == pytest.approx(1.0)
+
+    with pytest.raises(ValueError):
+        fuse(semantic, keyword, "max")
+
+
+def test_search_result_is_read_only_mapping():
+    result = SearchResult(id="aah", title="AAH", content="...", score=0.5)
+    assert result["title"] == "AAH" and result.get("missing") is None
+    assert dict(result)["score"] == 0.5
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        result.score = 1.0
+    with pytest.raises(TypeError):
+        result["score"] = 1.0
+
+
+@pytest.fixture
+def vectors(monkeypatch):
+    """Index sémantique à 2 dimensions : aeeh/aah proches de la requête [1, 0]"""
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {
+        "aeeh": [1.0, 0.1], "aah": [0.9, 0.4], "cmi": [0.0, 1.0], "pch": [0.2, 1.0],
+    })
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    semantic_search.build_semantic_index(KB)
+
+
+@pytest.mark.parametrize("method", ["linear", "rrf"])
+def test_hybrid_search_fuses_full_candidate_sets(vectors, method):
+    """Documents trouvés par un seul des deux scorers conservés, KB non modifiée"""
+    before = {doc_id: dict(doc) for doc_id, doc in KB.items()}
+    results = semantic_search.hybrid_search("carte stationnement", KB, top_k=4, query_embedding=[1.0, 0.0], fusion=method)
+
+    ids = [result.id for result in results]
+    assert set(ids) == {"aeeh", "aah", "cmi"}
+    assert all(isinstance(result, SearchResult) for result in results)
+    cmi = results[ids.index("cmi")]
+    assert cmi.semantic == 0.0 and cmi.keyword == 1.0
+    assert [result.score for result in results] == sorted((result.score for result in results), reverse=True)
+    assert KB == before
+
+
+def test_batch_hybrid_search_matches_single_queries(vectors, monkeypatch):
+    """Même classement qu'une recherche par requête ; embeddings par lot, index local si absent"""
+    batches = []
+
+    def fake_embed_batch(texts, task_type):
+        batches.append(list(texts))
+        return [[1.0, 0.0] if "allocation" in text else [0.0, 1.0] for text in texts]
+
+    monkeypatch.setattr(semantic_search, "embed_batch", fake_embed_batch)
+    monkeypatch.setattr(semantic_search, "_REMOTE_EMBEDDING_RETRY_AT", 0.0)
+    monkeypatch.setattr(semantic_search.query_embedding_cache, "get", lambda *args: None)
+    monkeypatch.setattr(semantic_search.query_embedding_cache, "set", lambda *args: None)
+    monkeypatch.setattr(semantic_search.settings, "batch_search_block", 2)
+
+    queries = ["allocation enfant handicapé", "carte stationnement", "allocation enfant handicapé"]
+    results = semantic_search.batch_hybrid_search(queries, KB, top_k=2)
+
+    assert batches == [["allocation enfant handicapé", "carte stationnement"]]
+    for query, batch_results in zip(queries, results):
+        embedding = [1.0, 0.0] if "allocation" in query else [0.0, 1.0]
+        assert batch_results == semantic_search.hybrid_search(query, KB, top_k=2, query_embedding=embedding)
+
+    # Embeddings absents → index local (aucune requête perdue)
+    local = semantic_search.batch_hybrid_search(queries[:2], KB, top_k=2, query_embeddings=[None, None])
+    assert all(local)
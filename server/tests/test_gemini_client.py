@@ -0,0 +1,61 @@
+"""
+🧪 Tests pour le client de génération Gemini async (concurrence bornée, annulation)
+"""
+import asyncio
+import pytest
+from services.gemini_client import ClientDisconnected, GeminiClient, until_disconnected
+
+
+class FakeModel:
+    """generate_content_async factice : compte les appels simultanés"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, request_options=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return prompt.upper()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+def test_concurrency_is_capped_and_queue_wait_measured():
+    model = FakeModel()
+    client = GeminiClient(model, max_concurrency=2)
+
+    async def scenario():
+        return await asyncio.gather(*(client.generate(f"q{i}") for i in range(5)))
+
+    assert asyncio.run(scenario()) == [f"Q{i}" for i in range(5)]
+    stats = client.stats()
+    assert model.peak == 2
+    assert stats["completed"] == 5 and stats["in_flight"] == 0 and stats["waiting"] == 0
+    assert stats["queue_wait_max_ms"] >= 40
+
+
+def test_generation_cancelled_when_client_disconnects():
+    model = FakeModel(delay=5.0)
+    client = GeminiClient(model, max_concurrency=1)
+    checks = []
+
+    async def is_disconnected():
+        checks.append(1)
+        return len(checks) >= 2
+
+    async def scenario():
+        with pytest.raises(ClientDisconnected):
+            await until_disconnected(client.generate("q"), is_disconnected, poll_interval=0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert model.cancelled == 1
+    assert client.stats()["cancelled"] == 1 and client.in_flight == 0
@@ -0,0 +1,86 @@
+"""
+🧪 Tests pour le ré-embedding incrémental (hash du contenu + modèle)
+"""
+import json
+
+import pytest
+import services.semantic_search as semantic_search
+from services.embedding_store import import_json, load_store, save_store
+
+
+@pytest.fixture
+def isolated_store(tmp_path, monkeypatch):
+    """Store d'embeddings dans un dossier temporaire + embedder factice"""
+    calls = []
+
+    def fake_embed_documents(texts, **kwargs):
+        calls.append(sorted(texts))
+        return {doc_id: [float(len(text)), 1.0] for doc_id, text in texts.items()}
+
+    monkeypatch.setattr(semantic_search, "load_store", lambda: load_store(tmp_path))
+    monkeypatch.setattr(
+        semantic_search, "save_store",
+        lambda embeddings, metadata=None: save_store(embeddings, tmp_path, metadata=metadata)
+    )
+    # Pas de conversion de l'ancien JSON vers le vrai store de config/
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE_FILE", tmp_path / "embeddings_cache.json")
+    monkeypatch.setattr(
+        semantic_search, "import_json",
+        lambda json_path, metadata=None: import_json(json_path, tmp_path, metadata=metadata)
+    )
+    monkeypatch.setattr(semantic_search, "embed_documents", fake_embed_documents)
+    monkeypatch.setattr(semantic_search, "clear_checkpoint", lambda: None)
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_METADATA", {})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    return calls
+
+
+def test_only_changed_docs_are_reembedded(isolated_store):
+    """Ajout, modification, suppression : seul le delta est recalculé"""
+    kb = {
+        "aeeh": {"title": "AEEH", "content": "Montant 2024", "keywords": []},
+        "aah": {"title": "AAH", "content": "Conditions", "keywords": []},
+    }
+    semantic_search.create_knowledge_base_embeddings(kb)
+    assert isolated_store == [["aah", "aeeh"]]
+
+    # Rien n'a changé → aucun appel
+    semantic_search.create_knowledge_base_embeddings(kb)
+    assert len(isolated_store) == 1
+
+    kb_2025 = {
+        "aeeh": {"title": "AEEH", "content": "Montant 2025", "keywords": []},
+        "pch": {"title": "PCH", "content": "Volets", "keywords": []},
+    }
+    cache = semantic_search.create_knowledge_base_embeddings(kb_2025)
+    assert isolated_store[-1] == ["aeeh", "pch"]
+    assert set(cache) == {"aeeh", "pch"}  # "aah" orphelin supprimé
+
+    metadata = semantic_search.EMBEDDINGS_STORE.metadata()
+    assert metadata["aeeh"]["hash"] == semantic_search.content_hash(kb_2025["aeeh"])
+    assert metadata["pch"]["model"] == semantic_search.EMBEDDING_MODEL
+
+
+def test_model_change_invalidates(isolated_store, monkeypatch):
+    """Un changement de modèle d'embedding ré-embedde tout"""
+    kb = {"aeeh": {"title": "AEEH", "content": "Montant", "keywords": []}}
+    semantic_search.create_knowledge_base_embeddings(kb)
+
+    monkeypatch.setattr(semantic_search, "EMBEDDING_MODEL", "models/autre-modele")
+    semantic_search.create_knowledge_base_embeddings(kb)
+    assert isolated_store == [["aeeh"], ["aeeh"]]
+
+
+def test_legacy_json_import_is_not_reembedded(isolated_store):
+    """embeddings_cache.json seul (sans store) : vecteurs estampillés avec les hashes de la KB chargée"""
+    kb = {
+        "aeeh": {"title": "AEEH", "content": "Montant", "keywords": []},
+        "aah": {"title": "AAH", "content": "Conditions", "keywords": []},
+    }
+    with open(semantic_search.EMBEDDINGS_CACHE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"aeeh": [1.0, 0.0], "aah": [0.0, 1.0]}, f)
+
+    semantic_search.create_knowledge_base_embeddings(kb)
+    assert isolated_store == []
+    assert semantic_search.EMBEDDINGS_METADATA == semantic_search.embedding_metadata(kb)
@@ -0,0 +1,147 @@
+"""
+🧪 Tests pour le rechargement à chaud de la knowledge base
+"""
+import os
+import json
+import time
+import threading
+import pytest
+
+from core.cache import cache
+from services import embedding_store, knowledge_reload, semantic_search
+from services.corpus import Corpus
+from services.knowledge_reload import KnowledgeWatcher, diff_documents, load_initial_snapshot, reload_knowledge_base
+
+
+def write_kb(path, documents):
+    path.write_text(json.dumps(documents, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def builds(tmp_path, monkeypatch):
+    """Valeur de `embed` de chaque construction d'index ; verrou et manifest du store dans tmp_path"""
+    calls = []
+
+    def build_indexes(self, embed=True):
+        calls.append(embed)
+        semantic_search.build_lexical_index(self.documents)
+
+    monkeypatch.setattr(Corpus, "build_indexes", build_indexes)
+    monkeypatch.setattr(embedding_store, "STORE_DIR", tmp_path)
+    return calls
+
+
+@pytest.fixture
+def kb_file(tmp_path, monkeypatch, builds):
+    """KB temporaire, index lexical seulement (aucun appel Gemini)"""
+    monkeypatch.setattr(knowledge_reload, "_SNAPSHOT", None)
+    monkeypatch.setattr(knowledge_reload, "LAST_RELOAD", None)
+    monkeypatch.setattr(cache, "namespace", "")
+    return write_kb(tmp_path / "kb.json", {
+        "aah": {"title": "AAH", "content": "Allocation adulte handicapé", "keywords": ["aah"]},
+        "pch": {"title": "PCH", "content": "Prestation de compensation du handicap", "keywords": ["pch"]},
+    })
+
+
+def test_reload_swaps_snapshot_and_reports_diff(kb_file):
+    """Nouvelle version publiée, ancienne version toujours indexée pour les requêtes en cours"""
+    first = load_initial_snapshot([kb_file])
+    assert first.version == 1
+    assert cache.namespace == first.fingerprint
+    old_kb = first.knowledge_base
+
+    write_kb(kb_file, {
+        "aah": {"title": "AAH", "content": "Allocation adulte handicapé (montant 2025)", "keywords": ["aah"]},
+        "ald": {"title": "ALD", "content": "Affection longue durée", "keywords": ["ald"]},
+    })
+    report = reload_knowledge_base([kb_file], reason="test")
+
+    assert report["status"] == "reloaded"
+    assert (report["version"], report["previous_version"]) == (2, 1)
+    assert (report["added"], report["changed"], report["removed"]) == (["ald"], ["aah"], ["pch"])
+    assert report["unchanged"] == 0
+
+    current = knowledge_reload.current_snapshot()
+    assert current.version == 2 and "ald" in current.knowledge_base
+    assert cache.namespace == current.fingerprint != first.fingerprint
+
+    # Une requête commencée sur l'ancienne version la termine avec ses propres index
+    assert semantic_search.indexes_for(old_kb).lexical is not None
+    assert [doc["title"] for doc in semantic_search.keyword_search_internal("prestation compensation", old_kb)] == ["PCH"]
+
+
+def test_failed_reload_keeps_current_version(kb_file):
+    """Corpus vide ou invalide : la version servie ne change pas"""
+    first = load_initial_snapshot([kb_file])
+    kb_file.write_text("{", encoding="utf-8")
+
+    report = reload_knowledge_base([kb_file])
+
+    assert report["status"] == "failed"
+    assert knowledge_reload.current_snapshot() is first
+    assert knowledge_reload.knowledge_status()["last_reload"]["status"] == "failed"
+
+
+def test_concurrent_reload_is_rejected(kb_file):
+    """Un seul rechargement à la fois"""
+    load_initial_snapshot([kb_file])
+    knowledge_reload._RELOAD_LOCK.acquire()
+    try:
+        assert reload_knowledge_base([kb_file])["status"] == "already_running"
+    finally:
+        knowledge_reload._RELOAD_LOCK.release()
+
+
+def test_watcher_reloads_on_content_change(kb_file):
+    """Le watcher ne recharge que si le contenu des fichiers change"""
+    load_initial_snapshot([kb_file])
+    watcher = KnowledgeWatcher(interval=0, files=[kb_file])
+
+    assert watcher.check() is None
+    # Ré-enregistré à l'identique : mtime différent, contenu identique
+    stat = kb_file.stat()
+    os.utime(kb_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert watcher.check() is None
+    assert knowledge_reload.current_snapshot().version == 1
+
+    write_kb(kb_file, {"ald": {"title": "ALD", "content": "Affection longue durée", "keywords": ["ald"]}})
+    report = watcher.check()
+    assert report["status"] == "reloaded" and report["reason"] == "watcher"
+    assert list(knowledge_reload.current_snapshot().knowledge_base) == ["ald"]
+
+
+def test_only_one_worker_embeds(kb_file, builds):
+    """Verrou du store pris par un autre worker : attente, puis index depuis son store, sans embedding"""
+    load_initial_snapshot([kb_file])
+    assert builds == [True]
+
+    with embedding_store.store_lock() as held:
+        assert held
+        reload = threading.Thread(target=reload_knowledge_base, args=([kb_file], "watcher"))
+        reload.start()
+        time.sleep(0.05)
+        assert reload.is_alive()  # attend la fin de l'autre worker
+    reload.join(timeout=5)
+
+    assert builds == [True, False]
+    assert knowledge_reload.current_snapshot().version == 2
+
+
+def test_watcher_follows_store_published_by_another_worker(kb_file, builds):
+    """Manifest du store réécrit ailleurs (rechargement admin) : rechargement sans embedding"""
+    load_initial_snapshot([kb_file])
+    watcher = KnowledgeWatcher(interval=0, files=[kb_file])
+    assert watcher.check() is None
+
+    embedding_store.manifest_path().write_text("{}", encoding="utf-8")
+    report = watcher.check()
+    assert report["status"] == "reloaded" and report["reason"] == "store"
+    assert builds == [True, False]
+    assert watcher.check() is None
+
+
+def test_diff_documents():
+    old = {"a": {"title": "A", "content": "x"}, "b": {"title": "B", "content": "y"}}
+    new = {"a": {"title": "A", "content": "x"}, "c": {"title": "C", "content": "z"}}
+    assert diff_documents(old, new) == {"added": ["c"], "removed": ["b"], "changed": []}
@@ -0,0 +1,71 @@
+"""
+🧪 Tests pour l'index lexical BM25
+"""
+from services.lexical_index import BM25Index, NGramIndex, fold_accents, tokenize
+
+KB = {
+    "aeeh": {
+        "title": "Allocation d'Éducation de l'Enfant Handicapé (AEEH)",
+        "content": "L'AEEH compense les frais d'éducation. Dossier MDPH.",
+        "keywords": ["aeeh", "éducation", "enfant"]
+    },
+    "aah": {
+        "title": "Allocation Adulte Handicapé (AAH)",
+        "content": "L'AAH garantit un minimum de ressources. Dossier MDPH.",
+        "keywords": ["aah", "adulte"]
+    },
+    "cmi": {
+        "title": "Carte Mobilité Inclusion",
+        "content": "Stationnement et priorité.",
+        "keywords": ["cmi", "stationnement"]
+    },
+}
+
+
+def test_tokenize_folds_accents_and_stopwords():
+    """Accents retirés, mots vides et tokens d'un caractère ignorés"""
+    assert fold_accents("Éducation Handicapé") == "education handicape"
+    assert tokenize("Comment obtenir l'AEEH pour mon enfant ?") == ["obtenir", "aeeh", "enfant"]
+
+
+def test_bm25_ranking():
+    """Le document qui contient les termes rares passe en premier"""
+    index = BM25Index(KB)
+    results = index.search("education enfant handicapé")
+    assert results[0][0] == "aeeh"
+
+    results = index.search("carte de stationnement")
+    assert [doc_id for doc_id, _ in results] == ["cmi"]
+
+    # Terme présent partout (mdph) : idf faible, mais score > 0
+    assert len(index.search("mdph")) == 2
+    assert index.search("inconnu") == []
+
+
+def test_keyword_rows():
+    """Mots-clés (sans accents) → documents"""
+    index = BM25Index(KB)
+    assert list(index.keyword_rows["education"]) == [0]
+    assert "stationnement" in index.keyword_rows
+
+
+def test_ngram_lookup_typos():
+    """Fautes de frappe retrouvées via les trigrammes, avec un score SequenceMatcher"""
+    index = NGramIndex(["aeeh", "aah", "allocation", "stationnement"])
+
+    matches = dict(index.lookup("aeh"))
+    assert "aeeh" in matches and 0.75 < matches["aeeh"] < 1.0
+    assert "aah" not in matches
+    assert index.lookup("allocaton")[0][0] == "allocation"
+    assert index.lookup("allocaton", threshold=0.99) == []
+
+    # Aucun trigramme partagé → aucun candidat scoré
+    assert len(index.candidates("xyz")) == 0
+
+
+def test_fuzzy_keyword_scores():
+    """Bonus fuzzy seulement pour les termes hors vocabulaire"""
+    index = BM25Index(KB)
+    scores = index.fuzzy_keyword_scores(["stationement"])
+    assert scores[index.id_to_row["cmi"]] > 0
+    assert not index.fuzzy_keyword_scores(["stationnement"]).any()
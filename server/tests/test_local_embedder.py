@@ -0,0 +1,61 @@
+"""
+🧪 Tests pour l'embedder local de secours et la bascule quand Gemini échoue
+"""
+import numpy as np
+import pytest
+import services.semantic_search as semantic_search
+from services.local_embedder import LocalEmbedder
+
+KB = {
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé, versée par la CAF.", "keywords": ["aeeh"]},
+    "aah": {"title": "AAH", "content": "Allocation aux adultes handicapés, cumul avec un emploi.", "keywords": ["aah"]},
+    "cmi": {"title": "Carte mobilité inclusion", "content": "Carte de stationnement et priorité.", "keywords": ["cmi"]},
+}
+
+
+def test_local_embedder_is_deterministic_and_normalized():
+    """Mêmes vecteurs d'une instance à l'autre (crc32 + graine fixe)"""
+    texts = [f"{doc['title']} {doc['content']}" for doc in KB.values()]
+    first = LocalEmbedder(dim=64).fit(texts).embed_many(texts)
+    second = LocalEmbedder(dim=64).fit(texts).embed_many(texts)
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+    assert not LocalEmbedder(dim=64).embed("le la de").any()
+
+
+def test_local_embedder_tolerates_variants():
+    """Accents, flexions et fautes partagent des n-grammes"""
+    embedder = LocalEmbedder(dim=256).fit([doc["content"] for doc in KB.values()])
+    handicap = embedder.embed("enfant handicape")
+    assert handicap @ embedder.embed("Enfants handicapés") > handicap @ embedder.embed("carte stationnement")
+
+
+@pytest.fixture
+def gemini_down(monkeypatch):
+    """Gemini en panne : chaque appel d'embedding lève une exception"""
+    calls = []
+
+    def failing_embed(text, task_type):
+        calls.append(text)
+        raise TimeoutError("Gemini indisponible")
+
+    monkeypatch.setattr(semantic_search, "_embed_content", failing_embed)
+    monkeypatch.setattr(semantic_search, "_REMOTE_EMBEDDING_RETRY_AT", 0.0)
+    monkeypatch.setattr(semantic_search.query_embedding_cache, "get", lambda *args: None)
+    # Index Gemini : un seul document embeddé
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {"cmi": [1.0, 0.0]})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    semantic_search.build_semantic_index(KB)
+    return calls
+
+
+def test_search_falls_back_to_local_index(gemini_down):
+    """Échec Gemini → index local (tous les documents), puis plus d'appel pendant le cooldown"""
+    results = semantic_search.semantic_search("enfant handicapé allocation éducation", KB)
+    assert results and results[0]["id"] == "aeeh"
+    assert len(gemini_down) == 1
+    assert not semantic_search.remote_embedding_available()
+
+    results = semantic_search.hybrid_search("adultes handicapés emploi", KB, top_k=2)
+    assert results[0]["id"] == "aah"
+    assert len(gemini_down) == 1
@@ -0,0 +1,75 @@
+"""
+🧪 Tests pour le choix du modèle par requête (tiering)
+"""
+from types import SimpleNamespace
+
+from services import model_tiers
+from services.model_tiers import (
+    ModelPool, ModelTier, TIER_DEEP, TIER_FAST, TIER_STANDARD, message_complexity, select_tier
+)
+from services.routing import ROUTE_LIGHT, ROUTE_RETRIEVAL, RouteDecision
+
+DOCS = [{"title": "AEEH", "content": "...", "score": 0.8}]
+
+
+def test_light_route_goes_fast():
+    route = RouteDecision(ROUTE_LIGHT, "small_talk", "info_generale")
+    assert select_tier(route, "merci !", []).tier == TIER_FAST
+
+
+def test_complex_cumulation_question_goes_deep():
+    message = "Est-ce que je peux cumuler l'AAH et le RSA si mon fils touche aussi l'AEEH ?"
+    assert message_complexity(message) >= 2
+    route = RouteDecision(ROUTE_RETRIEVAL, "informational", "admin_aide", 20.0)
+    decision = select_tier(route, message, DOCS)
+    assert (decision.tier, decision.reason) == (TIER_DEEP, "complex")
+
+
+def test_admin_question_without_sources_goes_deep():
+    route = RouteDecision(ROUTE_RETRIEVAL, "informational", "admin_aide", 1.0)
+    decision = select_tier(route, "Quel formulaire pour la demande ?", [])
+    assert (decision.tier, decision.reason) == (TIER_DEEP, "admin_without_sources")
+
+
+def test_simple_lookup_depends_on_confidence(monkeypatch):
+    monkeypatch.setattr(model_tiers.settings, "tier_fast_min_confidence", 10.0)
+    confident = RouteDecision(ROUTE_RETRIEVAL, "informational", "info_generale", 15.0)
+    assert select_tier(confident, "C'est quoi l'AEEH ?", DOCS).tier == TIER_FAST
+
+    unsure = RouteDecision(ROUTE_RETRIEVAL, "informational", "info_generale", 3.0)
+    assert select_tier(unsure, "C'est quoi l'AEEH ?", DOCS).tier == TIER_STANDARD
+
+
+def test_tiering_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(model_tiers.settings, "tiering_enabled", False)
+    route = RouteDecision(ROUTE_LIGHT, "small_talk", "info_generale")
+    assert select_tier(route, "merci", []).tier == TIER_STANDARD
+
+
+def test_pool_builds_lazily_and_shares_identical_configs():
+    built = []
+    tiers = {
+        TIER_FAST: ModelTier(TIER_FAST, "flash-lite", 800),
+        TIER_STANDARD: ModelTier(TIER_STANDARD, "flash", 2000),
+        TIER_DEEP: ModelTier(TIER_DEEP, "flash", 2000),
+    }
+    pool = ModelPool(tiers, lambda tier: built.append(tier.model_name) or object())
+    assert built == []
+
+    standard = pool.model(TIER_STANDARD)
+    assert pool.model(TIER_DEEP) is standard
+    assert pool.model("inconnu") is standard
+    pool.model(TIER_FAST)
+    assert built == ["flash", "flash-lite"]
+
+
+def test_pool_records_latency_and_tokens():
+    pool = ModelPool({TIER_STANDARD: ModelTier(TIER_STANDARD, "flash", 2000)}, lambda tier: object())
+    usage = SimpleNamespace(prompt_token_count=120, candidates_token_count=40)
+    pool.tier_stats(TIER_STANDARD).record(0.5, usage)
+    pool.tier_stats(TIER_STANDARD).record(1.5, None)
+
+    stats = pool.stats()[TIER_STANDARD]
+    assert stats["requests"] == 2 and stats["latency_avg_ms"] == 1000 and stats["latency_max_ms"] == 1500
+    assert stats["prompt_tokens"] == 120 and stats["output_tokens"] == 40
+    assert stats["loaded"] is False
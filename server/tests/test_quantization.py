@@ -0,0 +1,71 @@
+"""
+🧪 Tests pour les index quantifiés (int8, product quantization)
+"""
+import numpy as np
+import pytest
+from services.quantization import Int8Index, PQIndex, QuantizedIndex, compare_topk, quantize_int8
+from services.vector_index import VectorIndex
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(10, 32))
+    matrix = centers[rng.integers(0, 10, 500)] + rng.normal(scale=0.5, size=(500, 32))
+    queries = matrix[:30] + rng.normal(scale=0.1, size=(30, 32))
+    return [f"doc{i}" for i in range(500)], matrix.astype(np.float32), queries
+
+
+def test_quantize_int8_roundtrip():
+    """Erreur de reconstruction bornée par une demi-échelle"""
+    matrix = np.array([[0.5, -1.0, 0.25], [0.0, 0.0, 0.0]], dtype=np.float32)
+    codes, scales = quantize_int8(matrix)
+    assert codes.dtype == np.int8 and codes[0, 1] == -127
+    assert np.abs(codes * scales[:, None] - matrix).max() <= scales.max() / 2
+    assert not codes[1].any()
+
+
+@pytest.mark.parametrize("index_class,kwargs", [(Int8Index, {}), (PQIndex, {"n_subvectors": 8})])
+def test_quantized_topk_matches_exact(vectors, index_class, kwargs):
+    """Top-3 identique à l'index float grâce au re-rank, mémoire réduite"""
+    ids, matrix, queries = vectors
+    index = index_class(ids, matrix, rerank=50, **kwargs)
+    exact = VectorIndex(ids, matrix)
+
+    for query in queries[:5]:
+        assert [doc_id for doc_id, _ in index.search(query, top_k=3)] == \
+            [doc_id for doc_id, _ in exact.search(query, top_k=3)]
+
+    quality = compare_topk(index, queries, top_k=3)
+    assert quality["same_topk"] == 1.0
+    assert quality["bytes_per_vector"] < matrix.shape[1] * 4
+
+
+def test_rerank_scores_are_exact_and_rows_mapping(vectors):
+    """Les candidats re-rankés ont le score float exact ; `rows` évite la copie du store"""
+    ids, matrix, queries = vectors
+    subset = np.arange(100, 200)
+    index = Int8Index(ids[100:200], matrix, rerank=5, rows=subset)
+    exact = VectorIndex(ids[100:200], matrix[subset])
+
+    results = index.search(queries[0], top_k=3)
+    expected = exact.search(queries[0], top_k=3)
+    assert [doc_id for doc_id, _ in results] == [doc_id for doc_id, _ in expected]
+    for (_, score), (_, expected_score) in zip(results, expected):
+        assert abs(score - expected_score) < 1e-5
+
+
+def test_pq_rejects_indivisible_dimension(vectors):
+    ids, matrix, _ = vectors
+    with pytest.raises(ValueError):
+        PQIndex(ids, matrix, n_subvectors=5)
+
+
+def test_incomplete_quantized_index_cannot_be_instantiated():
+    """Sous-classe sans approximate_score / nbytes → erreur à la construction, pas à la requête"""
+    class Incomplete(QuantizedIndex):
+        def _encode(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(["a"], np.ones((1, 4), dtype=np.float32))
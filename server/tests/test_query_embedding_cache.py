@@ -0,0 +1,78 @@
+"""
+🧪 Tests pour le cache des embeddings de requêtes
+"""
+import pytest
+from core.cache import QueryEmbeddingCache
+
+
+class FakeRedis:
+    """Client Redis minimal en mémoire"""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+
+class FakeRedisCache:
+    def __init__(self, client=None):
+        self.redis_client = client
+        self.use_redis = client is not None
+
+
+def test_normalized_key_hits():
+    """Variantes de casse/espaces/ponctuation → même entrée"""
+    embeddings = QueryEmbeddingCache(FakeRedisCache(), max_size=10, ttl_seconds=60)
+    embeddings.set("Comment obtenir l'AEEH ?", "RETRIEVAL_QUERY", [0.1, 0.2])
+
+    assert embeddings.get("comment  obtenir l'aeeh", "RETRIEVAL_QUERY") == [0.1, 0.2]
+    assert embeddings.get("comment obtenir l'aeeh", "RETRIEVAL_DOCUMENT") is None
+    assert embeddings.get_stats()["memory_hits"] == 1
+    assert embeddings.get_stats()["misses"] == 1
+
+
+def test_lru_eviction_and_ttl():
+    """Taille bornée (LRU) et expiration"""
+    embeddings = QueryEmbeddingCache(FakeRedisCache(), max_size=2, ttl_seconds=60)
+    embeddings.set("a", "RETRIEVAL_QUERY", [1.0])
+    embeddings.set("b", "RETRIEVAL_QUERY", [2.0])
+    embeddings.get("a", "RETRIEVAL_QUERY")
+    embeddings.set("c", "RETRIEVAL_QUERY", [3.0])
+
+    assert embeddings.get("b", "RETRIEVAL_QUERY") is None
+    assert embeddings.get("a", "RETRIEVAL_QUERY") == [1.0]
+
+    expired = QueryEmbeddingCache(FakeRedisCache(), max_size=2, ttl_seconds=0)
+    expired.set("a", "RETRIEVAL_QUERY", [1.0])
+    assert expired.get("a", "RETRIEVAL_QUERY") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_tier():
+    """Un embedding publié par un worker est relu par un autre via Redis"""
+    client = FakeRedis()
+    worker_a = QueryEmbeddingCache(FakeRedisCache(client), max_size=10, ttl_seconds=60)
+    worker_b = QueryEmbeddingCache(FakeRedisCache(client), max_size=10, ttl_seconds=60)
+
+    await worker_a.aset("AAH et travail", "RETRIEVAL_QUERY", [0.5, -0.25])
+    assert await worker_b.aget("aah et travail ?", "RETRIEVAL_QUERY") == [0.5, -0.25]
+    assert worker_b.get_stats()["redis_hits"] == 1
+
+    # Le hit Redis a repeuplé le tier in-process
+    assert worker_b.get("aah et travail", "RETRIEVAL_QUERY") == [0.5, -0.25]
+
+
+@pytest.mark.asyncio
+async def test_model_change_invalidates_redis_entries():
+    """Après un changement de modèle d'embedding, les vecteurs de l'ancien ne sont plus servis"""
+    client = FakeRedis()
+    old = QueryEmbeddingCache(FakeRedisCache(client), max_size=10, ttl_seconds=60, model="models/text-embedding-004")
+    new = QueryEmbeddingCache(FakeRedisCache(client), max_size=10, ttl_seconds=60, model="models/gemini-embedding-001")
+
+    await old.aset("AAH et travail", "RETRIEVAL_QUERY", [0.5, -0.25])
+    assert await new.aget("AAH et travail", "RETRIEVAL_QUERY") is None
+    assert await old.aget("AAH et travail", "RETRIEVAL_QUERY") == [0.5, -0.25]
@@ -0,0 +1,242 @@
+"""
+🧪 Tests pour la résilience des appels Gemini (retry, disjoncteur, hedging, deadline)
+"""
+import asyncio
+import pytest
+from services.gemini_client import GeminiClient
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, GeminiError,
+    LatencyTracker, RetryableGeminiError, classify_error, resilient_call
+)
+
+
+class FlakyCall:
+    """call(timeout) factice : lève les erreurs données dans l'ordre, puis répond"""
+
+    def __init__(self, errors=(), delays=()):
+        self.errors = list(errors)
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def __call__(self, timeout):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        await asyncio.sleep(delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"ok{self.calls}"
+
+
+def test_classify_error():
+    from google.api_core import exceptions as api_exceptions
+    assert isinstance(classify_error(api_exceptions.ServiceUnavailable("down")), RetryableGeminiError)
+    assert isinstance(classify_error(api_exceptions.ResourceExhausted("quota")), RetryableGeminiError)
+    assert isinstance(classify_error(asyncio.TimeoutError()), RetryableGeminiError)
+    error = classify_error(api_exceptions.InvalidArgument("bad key"))
+    assert isinstance(error, GeminiError) and not isinstance(error, RetryableGeminiError)
+
+
+def test_breaker_opens_then_half_open_probe(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=10)
+
+    breaker.allow(); breaker.record_failure()
+    breaker.allow(); breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    now[0] += 11
+    breaker.allow()  # appel test
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # un seul appel test à la fois
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.stats()["trips"] == 2
+
+    now[0] += 11
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+
+def test_retry_on_retryable_error():
+    call = FlakyCall(errors=[RetryableGeminiError("503"), RetryableGeminiError("429")])
+    breaker = CircuitBreaker("test", failure_threshold=5)
+
+    result = asyncio.run(resilient_call(call, breaker, Deadline(5), attempt_timeout=1, retries=2, backoff=0.001))
+    assert result == "ok3" and call.calls == 3
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+
+def test_non_retryable_error_not_retried():
+    call = FlakyCall(errors=[ValueError("bad request")])
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    with pytest.raises(GeminiError):
+        asyncio.run(resilient_call(call, breaker, Deadline(5), attempt_timeout=1, retries=2, backoff=0.001))
+    assert call.calls == 1
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=60)
+    call = FlakyCall(errors=[RetryableGeminiError("503")] * 5)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(resilient_call(call, breaker, Deadline(5), attempt_timeout=1, retries=4, backoff=0.001))
+    assert call.calls == 2 and breaker.rejected == 1
+
+
+def test_deadline_bounds_attempts():
+    # Chaque tentative dépasse son timeout : le budget de 0.15 s est épuisé avant les 5 tentatives
+    call = FlakyCall(delays=[1.0] * 5)
+    breaker = CircuitBreaker("test", failure_threshold=10)
+
+    with pytest.raises(RetryableGeminiError):
+        asyncio.run(resilient_call(call, breaker, Deadline(0.15), attempt_timeout=0.1, retries=4, backoff=0.001))
+    assert call.calls < 5
+
+
+def test_deadline_already_expired():
+    call = FlakyCall()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(resilient_call(call, CircuitBreaker("test"), Deadline(0), attempt_timeout=1))
+    assert call.calls == 0
+
+
+def test_hedged_request_wins_over_slow_one():
+    latencies = LatencyTracker(min_samples=1)
+    for _ in range(10):
+        latencies.add(0.02)
+    # Première requête lente (1 s), la requête doublée répond tout de suite
+    call = FlakyCall(delays=[1.0, 0.0])
+
+    async def scenario():
+        return await resilient_call(
+            call, CircuitBreaker("test"), Deadline(5), attempt_timeout=2,
+            latencies=latencies, hedge_percentile=95
+        )
+
+    assert asyncio.run(scenario()) == "ok2"
+    assert call.calls == 2
+
+
+def test_no_hedge_when_not_allowed():
+    latencies = LatencyTracker(min_samples=1)
+    latencies.add(0.01)
+    call = FlakyCall(delays=[0.05])
+
+    result = asyncio.run(resilient_call(
+        call, CircuitBreaker("test"), Deadline(5), attempt_timeout=2,
+        latencies=latencies, hedge_percentile=95, can_hedge=lambda: False
+    ))
+    assert result == "ok1" and call.calls == 1
+
+
+class SlowModel:
+    """generate_content_async factice : Gemini sain, 50 ms par génération"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.peak = self.active = 0
+
+    async def generate_content_async(self, prompt, request_options=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return prompt
+        finally:
+            self.active -= 1
+
+
+def test_saturated_semaphore_is_not_a_gemini_failure():
+    # 8 requêtes pour 1 créneau : ~0.2 s de file pour la dernière, timeout de 0.1 s par tentative
+    model = SlowModel(delay=0.03)
+    client = GeminiClient(model, max_concurrency=1)
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    latencies = LatencyTracker(min_samples=1)
+
+    async def scenario():
+        return await asyncio.gather(*(
+            resilient_call(
+                lambda timeout, i=i: client.request(f"q{i}", timeout=timeout),
+                breaker, Deadline(5), attempt_timeout=0.1, retries=0,
+                latencies=latencies, limiter=client
+            )
+            for i in range(8)
+        ))
+
+    assert asyncio.run(scenario()) == [f"q{i}" for i in range(8)]
+    assert model.peak == 1
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+    # Le p95 du hedging ne voit que la durée des appels, pas l'attente du créneau
+    assert max(latencies.samples) < 0.1
+    assert client.stats()["queue_wait_max_ms"] >= 150
+
+
+def test_queue_timeout_raises_deadline_without_tripping_breaker():
+    model = SlowModel(delay=0.3)
+    client = GeminiClient(model, max_concurrency=1)
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    async def scenario():
+        holder = asyncio.ensure_future(resilient_call(
+            lambda timeout: client.request("long", timeout=timeout),
+            breaker, Deadline(5), attempt_timeout=1, limiter=client
+        ))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            await resilient_call(
+                lambda timeout: client.request("court", timeout=timeout),
+                breaker, Deadline(0.05), attempt_timeout=1, limiter=client
+            )
+        return await holder
+
+    assert asyncio.run(scenario()) == "long"
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+    stats = client.stats()
+    assert stats["queue_timeouts"] == 1 and stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+class StallingModel(SlowModel):
+    """Première génération bloquée (1 s), les suivantes immédiates"""
+
+    async def generate_content_async(self, prompt, request_options=None):
+        self.delay, delay = 0.0, self.delay
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+            return f"{prompt}@{delay}"
+        finally:
+            self.active -= 1
+
+
+@pytest.mark.parametrize("max_concurrency,expected,peak", [(1, "q@1.0", 1), (2, "q@0.0", 2)])
+def test_hedge_takes_its_own_slot(max_concurrency, expected, peak):
+    """Pas de doublon sans créneau libre : le plafond de concurrence tient, hedging compris"""
+    latencies = LatencyTracker(min_samples=1)
+    latencies.add(0.02)
+    model = StallingModel(delay=1.0)
+    client = GeminiClient(model, max_concurrency=max_concurrency)
+
+    async def scenario():
+        result = await resilient_call(
+            lambda timeout: client.request("q", timeout=timeout),
+            CircuitBreaker("test"), Deadline(5), attempt_timeout=2,
+            latencies=latencies, hedge_percentile=95, limiter=client
+        )
+        await asyncio.sleep(0.01)  # annulation de la requête perdante
+        return result
+
+    assert asyncio.run(scenario()) == expected
+    assert model.peak == peak
+    assert client.stats()["in_flight"] == 0
+
+
+def test_hedging_disabled_by_default():
+    from config.settings import Settings
+    assert Settings.model_fields["gemini_hedge_percentile"].default == 0
@@ -0,0 +1,63 @@
+"""
+🧪 Tests pour l'exécuteur de recherche (scoring hors event loop)
+"""
+import asyncio
+import threading
+import time
+import pytest
+from services.retrieval_executor import RetrievalExecutor
+
+
+def test_scoring_runs_off_the_event_loop():
+    """Un scoring lent n'empêche pas l'event loop de servir d'autres tâches"""
+    executor = RetrievalExecutor(max_workers=2, max_pending=4)
+
+    def slow_scoring(query):
+        time.sleep(0.2)
+        return query, threading.current_thread().name
+
+    async def scenario():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        results = await asyncio.gather(executor.run(slow_scoring, "aah"), executor.run(slow_scoring, "pch"))
+        beat.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert [query for query, _ in results] == ["aah", "pch"]
+    assert all(name.startswith("retrieval") for _, name in results)
+    assert ticks >= 5
+    assert executor.stats()["completed"] == 2
+
+
+def test_admission_is_bounded_and_errors_propagate():
+    executor = RetrievalExecutor(max_workers=1, max_pending=1)
+    peak = 0
+
+    def scoring():
+        nonlocal peak
+        peak = max(peak, executor.in_flight)
+        time.sleep(0.02)
+
+    def failing():
+        raise ValueError("index absent")
+
+    async def scenario():
+        await asyncio.gather(*(executor.run(scoring) for _ in range(4)))
+        with pytest.raises(ValueError):
+            await executor.run(failing)
+
+    asyncio.run(scenario())
+    executor.shutdown()
+
+    assert peak == 1
+    assert executor.stats()["failed"] == 1 and executor.in_flight == 0
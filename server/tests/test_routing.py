@@ -0,0 +1,39 @@
+"""
+🧪 Tests pour le routage avant recherche
+"""
+import pytest
+from services import routing
+from services.routing import ROUTE_LIGHT, ROUTE_RETRIEVAL, is_small_talk, route_message
+
+KB = {
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé, montant et compléments.", "keywords": ["aeeh", "allocation"]},
+    "repit": {"title": "Répit des aidants", "content": "Accueil temporaire et relais pour souffler.", "keywords": ["repit", "aidant", "souffler"]},
+}
+
+
+@pytest.mark.parametrize("message", ["Bonjour", "merci beaucoup !", "OK 👍", "ça va ?"])
+def test_small_talk(message):
+    assert is_small_talk(message)
+    decision = route_message(message, "info_generale", KB)
+    assert (decision.route, decision.reason) == (ROUTE_LIGHT, "small_talk")
+
+
+def test_informational_messages_keep_retrieval():
+    assert not is_small_talk("merci, et pour l'AEEH ?")
+    decision = route_message("Quel est le montant de l'AEEH ?", "admin_aide", KB)
+    assert decision.retrieval and decision.lexical_confidence > 0
+
+
+def test_fatigue_routes_on_lexical_confidence(monkeypatch):
+    """Épuisement sans sujet → prompt léger ; épuisement + sujet couvert par la KB → recherche"""
+    monkeypatch.setattr(routing.settings, "route_min_lexical_score", 1.0)
+    light = route_message("Je suis épuisée, je n'en peux plus", "fatigue", KB)
+    assert (light.route, light.reason) == (ROUTE_LIGHT, "fatigue_low_confidence")
+
+    retrieval = route_message("épuisée, comment avoir du répit pour souffler ?", "fatigue", KB)
+    assert retrieval.route == ROUTE_RETRIEVAL
+
+
+def test_routing_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(routing.settings, "routing_enabled", False)
+    assert route_message("merci", "info_generale", KB).retrieval
@@ -0,0 +1,90 @@
+"""
+🧪 Tests pour les index partagés entre workers (fichiers .npy memory-mapped)
+"""
+import numpy as np
+import pytest
+import services.semantic_search as semantic_search
+from services import shared_index
+from services.diversity import DocSimilarity
+from services.shared_index import artifact_key, shared_array, shared_doc_similarity
+
+KB = {
+    "aeeh": {"title": "AEEH", "content": "Allocation d'éducation de l'enfant handicapé, versée par la CAF.", "keywords": ["aeeh"]},
+    "aah": {"title": "AAH", "content": "Allocation aux adultes handicapés, cumul avec un emploi.", "keywords": ["aah"]},
+    "cmi": {"title": "Carte mobilité inclusion", "content": "Carte de stationnement et priorité.", "keywords": ["cmi"]},
+}
+
+
+def test_artifact_key_depends_on_ids_and_content():
+    key = artifact_key(["a", "b"], ["h1", "h2"], "model")
+    assert key == artifact_key(["a", "b"], ["h1", "h2"], "model")
+    assert key != artifact_key(["b", "a"], ["h2", "h1"], "model")
+    assert key != artifact_key(["a", "b"], ["h1", "h3"], "model")
+    assert artifact_key(["a", "b"], ["h1", None]) is None
+
+
+def test_second_worker_attaches_read_only():
+    """Premier appel : construit et publie ; appels suivants : memmap, sans reconstruire"""
+    builds = []
+
+    def build():
+        builds.append(1)
+        return np.arange(6, dtype=np.float32).reshape(2, 3)
+
+    first = shared_array("passages", "k1", build)
+    second = shared_array("passages", "k1", build)
+
+    assert len(builds) == 1
+    assert isinstance(second, np.memmap) and not second.flags.writeable
+    assert np.array_equal(first, second)
+    # Sans clé (contenu inconnu) : jamais partagé
+    shared_array("passages", None, build)
+    assert len(builds) == 2
+
+
+def test_shared_doc_similarity_round_trip():
+    vectors = np.array([[1.0, 0.0], [0.8, 0.6], [0.0, 1.0]], dtype=np.float32)
+    built = shared_doc_similarity("passages", "k2", ["a", "b", "c"], lambda: DocSimilarity(["a", "b", "c"], vectors))
+    attached = shared_doc_similarity("passages", "k2", ["a", "b", "c"], lambda: pytest.fail("reconstruit"))
+    assert isinstance(attached.matrix, np.memmap)
+    assert np.allclose(attached.pairwise(["c", "a", "x"]), built.pairwise(["c", "a", "x"]))
+
+
+def test_local_index_is_shared_between_workers(monkeypatch):
+    """Un autre worker (autre dict, même contenu) réutilise IDF et vecteurs publiés"""
+    index = semantic_search.build_local_index(dict(KB))
+    assert shared_index.shared_stats()["files"] == 4  # idf, vecteurs, vecteurs + matrice des documents
+
+    monkeypatch.setattr(semantic_search.LocalEmbedder, "fit", lambda *args: pytest.fail("IDF recalculé"))
+    other = semantic_search.build_local_index(dict(KB))
+
+    assert isinstance(other.vectors.matrix, np.memmap)
+    assert np.array_equal(np.asarray(other.vectors.matrix), index.vectors.matrix)
+    embedder = semantic_search.get_local_index(dict(KB))[1]
+    query = embedder.embed("carte de stationnement")
+    assert index.doc_ids[int(np.argmax(index.doc_scores(index.score(query))))] == "cmi"
+
+
+def test_build_uses_stored_vectors_only(monkeypatch):
+    """`shared_index build` (RUN du Dockerfile) : aucun appel Gemini, même si des passages n'ont pas de vecteur"""
+    from services.corpus import Corpus
+    stored = {"aeeh": [1.0, 0.0], "aah": [0.0, 1.0]}  # "cmi" jamais embeddé
+
+    def load():
+        semantic_search.EMBEDDINGS_CACHE = dict(stored)
+        return semantic_search.EMBEDDINGS_CACHE
+
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_CACHE", {})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_METADATA", {})
+    monkeypatch.setattr(semantic_search, "EMBEDDINGS_STORE", None)
+    monkeypatch.setattr(semantic_search, "load_embeddings_cache", lambda knowledge_base=None: load())
+    monkeypatch.setattr(semantic_search, "prune_ivf", lambda keep: 0)
+    monkeypatch.setattr(semantic_search, "embed_documents", lambda *args, **kwargs: pytest.fail("appel Gemini"))
+    monkeypatch.setattr(semantic_search, "_embed_content", lambda *args, **kwargs: pytest.fail("appel Gemini"))
+
+    corpus = Corpus()
+    corpus.documents = dict(KB)
+    corpus.build_indexes(embed=False)
+
+    index = semantic_search.indexes_for(corpus.documents).semantic
+    assert sorted(passage.doc_id for passage in index.passages) == ["aah", "aeeh"]
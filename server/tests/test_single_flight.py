@@ -0,0 +1,153 @@
+"""
+🧪 Tests pour le single-flight (questions identiques simultanées)
+"""
+import asyncio
+from core.cache import RedisCache
+from core.single_flight import RELEASE_SCRIPT, SingleFlight
+
+
+class FakeRedis:
+    """Sous-ensemble de redis.asyncio partagé par deux « workers »"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.data.get(key) != token:
+            return 0
+        if script == RELEASE_SCRIPT:
+            del self.data[key]
+        return 1
+
+
+def worker_cache(redis_client=None):
+    cache = RedisCache()
+    cache.redis_client, cache.use_redis = redis_client, redis_client is not None
+    return cache
+
+
+def test_identical_questions_share_one_computation():
+    flights = SingleFlight(worker_cache())
+    calls = []
+
+    async def ask(message):
+        async with flights.join(message) as flight:
+            if flight.shared:
+                return flight.result
+            calls.append(message)
+            await asyncio.sleep(0.05)
+            result = {"answer": message.upper()}
+            flight.resolve(result)
+        return result
+
+    async def scenario():
+        return await asyncio.gather(*(ask(m) for m in ["Montant AEEH ?", "montant aeeh ?  ", "Montant AEEH ?", "AAH ?"]))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 2  # clé = requête normalisée
+    assert results[1] == results[2] == {"answer": "MONTANT AEEH ?"}
+    assert flights.stats() == {"enabled": True, "in_flight": 0, "leaders": 2, "followers": 2, "remote_followers": 0, "fallbacks": 0}
+
+
+def test_followers_compute_themselves_when_leader_fails():
+    flights = SingleFlight(worker_cache())
+
+    async def leader():
+        async with flights.join("question") as flight:
+            await asyncio.sleep(0.02)
+            raise RuntimeError("Gemini indisponible")
+
+    async def follower():
+        await asyncio.sleep(0.005)
+        async with flights.join("question") as flight:
+            return flight.shared
+
+    async def scenario():
+        return await asyncio.gather(leader(), follower(), return_exceptions=True)
+
+    failure, shared = asyncio.run(scenario())
+    assert isinstance(failure, RuntimeError) and shared is False
+    assert flights.stats()["fallbacks"] == 1
+
+
+def test_other_worker_waits_for_cached_answer():
+    """Worker B trouve le verrou de A, attend la réponse dans Redis au lieu d'appeler Gemini"""
+    redis_client = FakeRedis()
+    cache_a, cache_b = worker_cache(redis_client), worker_cache(redis_client)
+    worker_a = SingleFlight(cache_a, lease=1.0, poll_interval=0.01)
+    worker_b = SingleFlight(cache_b, lease=1.0, poll_interval=0.01)
+
+    async def leader():
+        async with worker_a.join("Délais MDPH ?") as flight:
+            assert not flight.shared
+            await asyncio.sleep(0.05)
+            result = {"answer": "4 mois"}
+            await cache_a.set("Délais MDPH ?", result)
+            flight.resolve(result)
+
+    async def other_worker():
+        await asyncio.sleep(0.01)
+        async with worker_b.join("délais mdph ?") as flight:
+            return flight.result
+
+    async def scenario():
+        _, result = await asyncio.gather(leader(), other_worker())
+        return result
+
+    assert asyncio.run(scenario()) == {"answer": "4 mois"}
+    assert worker_b.stats()["remote_followers"] == 1
+    assert not any(key.startswith("lock:") for key in redis_client.data)  # verrou libéré
+
+
+def test_new_leader_rechecks_cache_after_taking_the_lock():
+    """Réponse stockée entre le cache.get de la requête et sa prise du verrou : pas de second calcul"""
+    redis_client = FakeRedis()
+    cache = worker_cache(redis_client)
+    flights = SingleFlight(cache, lease=1.0)
+
+    async def scenario():
+        # Le leader précédent a stocké sa réponse et libéré le verrou juste après notre cache.get
+        await cache.set("Montant AAH ?", {"answer": "1 016 €"})
+        async with flights.join("Montant AAH ?") as flight:
+            return flight.result
+
+    assert asyncio.run(scenario()) == {"answer": "1 016 €"}
+    assert flights.stats()["leaders"] == 0 and flights.stats()["remote_followers"] == 1
+    assert not any(key.startswith("lock:") for key in redis_client.data)
+
+
+def test_unresolved_flight_is_not_shared():
+    """Réponse de repli (non résolue) : les followers calculent eux-mêmes au lieu de la recevoir"""
+    flights = SingleFlight(worker_cache())
+
+    async def leader():
+        async with flights.join("question") as flight:
+            await asyncio.sleep(0.02)
+            # generate_with_gemini_async a renvoyé technical_error_response() : pas de resolve
+        return "repli"
+
+    async def follower():
+        await asyncio.sleep(0.005)
+        async with flights.join("question") as flight:
+            return flight.shared
+
+    async def scenario():
+        return await asyncio.gather(leader(), follower())
+
+    assert asyncio.run(scenario()) == ["repli", False]
+    assert flights.stats()["fallbacks"] == 1
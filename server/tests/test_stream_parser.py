@@ -0,0 +1,52 @@
+"""
+🧪 Tests pour le parsing incrémental de la réponse JSON streamée
+"""
+import json
+import random
+import pytest
+from services.stream_parser import IncrementalJSONParser
+
+RESPONSE = {
+    "answer": "L'AEEH \"de base\" 😊\nest versée par la CAF.",
+    "situation": "Vous préparez {un dossier}, déjà commencé.",
+    "priority": "Aucune urgence immédiate.",
+    "next_step": "Ouvrir le formulaire Cerfa",
+    "sources": ["AEEH", "Crochet ] piège"],
+    "suggestions": ["Montant ?", "Délais ?", "Recours ?"],
+}
+
+
+def feed_in_chunks(text, seed):
+    rng = random.Random(seed)
+    parser, events, i = IncrementalJSONParser(), [], 0
+    while i < len(text):
+        size = rng.randint(1, 8)
+        events.extend(parser.feed(text[i:i + size]))
+        i += size
+    return parser, events
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_any_chunking_gives_same_fields(ensure_ascii):
+    """Morceaux coupés n'importe où (clés, échappements \\uXXXX, emoji) → même résultat"""
+    text = "```json\n" + json.dumps(RESPONSE, ensure_ascii=ensure_ascii, indent=2) + "\n```"
+    for seed in range(50):
+        parser, events = feed_in_chunks(text, seed)
+        assert parser.done and parser.fields == RESPONSE
+        assert "".join(value for kind, value in events if kind == "delta") == RESPONSE["answer"]
+
+
+def test_answer_streams_before_other_fields_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"answer": "Bonjour, vo') == [("delta", "Bonjour, vo")]
+    events = parser.feed('us", "situation": "En cours"')
+    assert events == [("delta", "us"), ("field", ("answer", "Bonjour, vous")), ("field", ("situation", "En cours"))]
+    assert parser.feed(', "sources": ["AEEH"') == []
+    assert parser.feed(']}') == [("field", ("sources", ["AEEH"]))]
+    assert parser.done
+
+
+def test_plain_text_emits_nothing():
+    parser = IncrementalJSONParser()
+    assert parser.feed("Désolé, je ne peux pas répondre.") == []
+    assert not parser.done and parser.raw_text == "Désolé, je ne peux pas répondre."
@@ -0,0 +1,150 @@
+"""
+🧪 Tests pour l'index vectoriel
+"""
+import numpy as np
+from services.vector_index import IVFIndex, UNSCORED, VectorIndex, recall_check, top_k_indices
+
+
+def test_top_k_indices():
+    """Top-k trié par score décroissant"""
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert list(top_k_indices(scores, 2)) == [1, 3]
+    assert list(top_k_indices(scores, 10)) == [1, 3, 2, 0]
+    assert len(top_k_indices(scores, 0)) == 0
+
+
+def test_search_matches_cosine():
+    """L'index donne les mêmes scores qu'un cosinus calculé à la main"""
+    rng = np.random.default_rng(0)
+    embeddings = {f"doc{i}": rng.normal(size=16).tolist() for i in range(20)}
+    index = VectorIndex.from_embeddings(embeddings)
+    query = rng.normal(size=16)
+
+    expected = sorted(
+        (
+            (doc_id, float(np.dot(vec, query) / (np.linalg.norm(vec) * np.linalg.norm(query))))
+            for doc_id, vec in embeddings.items()
+        ),
+        key=lambda x: x[1],
+        reverse=True
+    )[:3]
+
+    results = index.search(query, top_k=3, threshold=-1.0)
+    assert [doc_id for doc_id, _ in results] == [doc_id for doc_id, _ in expected]
+    for (_, score), (_, expected_score) in zip(results, expected):
+        assert abs(score - expected_score) < 1e-5
+
+
+def test_search_threshold_and_zero_query():
+    """Seuil appliqué, vecteur nul → aucun résultat"""
+    index = VectorIndex.from_embeddings({"a": [1.0, 0.0], "b": [0.0, 1.0]})
+    assert index.search([1.0, 0.1], top_k=2, threshold=0.5) == [("a", index.search([1.0, 0.1])[0][1])]
+    assert index.search([0.0, 0.0], top_k=2, threshold=0.3) == []
+    assert len(VectorIndex.from_embeddings({})) == 0
+
+
+def clustered_vectors(n=600, dim=32, n_centers=12, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_centers, dim))
+    vectors = centers[rng.integers(0, n_centers, n)] + rng.normal(scale=0.3, size=(n, dim))
+    return [f"doc{i}" for i in range(n)], vectors.astype(np.float32), rng
+
+
+def test_ivf_full_probe_is_exact():
+    """nprobe = n_lists → mêmes résultats que l'index exact"""
+    ids, vectors, rng = clustered_vectors()
+    exact = VectorIndex(ids, vectors)
+    ivf = IVFIndex(ids, vectors, n_lists=12)
+    query = vectors[5] + rng.normal(scale=0.1, size=vectors.shape[1])
+
+    assert ivf.n_lists == 12
+    assert sorted(np.concatenate(ivf.lists).tolist()) == list(range(len(ids)))
+    full = [doc_id for doc_id, _ in ivf.search(query, top_k=5)]
+    ivf.nprobe = ivf.n_lists
+    assert [doc_id for doc_id, _ in ivf.search(query, top_k=5)] == [doc_id for doc_id, _ in exact.search(query, top_k=5)]
+    assert full[0] == exact.search(query, top_k=1)[0][0]
+
+
+def test_ivf_recall_check_and_partial_scan():
+    """Rappel rapporté par nprobe, vecteurs non visités à UNSCORED"""
+    ids, vectors, rng = clustered_vectors()
+    ivf = IVFIndex(ids, vectors, n_lists=12, nprobe=2)
+    queries = vectors[:20] + rng.normal(scale=0.05, size=(20, vectors.shape[1]))
+
+    scores = ivf.score(queries[0], nprobe=1)
+    assert (scores == UNSCORED).sum() > len(ids) / 2
+
+    report = recall_check(ivf, queries, top_k=5, nprobes=(1, 12))
+    assert [line["nprobe"] for line in report] == [1, 12]
+    assert report[-1]["recall"] == 1.0 and report[-1]["visited"] == 1.0
+    assert report[0]["recall"] > 0.8
+
+
+def test_ivf_save_load(tmp_path):
+    """Persistance .npz, refusée si les vecteurs indexés ont changé"""
+    ids, vectors, _ = clustered_vectors(n=200)
+    ivf = IVFIndex(ids, vectors, n_lists=8)
+    path = tmp_path / "ivf.npz"
+    ivf.save(path)
+
+    loaded = IVFIndex.load(path, ids, vectors, nprobe=3)
+    assert loaded is not None and loaded.nprobe == 3
+    assert np.array_equal(loaded.assignments, ivf.assignments)
+    assert IVFIndex.load(path, ids[:-1] + ["autre"], vectors) is None
+    assert IVFIndex.load(path, ids, vectors, n_lists=16) is None
+    assert IVFIndex.load(tmp_path / "absent.npz", ids, vectors) is None
+
+
+def test_ivf_rejected_after_reembedding(tmp_path):
+    """Mêmes ids, vecteurs ré-embeddés (ou autre modèle) → empreinte différente, IVF refusé"""
+    ids, vectors, _ = clustered_vectors(n=200)
+    path = tmp_path / "ivf.npz"
+    IVFIndex(ids, vectors, n_lists=8).save(path, fingerprint="v1")
+
+    assert IVFIndex.load(path, ids, vectors, fingerprint="v1") is not None
+    assert IVFIndex.load(path, ids, vectors, fingerprint="v2") is None
+    assert IVFIndex.load(path, ids, vectors) is None
+
+
+def test_one_ivf_file_per_index(tmp_path, monkeypatch):
+    """Corpus complet et partitions ont chacun leur fichier : aucun ne réentraîne l'autre"""
+    import services.semantic_search as semantic_search
+    from services import embedding_store
+    monkeypatch.setattr(semantic_search.settings, "ann_index", "ivf")
+    monkeypatch.setattr(semantic_search.settings, "ivf_n_lists", 4)
+    monkeypatch.setattr(semantic_search, "ivf_path", lambda fingerprint: embedding_store.ivf_path(fingerprint, tmp_path))
+
+    ids, vectors, _ = clustered_vectors(n=200)
+    full = semantic_search.build_vector_index(ids, vectors, key="corpus")
+    semantic_search.build_vector_index(ids[:80], vectors[:80])
+    assert len(list(tmp_path.glob("embeddings_ivf-*.npz"))) == 2
+
+    # Relu depuis son fichier malgré la partition construite entre-temps
+    reloaded = semantic_search.build_vector_index(ids, vectors, key="corpus")
+    assert np.array_equal(reloaded.assignments, full.assignments)
+    assert len(list(tmp_path.glob("embeddings_ivf-*.npz"))) == 2
+
+    # Vecteurs de la partition modifiés sous les mêmes ids → nouvelle empreinte, nouveau fichier
+    semantic_search.build_vector_index(ids[:80], vectors[:80][::-1].copy())
+    assert len(list(tmp_path.glob("embeddings_ivf-*.npz"))) == 3
+
+
+def test_stale_ivf_files_pruned(tmp_path, monkeypatch):
+    """Seuls les IVF de la dernière initialisation (corpus + partitions) restent sur disque"""
+    import services.semantic_search as semantic_search
+    from services import embedding_store
+    monkeypatch.setattr(semantic_search.settings, "ann_index", "ivf")
+    monkeypatch.setattr(semantic_search.settings, "ivf_n_lists", 4)
+    monkeypatch.setattr(semantic_search, "ivf_path", lambda fingerprint: embedding_store.ivf_path(fingerprint, tmp_path))
+    monkeypatch.setattr(semantic_search, "_IVF_USED", set())
+
+    ids, vectors, _ = clustered_vectors(n=200)
+    semantic_search.build_vector_index(ids, vectors, key="ancien-corpus")
+    semantic_search._IVF_USED.clear()  # nouvelle initialisation
+    semantic_search.build_vector_index(ids, vectors, key="corpus")
+    semantic_search.build_vector_index(ids[:80], vectors[:80], key="partition")
+
+    assert embedding_store.prune_ivf(semantic_search._IVF_USED, tmp_path) == 1
+    assert sorted(path.name for path in tmp_path.glob("embeddings_ivf-*.npz")) == sorted(
+        embedding_store.ivf_path(key, tmp_path).name for key in ("corpus", "partition")
+    )
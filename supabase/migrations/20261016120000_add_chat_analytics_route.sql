@@ -0,0 +1,6 @@
+-- Routage avant recherche (server/services/routing.py) : recherche documentaire ou prompt léger
+alter table public.chat_analytics
+  add column if not exists retrieval_route text,
+  add column if not exists route_reason text;
+
+create index if not exists chat_analytics_retrieval_route_idx on public.chat_analytics(retrieval_route);